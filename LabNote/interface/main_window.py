@@ -7,20 +7,23 @@ import sqlite3
 import uuid
 
 # PyQt import
-from PyQt5.QtWidgets import QMainWindow, QWidget, QMessageBox, QAction, QSizePolicy, QMenu, QLabel, QVBoxLayout, \
-    QListWidgetItem
+from PyQt5.QtWidgets import QMainWindow, QWidget, QMessageBox, QAction, QSizePolicy, QMenu, QToolButton, \
+    QAbstractItemView
 from PyQt5.QtGui import QIcon, QFont, QStandardItem
 from PyQt5.QtCore import Qt, QSettings, QByteArray, pyqtSignal, QItemSelectionModel, QEvent
 
 # Project import
 from labnote.ui.ui_mainwindow import Ui_MainWindow
-from labnote.core import stylesheet, common, data, sqlite_error
-from labnote.utils import database, fsentry, layout, date
+from labnote.core import stylesheet, common, data, sqlite_error, cache
+from labnote.utils import database, fsentry, export, document
 from labnote.interface import project, library, sample, dataset, protocol
 from labnote.interface.dialog.notebook import Notebook
+from labnote.interface.dialog.export import ExportProgress
 from labnote.interface.widget.lineedit import TagSearchLineEdit
 from labnote.interface.widget.view import TreeView
-from labnote.interface.widget.model import StandardItemModel
+from labnote.interface.widget.model import StandardItemModel, ExperimentListModel
+from labnote.interface.widget.delegate import ExperimentDelegate
+from labnote.interface.widget.object import AutoSave, GarbageCollector, DocumentCache
 from labnote.interface.widget.widget import NoEntryWidget, ExperimentTextEditor
 
 
@@ -37,6 +40,9 @@ class MainWindow(QMainWindow, Ui_MainWindow):
     creating_experiment = False
     current_experiment = None
     current_notebook = None
+    editor = None
+    editor_notebook = None
+    document_cache = None
 
     def __init__(self):
         super(MainWindow, self).__init__()
@@ -110,8 +116,35 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         self.act_rename_notebook.triggered.connect(self.update_notebook)
         self.act_rename_notebook.setEnabled(False)
         self.notebook_setting_menu.addAction(self.act_rename_notebook)
+        self.notebook_setting_menu.addSeparator()
+        self.act_export_notebook = QAction("Export PDF", self)
+        self.act_export_notebook.triggered.connect(lambda: self.export_notebook(export.PDF))
+        self.act_export_notebook.setEnabled(False)
+        self.notebook_setting_menu.addAction(self.act_export_notebook)
+        self.act_export_notebook_html = QAction("Export HTML", self)
+        self.act_export_notebook_html.triggered.connect(lambda: self.export_notebook(export.HTML))
+        self.act_export_notebook_html.setEnabled(False)
+        self.notebook_setting_menu.addAction(self.act_export_notebook_html)
         self.btn_settings.setMenu(self.notebook_setting_menu)
 
+        # Set share button menu
+        self.share_menu = QMenu(self)
+        self.share_menu.setFont(QFont(self.font().family(), 13, QFont.Normal))
+        self.act_share_pdf = QAction("Export PDF", self)
+        self.act_share_pdf.triggered.connect(lambda: self.share_experiment(export.PDF))
+        self.share_menu.addAction(self.act_share_pdf)
+        self.act_share_html = QAction("Export HTML", self)
+        self.act_share_html.triggered.connect(lambda: self.share_experiment(export.HTML))
+        self.share_menu.addAction(self.act_share_html)
+        self.act_share.setMenu(self.share_menu)
+        self.data_toolbar.widgetForAction(self.act_share).setPopupMode(QToolButton.InstantPopup)
+
+        # Set the menu that move the selected experiments, the notebooks are listed when it is shown
+        self.move_menu = QMenu("Move to notebook", self)
+        self.move_menu.aboutToShow.connect(self.show_move_menu)
+        self.move_menu.menuAction().setEnabled(False)
+        self.menuFile.insertMenu(self.act_delete_experiment, self.move_menu)
+
         # Disable the notebook and experiment related actions from toolbar
         self.act_new.setEnabled(False)
         self.act_share.setEnabled(False)
@@ -120,12 +153,31 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         # Remove focus rectangle
         self.lst_entry.setAttribute(Qt.WA_MacShowFocusRect, 0)
 
+        # Several experiments can be selected to be moved together
+        self.lst_entry.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.lst_entry.setContextMenuPolicy(Qt.ActionsContextMenu)
+        self.lst_entry.addAction(self.move_menu.menuAction())
+
+        # Show the experiments of the open notebook, they are read one page at a time
+        self.experiment_model = ExperimentListModel(self)
+        self.lst_entry.setModel(self.experiment_model)
+        self.lst_entry.setItemDelegate(ExperimentDelegate(self.lst_entry))
+        self.lst_entry.setUniformItemSizes(True)
+
         # Create the notebook list widget
         self.view_notebook = ProjectNotebookTreeView()
         self.frame.layout().insertWidget(1, self.view_notebook)
 
-        # Add no entry widget widget to mainwindow
-        self.layout_experiment.addWidget(NoEntryWidget(), Qt.AlignHCenter, Qt.AlignCenter)
+        # Add no entry widget widget to mainwindow, the experiment editor is added the first time it is used
+        self.no_entry = NoEntryWidget()
+        self.layout_experiment.addWidget(self.no_entry, Qt.AlignHCenter, Qt.AlignCenter)
+
+        # Save the open experiment in the background
+        self.autosave = AutoSave(self)
+
+        # Remove the unused resources in the background once the program is launched
+        self.garbage_collector = GarbageCollector(self)
+        self.garbage_collector.schedule()
 
     def init_connection(self):
         self.btn_add_notebook.clicked.connect(self.create_notebook)
@@ -142,8 +194,14 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         self.act_mb_sample.triggered.connect(self.open_sample)
         self.act_new.triggered.connect(self.start_creating_experiment)
         self.act_mb_new.triggered.connect(self.start_creating_experiment)
-        self.lst_entry.itemSelectionChanged.connect(self.experiment_selection_change)
+        self.lst_entry.selectionModel().currentChanged.connect(self.experiment_selection_change)
+        self.experiment_model.failed.connect(self.experiment_list_failed)
         self.act_delete_experiment.triggered.connect(self.delete_experiment)
+        self.act_duplicate.triggered.connect(self.duplicate_experiment)
+        self.autosave.saved.connect(self.experiment_autosaved)
+        self.autosave.failed.connect(self.experiment_autosave_failed)
+        self.garbage_collector.finished.connect(self.resources_collected)
+        cache.completer_cache.changed.connect(self.completer_changed)
 
     """
     General functions
@@ -154,7 +212,7 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         tag_list = []
 
         try:
-            tag_list = database.select_tag_list()
+            tag_list = cache.completer_cache.entries(cache.TAG)
         except sqlite3.Error as exception:
             message = QMessageBox(QMessageBox.Warning, "Unable to get tag list",
                                   "An error occurred while getting the tag list.", QMessageBox.Ok)
@@ -170,7 +228,7 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         reference_list = []
 
         try:
-            reference_list = database.select_reference_completer_list()
+            reference_list = cache.completer_cache.entries(cache.REFERENCE)
         except sqlite3.Error as exception:
             message = QMessageBox(QMessageBox.Warning, "Unable to get reference list",
                                   "An error occurred while getting the reference list.", QMessageBox.Ok)
@@ -186,7 +244,7 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         protocol_list = []
 
         try:
-            protocol_list = database.select_protocol_completer_list()
+            protocol_list = cache.completer_cache.entries(cache.PROTOCOL)
         except sqlite3.Error as exception:
             message = QMessageBox(QMessageBox.Warning, "Unable to get tag list",
                                   "An error occurred while getting the tag list.", QMessageBox.Ok)
@@ -202,7 +260,7 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         dataset_list = []
 
         try:
-            dataset_list = database.select_dataset_completer_list()
+            dataset_list = cache.completer_cache.entries(cache.DATASET)
         except sqlite3.Error as exception:
             message = QMessageBox(QMessageBox.Warning, "Unable to get tag list",
                                   "An error occurred while getting the tag list.", QMessageBox.Ok)
@@ -213,6 +271,21 @@ class MainWindow(QMainWindow, Ui_MainWindow):
 
         self.dataset_list = dataset_list
 
+    def completer_changed(self, kind):
+        """ Update a completer list after it changed in the database
+
+        :param kind: Completer list kind
+        :type kind: str
+        """
+        if kind == cache.TAG:
+            self.get_tag_list()
+        elif kind == cache.REFERENCE:
+            self.get_reference_list()
+        elif kind == cache.DATASET:
+            self.get_dataset_list()
+        elif kind == cache.PROTOCOL:
+            self.get_protocol_list()
+
     def closeEvent(self, e):
         """
         Write the program geometry and state to settings
@@ -220,6 +293,12 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         :type e: QCloseEvent
         :returns: Event for the parent
         """
+        # Write the open experiment modifications
+        self.autosave.finish()
+        self.garbage_collector.cancel()
+        if self.document_cache:
+            self.document_cache.cancel()
+
         # Write the settings
         settings = QSettings("Samuel Drouin", "LabNote")
         settings.setValue("MainWindow/Geometry", self.saveGeometry())
@@ -258,9 +337,7 @@ class MainWindow(QMainWindow, Ui_MainWindow):
 
     def open_library(self):
         """ Open the library dialog """
-        lib = library.Library(tag_list=self.tag_list, parent=self)
-        lib.closed.connect(self.get_tag_list)
-        lib.closed.connect(self.get_reference_list)
+        library.Library(tag_list=self.tag_list, parent=self)
 
     def open_sample(self):
         """ Open the sample number dialog """
@@ -268,14 +345,11 @@ class MainWindow(QMainWindow, Ui_MainWindow):
 
     def open_dataset(self):
         """ Open the dataset dialog """
-        dt = dataset.Dataset(self)
-        dt.closed.connect(self.get_dataset_list)
+        dataset.Dataset(self)
 
     def open_protocol(self):
         """ Open the protocol dialog """
-        prt = protocol.Protocol(tag_list=self.tag_list, reference_list=self.reference_list, parent=self)
-        prt.closed.connect(self.get_tag_list)
-        prt.closed.connect(self.get_protocol_list)
+        protocol.Protocol(tag_list=self.tag_list, reference_list=self.reference_list, parent=self)
 
     """
     Notebook list functions
@@ -296,22 +370,29 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         """
 
         self.act_delete_experiment.setEnabled(False)
+        self.act_duplicate.setEnabled(False)
+        self.act_share.setEnabled(False)
+        self.move_menu.menuAction().setEnabled(False)
         self.creating_experiment = False
         self.current_notebook = None
         self.current_experiment = None
         self.clear_form()
-        self.lst_entry.blockSignals(True)
-        self.lst_entry.clear()
-        self.lst_entry.blockSignals(False)
+        self.lst_entry.selectionModel().blockSignals(True)
+        self.experiment_model.set_notebook(None)
+        self.lst_entry.selectionModel().blockSignals(False)
 
         if hierarchy_level == 1:
             self.act_delete_notebook.setEnabled(False)
             self.act_rename_notebook.setEnabled(False)
+            self.act_export_notebook.setEnabled(True)
+            self.act_export_notebook_html.setEnabled(True)
             self.act_new.setEnabled(False)
             self.current_notebook = None
         elif hierarchy_level == 2:
             self.act_delete_notebook.setEnabled(True)
             self.act_rename_notebook.setEnabled(True)
+            self.act_export_notebook.setEnabled(True)
+            self.act_export_notebook_html.setEnabled(True)
             self.act_new.setEnabled(True)
             self.current_notebook = item_id
             self.show_experiment_list()
@@ -350,6 +431,34 @@ class MainWindow(QMainWindow, Ui_MainWindow):
 
         self.view_notebook.show_content()
 
+    def export_notebook(self, file_format=export.PDF):
+        """ Export all the experiments of the selected notebook or project
+
+        :param file_format: Export format, export.PDF or export.HTML
+        :type file_format: str
+        """
+
+        # Write the open experiment before reading the files
+        self.autosave.flush()
+
+        item_id, name = self.view_notebook.current_selection()
+
+        try:
+            if self.view_notebook.get_current_level() == common.LEVEL_NOTEBOOK:
+                entry_list = export.experiment_entries(nb_uuid=item_id)
+            else:
+                entry_list = export.experiment_entries(proj_id=item_id)
+        except sqlite3.Error as exception:
+            message = QMessageBox(QMessageBox.Warning, "Error while loading data",
+                                  "An error occurred while loading the experiments to export.", QMessageBox.Ok)
+            message.setWindowTitle("LabNote")
+            message.setDetailedText(str(exception))
+            message.exec()
+            return
+
+        self.export_progress = ExportProgress(entry_list, name, file_format=file_format, parent=self)
+        self.export_progress.start()
+
     def update_notebook(self):
         """ Show a dialog to update a category """
 
@@ -379,32 +488,56 @@ class MainWindow(QMainWindow, Ui_MainWindow):
             self.create_editor()
 
     def create_editor(self):
-        """ Add the editor widget to the layout """
-        layout.empty_layout(self, self.layout_experiment)
+        """ Show an empty editor
 
-        try:
-            key_list = database.select_experiment_key_notebook(data.uuid_bytes(self.current_notebook))
-        except sqlite3.Error as exception:
-            message = QMessageBox()
-            message.setWindowTitle("LabNote")
-            message.setText("Unable to select experiment key")
-            message.setInformativeText("An unhandeled error occured while selecting the experiment key for the current "
-                                       "notebook.")
-            message.setDetailedText(str(exception))
-            message.setIcon(QMessageBox.Warning)
-            message.setStandardButtons(QMessageBox.Ok)
-            message.exec()
-            return
+        The editor is created the first time only, it is then cleared and reused for every experiment.
+        """
+        self.autosave.finish()
+
+        # The experiment keys are read again when the notebook changed or an experiment was saved
+        if self.editor is None or self.editor_notebook != self.current_notebook:
+            try:
+                key_list = database.select_experiment_key_notebook(data.uuid_bytes(self.current_notebook))
+            except sqlite3.Error as exception:
+                message = QMessageBox()
+                message.setWindowTitle("LabNote")
+                message.setText("Unable to select experiment key")
+                message.setInformativeText("An unhandeled error occured while selecting the experiment key for the "
+                                           "current notebook.")
+                message.setDetailedText(str(exception))
+                message.setIcon(QMessageBox.Warning)
+                message.setStandardButtons(QMessageBox.Ok)
+                message.exec()
+                return False
+
+            if self.editor is None:
+                self.editor = ExperimentTextEditor(tag_list=self.tag_list, reference_list=self.reference_list,
+                                                   dataset_list=self.dataset_list, protocol_list=self.protocol_list,
+                                                   key_list=key_list)
+                self.editor.txt_body.reference_pressed.connect(self.show_reference)
+                self.editor.txt_body.dataset_pressed.connect(self.show_dataset)
+                self.editor.txt_body.protocol_pressed.connect(self.show_protocol)
+                self.layout_experiment.addWidget(self.editor)
+                self.document_cache = DocumentCache(self.editor.txt_body, self)
+            else:
+                self.editor.set_key_list(key_list)
+            self.editor_notebook = self.current_notebook
 
-        self.editor = ExperimentTextEditor(tag_list=self.tag_list, reference_list=self.reference_list,
-                                           dataset_list=self.dataset_list, protocol_list=self.protocol_list,
-                                           key_list=key_list)
+        self.editor.reset()
         if self.current_experiment:
             self.editor.txt_body.set_uuid(uuid=self.current_experiment, parent_uuid=self.current_notebook)
-        self.editor.txt_body.reference_pressed.connect(self.show_reference)
-        self.editor.txt_body.dataset_pressed.connect(self.show_dataset)
-        self.editor.txt_body.protocol_pressed.connect(self.show_protocol)
-        self.layout_experiment.addWidget(self.editor)
+        self.show_editor(True)
+        return True
+
+    def show_editor(self, visible):
+        """ Show the editor or the no entry widget
+
+        :param visible: Show the editor
+        :type visible: bool
+        """
+        if self.editor:
+            self.editor.setVisible(visible)
+        self.no_entry.setVisible(not visible)
 
     def show_reference(self, ref_uuid):
         if ref_uuid:
@@ -423,6 +556,8 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         """ Process the experiment in the database and the file system """
 
         if self.current_experiment is not None or self.creating_experiment:
+            self.autosave.wait()
+
             nb_uuid = self.view_notebook.get_user_data()
             name = data.prepare_string(self.editor.txt_title.toPlainText())
 
@@ -430,7 +565,7 @@ class MainWindow(QMainWindow, Ui_MainWindow):
                 # Get the experiment content
                 key = data.prepare_string(self.editor.txt_key.text())
                 description = data.prepare_textedit(self.editor.txt_description)
-                body = self.editor.txt_body.toHtml()
+                body = document.serialize(self.editor.txt_body.document())
 
                 description_anchor = self.editor.txt_description.anchors()
                 body_anchor = self.editor.txt_body.anchors()
@@ -514,114 +649,240 @@ class MainWindow(QMainWindow, Ui_MainWindow):
                             message.setDetailedText(str(exception))
                             message.exec()
                             return
+                    self.autosave.stop()
+                    self.editor.txt_body.deleted_image.clear()
                     self.done_modifing_protocol(exp_uuid)
 
     def experiment_selection_change(self):
-        if self.lst_entry.currentItem().data(Qt.UserRole):
-            self.current_experiment = self.lst_entry.currentItem().data(Qt.UserRole)
+        if self.lst_entry.currentIndex().data(Qt.UserRole):
+            self.current_experiment = self.lst_entry.currentIndex().data(Qt.UserRole)
             self.act_delete_experiment.setEnabled(True)
+            self.act_duplicate.setEnabled(True)
+            self.act_share.setEnabled(True)
+            self.move_menu.menuAction().setEnabled(True)
             self.show_experiment_details()
 
+    def experiment_autosaved(self, exp_uuid):
+        """ Show that the experiment was saved in the background
+
+        :param exp_uuid: Experiment UUID
+        :type exp_uuid: str
+        """
+        self.statusBar.showMessage("Experiment saved", 2000)
+
+    def experiment_autosave_failed(self, exp_uuid, exception):
+        """ Show that the experiment could not be saved in the background
+
+        :param exp_uuid: Experiment UUID
+        :type exp_uuid: str
+        :param exception: Exception raised while saving
+        :type exception: Exception
+        """
+        error_code = sqlite_error.sqlite_err_handler(str(exception))
+
+        if error_code == sqlite_error.UNIQUE_CODE:
+            self.statusBar.showMessage("Unable to save experiment : the experiment key must be unique within a "
+                                       "notebook.")
+        else:
+            self.statusBar.showMessage("Unable to save experiment : {}".format(str(exception)))
+
+    def resources_collected(self, report):
+        """ Show the space reclaimed by the garbage collector
+
+        :param report: Collection report
+        :type report: collector.Report
+        """
+        if report.removed:
+            self.statusBar.showMessage("Removed {} unused files, {:.1f} MB reclaimed".format(
+                report.removed, report.reclaimed / (1024 * 1024)), 5000)
+
     def done_modifing_protocol(self, exp_uuid):
         """ Active the interface element after the protocol is saved """
         self.current_experiment = exp_uuid
         self.show_experiment_list(current_item=self.current_experiment)
 
+        # The experiment key may have changed
+        self.editor_notebook = None
+
         if self.creating_experiment:
             self.creating_experiment = False
             self.editor.txt_body.set_uuid(uuid=self.current_experiment, parent_uuid=self.current_notebook)
 
-        self.get_tag_list()
-
     def clear_form(self):
         """ Clear all data in the form """
-        layout.empty_layout(self, self.layout_experiment)
+        self.autosave.finish()
 
-        if not self.current_experiment:
-            self.layout_experiment.addWidget(NoEntryWidget(), Qt.AlignHCenter, Qt.AlignCenter)
+        if self.editor:
+            self.editor.reset()
+        self.show_editor(False)
 
     def show_experiment_list(self, current_item=None):
         """ Show the list of experiment for the open notebook. """
+        self.experiment_model.set_notebook(self.current_notebook)
+
+        row = -1
+        if current_item:
+            row = self.experiment_model.find(current_item)
+
+        if row >= 0:
+            self.lst_entry.setCurrentIndex(self.experiment_model.index(row))
+        elif self.experiment_model.rowCount():
+            self.lst_entry.setCurrentIndex(self.experiment_model.index(0))
 
-        # Clear the existing list
-        self.lst_entry.clear()
+    def experiment_list_failed(self, exception):
+        """ Show that the experiment list could not be read
+
+        :param exception: Exception raised while reading the list
+        :type exception: sqlite3.Error
+        """
+        message = QMessageBox()
+        message.setWindowTitle("LabNote")
+        message.setText("Error getting the experiment list")
+        message.setInformativeText("An error occurred while getting the experiment list. ")
+        message.setDetailedText(str(exception))
+        message.setIcon(QMessageBox.Warning)
+        message.setStandardButtons(QMessageBox.Ok)
+        message.exec()
+
+    def show_experiment_details(self):
+        """ Show a reference details when it is selected """
+        if not self.create_editor():
+            return
 
-        # Get experiment list
         try:
-            buffer = database.get_experiment_list_notebook(data.uuid_bytes(self.current_notebook))
-        except sqlite3.Error as exception:
-            message = QMessageBox()
+            experiment, body_document = self.document_cache.get(self.current_notebook, self.current_experiment)
+        except (sqlite3.Error, OSError) as exception:
+            self.show_editor(False)
+            message = QMessageBox(QMessageBox.Warning, "Error while loading data",
+                                  "An error occurred while loading the experiment data.", QMessageBox.Ok)
             message.setWindowTitle("LabNote")
-            message.setText("Error getting the experiment list")
-            message.setInformativeText("An error occurred while getting the experiment list. ")
             message.setDetailedText(str(exception))
-            message.setIcon(QMessageBox.Warning)
-            message.setStandardButtons(QMessageBox.Ok)
             message.exec()
             return
 
-        if buffer:
-            to_be_current_item = None
-            for experiment in buffer:
-                list_widget_item = QListWidgetItem()
+        # Show content
+        self.editor.load(experiment, body_document)
+        self.autosave.watch(self.editor, self.current_experiment, self.current_notebook)
+
+        # Read the neighbours of the experiment so that they are shown immediately
+        row = self.lst_entry.currentIndex().row()
+        exp_list = []
+        for neighbour in range(max(row - DocumentCache.PREFETCH, 0), row + DocumentCache.PREFETCH + 1):
+            exp_uuid = self.experiment_model.index(neighbour).data(Qt.UserRole)
+            if neighbour != row and exp_uuid:
+                exp_list.append(exp_uuid)
+        self.document_cache.prefetch(self.current_notebook, exp_list)
+
+    def duplicate_experiment(self):
+        """ Duplicate the selected experiment and show the copy """
+        if self.current_experiment is None or self.creating_experiment:
+            return
 
-                widget = ListWidget(experiment['name'], experiment['key'])
-                list_widget_item.setData(Qt.UserRole, data.uuid_string(experiment['exp_uuid']))
+        # Write the open experiment before copying its files
+        self.autosave.flush()
 
-                # Add widget to list
-                list_widget_item.setSizeHint(widget.sizeHint())
-                self.lst_entry.addItem(list_widget_item)
-                self.lst_entry.setItemWidget(list_widget_item, widget)
+        exp_uuid = str(uuid.uuid4())
+        name = "{} (copy)".format(self.lst_entry.currentIndex().data(Qt.DisplayRole))
 
-                # Set the current item
-                if current_item:
-                    if data.uuid_string(experiment['exp_uuid']) == current_item:
-                        to_be_current_item = list_widget_item
+        try:
+            fsentry.duplicate_experiment(self.current_notebook, self.current_experiment, exp_uuid, name)
+        except (sqlite3.Error, OSError) as exception:
+            message = QMessageBox(QMessageBox.Warning, "Unable to duplicate experiment",
+                                  "An error occurred while duplicating the experiment.", QMessageBox.Ok)
+            message.setWindowTitle("LabNote")
+            message.setDetailedText(str(exception))
+            message.exec()
+            return
 
-            if to_be_current_item:
-                self.lst_entry.setCurrentItem(to_be_current_item)
-            else:
-                self.lst_entry.setCurrentRow(0)
+        self.current_experiment = exp_uuid
+        self.show_experiment_list(current_item=exp_uuid)
+
+    def share_experiment(self, file_format):
+        """ Export the selected experiment
+
+        :param file_format: Export format, export.PDF or export.HTML
+        :type file_format: str
+        """
+        if self.current_experiment is None or self.creating_experiment:
+            return
+
+        # Write the open experiment before reading its file
+        self.autosave.flush()
 
-    def show_experiment_details(self):
-        """ Show a reference details when it is selected """
-        layout.empty_layout(self, self.layout_experiment)
         try:
-            protocol = fsentry.read_experiment(self.current_notebook, self.current_experiment)
+            entry_list = export.experiment_entries(exp_uuid=self.current_experiment)
         except sqlite3.Error as exception:
             message = QMessageBox(QMessageBox.Warning, "Error while loading data",
-                                  "An error occurred while loading the experiment data.", QMessageBox.Ok)
+                                  "An error occurred while loading the experiment to export.", QMessageBox.Ok)
             message.setWindowTitle("LabNote")
             message.setDetailedText(str(exception))
             message.exec()
             return
 
-        # Show content
-        self.create_editor()
-        self.editor.txt_key.setText(protocol['key'])
+        name = entry_list[0].key or entry_list[0].title if entry_list else ""
+        self.export_progress = ExportProgress(entry_list, name, file_format=file_format, parent=self)
+        self.export_progress.start()
 
-        name = protocol['name']
-        if name:
-            self.editor.txt_title.setPlainText(name)
+    def show_move_menu(self):
+        """ List the notebooks in which the selected experiments can be moved """
+        self.move_menu.clear()
+
+        try:
+            project_list = database.select_notebook_project()
+        except sqlite3.Error as exception:
+            message = QMessageBox(QMessageBox.Warning, "Error while loading data",
+                                  "An error occurred while loading the notebook data.", QMessageBox.Ok)
+            message.setWindowTitle("LabNote")
+            message.setDetailedText(str(exception))
+            message.exec()
+            return
 
-        description = protocol['description']
-        if description:
-            self.editor.txt_description.setHtml(description)
+        for project in project_list:
+            notebook_list = [notebook for notebook in project.notebook if notebook.uuid != self.current_notebook]
+            if notebook_list:
+                self.move_menu.addSection(project.name)
 
-        created_date = protocol['created']
-        if created_date:
-            self.editor.lbl_created.setText("Original : {}".format(date.utc_to_local(created_date)))
+            for notebook in notebook_list:
+                action = self.move_menu.addAction(notebook.name)
+                action.triggered.connect(lambda checked, nb_uuid=notebook.uuid: self.move_experiments(nb_uuid))
 
-        updated_date = protocol['updated']
-        if updated_date:
-            self.editor.lbl_updated.setText("Last update : {}".format(date.utc_to_local(updated_date)))
+    def move_experiments(self, nb_uuid):
+        """ Move the selected experiments to another notebook
 
-        body = protocol['body']
-        if body:
-            self.editor.txt_body.setHtml(body)
+        :param nb_uuid: Destination notebook UUID
+        :type nb_uuid: str
+        """
+        exp_uuid_list = [index.data(Qt.UserRole) for index in self.lst_entry.selectionModel().selectedIndexes()]
+        if not exp_uuid_list or self.creating_experiment:
+            return
+
+        # Write the open experiment before its directory is moved
+        self.clear_form()
+
+        try:
+            fsentry.move_experiments(self.current_notebook, exp_uuid_list, nb_uuid)
+        except (sqlite3.Error, OSError) as exception:
+            message = QMessageBox(QMessageBox.Warning, "Unable to move experiments",
+                                  "An error occurred while moving the experiments.", QMessageBox.Ok)
+            message.setWindowTitle("LabNote")
+            message.setDetailedText(str(exception))
+            message.exec()
+        else:
+            if self.document_cache:
+                for exp_uuid in exp_uuid_list:
+                    self.document_cache.discard(exp_uuid)
+
+            if self.current_experiment in exp_uuid_list:
+                self.current_experiment = None
+
+            # The experiment keys of the notebook changed
+            self.editor_notebook = None
+
+        self.show_experiment_list(current_item=self.current_experiment)
 
     def delete_experiment(self):
         """ Delete an experiment """
+        self.autosave.stop()
         try:
             fsentry.delete_experiment(self.current_notebook, self.current_experiment)
         except sqlite3.Error as exception:
@@ -632,11 +893,14 @@ class MainWindow(QMainWindow, Ui_MainWindow):
             message.exec()
             return
 
-        self.lst_entry.blockSignals(True)
+        if self.document_cache:
+            self.document_cache.discard(self.current_experiment)
+
+        self.lst_entry.selectionModel().blockSignals(True)
         self.current_experiment = None
         self.clear_form()
         self.show_experiment_list()
-        self.lst_entry.blockSignals(False)
+        self.lst_entry.selectionModel().blockSignals(False)
 
 
 class ProjectNotebookTreeView(TreeView):
@@ -780,17 +1044,3 @@ class ProjectNotebookTreeView(TreeView):
 
                 if match:
                     self.setExpanded(match[0], True)
-
-
-class ListWidget(QWidget):
-    """ Item in the list widget """
-    def __init__(self, title, key):
-        super(ListWidget, self).__init__()
-        lbl_key = QLabel(key)
-        lbl_title = QLabel(title)
-        layout = QVBoxLayout()
-        layout.addWidget(lbl_key)
-        layout.addWidget(lbl_title)
-        layout.setContentsMargins(6, 6, 6, 6)
-        layout.setSpacing(5)
-        self.setLayout(layout)
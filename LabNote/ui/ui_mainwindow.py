@@ -68,7 +68,7 @@ class Ui_MainWindow(object):
         self.frame_layout.addItem(spacerItem)
         self.verticalLayout.addLayout(self.frame_layout)
         self.horizontalLayout_2.addWidget(self.frame)
-        self.lst_entry = QtWidgets.QListWidget(self.central_widget)
+        self.lst_entry = QtWidgets.QListView(self.central_widget)
         self.lst_entry.setMinimumSize(QtCore.QSize(230, 0))
         self.lst_entry.setMaximumSize(QtCore.QSize(230, 16777215))
         self.lst_entry.setAutoFillBackground(False)
@@ -0,0 +1,168 @@
+""" This module contains the application wide cache of the completer lists
+
+The tags, references, datasets and protocols used by the completers are read once from the database. The functions that
+write them publish the entries added, updated or removed once their transaction is committed. The cache applies these
+deltas to its lists and forwards them to the completers so that they update incrementally instead of reloading
+everything. Each publication increases the generation of the list, a subscriber that missed one reads the whole list
+again from the cache.
+"""
+
+# Python import
+import threading
+
+# PyQt import
+from PyQt5.QtCore import QObject, pyqtSignal
+
+# List kinds
+TAG = 'tag'
+REFERENCE = 'reference'
+DATASET = 'dataset'
+PROTOCOL = 'protocol'
+
+
+def entry_id(entry):
+    """ Return the identifier of a completer entry
+
+    :param entry: Tag name or dict with the 'uuid', 'key' and 'name' of an entry
+    :type entry: str or dict
+    :return str: Tag name or entry UUID
+    """
+    return entry if isinstance(entry, str) else entry['uuid']
+
+
+def merge(entry_list, updated, removed):
+    """ Apply a delta to a completer list
+
+    :param entry_list: Completer entries
+    :type entry_list: list
+    :param updated: Entries added or updated
+    :type updated: list
+    :param removed: Identifiers of the entries removed
+    :type removed: list
+    :return: list
+    """
+    entry_dict = {entry_id(entry): entry for entry in entry_list}
+    for identifier in removed:
+        entry_dict.pop(identifier, None)
+    for entry in updated:
+        entry_dict[entry_id(entry)] = entry
+
+    return list(entry_dict.values())
+
+
+class CompleterCache(QObject):
+    """ Cache of the completer lists
+
+    The changed signal is emitted with the list kind, its generation, the entries added or updated and the identifiers
+    of the entries removed. The deltas can be published from any thread, the signal is delivered in the thread of the
+    receivers.
+    """
+
+    changed = pyqtSignal(str, int, object, object)
+
+    def __init__(self, parent=None):
+        super(CompleterCache, self).__init__(parent)
+        self.lock = threading.Lock()
+        self.entry_dict = {}
+        self.generation = {TAG: 0, REFERENCE: 0, DATASET: 0, PROTOCOL: 0}
+
+    def load(self, kind):
+        """ Read a completer list from the database
+
+        :param kind: List kind
+        :type kind: str
+        :return: list
+        """
+        from labnote.utils import database
+
+        if kind == TAG:
+            return database.select_tag_list()
+        elif kind == REFERENCE:
+            return database.select_reference_completer_list()
+        elif kind == DATASET:
+            return database.select_dataset_completer_list()
+        else:
+            return database.select_protocol_completer_list()
+
+    def snapshot(self, kind):
+        """ Return a completer list with its generation, the list is read from the database the first time only
+
+        :param kind: List kind
+        :type kind: str
+        :return: tuple (generation, list)
+        """
+        with self.lock:
+            if kind not in self.entry_dict:
+                self.entry_dict[kind] = {entry_id(entry): entry for entry in self.load(kind)}
+            return self.generation[kind], list(self.entry_dict[kind].values())
+
+    def entries(self, kind):
+        """ Return a completer list
+
+        :param kind: List kind
+        :type kind: str
+        :return: list
+        """
+        return self.snapshot(kind)[1]
+
+    def update_list(self, kind, generation, known_generation, entry_list, updated, removed):
+        """ Apply a change received by a subscriber to its copy of a completer list
+
+        The whole list is read from the cache when the subscriber missed a change.
+
+        :param kind: List kind
+        :type kind: str
+        :param generation: Generation of the change
+        :type generation: int
+        :param known_generation: Generation of the subscriber list
+        :type known_generation: int
+        :param entry_list: Subscriber list
+        :type entry_list: list
+        :param updated: Entries added or updated
+        :type updated: list
+        :param removed: Identifiers of the entries removed
+        :type removed: list
+        :return: list
+        """
+        if generation <= known_generation:
+            return entry_list
+        elif generation == known_generation + 1:
+            return merge(entry_list, updated, removed)
+        return self.entries(kind)
+
+    def publish(self, kind, updated=None, removed=None):
+        """ Apply and forward a change of a completer list
+
+        :param kind: List kind
+        :type kind: str
+        :param updated: Entries added or updated
+        :type updated: list
+        :param removed: Identifiers of the entries removed
+        :type removed: list
+        """
+        updated = list(updated or [])
+        removed = list(removed or [])
+        if not updated and not removed:
+            return
+
+        with self.lock:
+            self.generation[kind] = self.generation[kind] + 1
+            generation = self.generation[kind]
+
+            entry_dict = self.entry_dict.get(kind)
+            if entry_dict is not None:
+                for identifier in removed:
+                    entry_dict.pop(identifier, None)
+                for entry in updated:
+                    entry_dict[entry_id(entry)] = entry
+
+        self.changed.emit(kind, generation, updated, removed)
+
+    def invalidate(self):
+        """ Forget every list, for example when the main directory changed """
+        with self.lock:
+            self.entry_dict.clear()
+
+
+# Cache shared by the whole application
+completer_cache = CompleterCache()
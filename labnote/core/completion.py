@@ -0,0 +1,214 @@
+""" This module contains the index used by the completers of the text edits
+
+The keys are kept in an array sorted on their case folded value so that the keys starting with a prefix are found with a
+binary search followed by a walk of the matching slice. When there are not enough prefix matches, the keys sharing the
+most trigrams with the prefix are added to handle typos and text typed in the middle of a key. The trigram index is
+only built the first time it is needed.
+"""
+
+# Python import
+import bisect
+import heapq
+import itertools
+from collections import Counter
+
+# Number of completions returned by a search
+LIMIT = 50
+
+# Number of changed keys above which the index is built again instead of updated
+REBUILD_LIMIT = 1000
+
+# Maximum number of keys of the posting lists merged to find the candidates of a fuzzy search
+CANDIDATE_LIMIT = 500
+
+
+def trigrams(text):
+    """ Return the trigrams of a case folded text
+
+    :param text: Case folded text
+    :type text: str
+    :return: set of str
+    """
+    return set([text[i:i + 3] for i in range(len(text) - 2)])
+
+
+class CompletionIndex(object):
+    """ Index of the completer keys """
+
+    def __init__(self, key_list=None):
+        self.build(key_list or [])
+
+    def __len__(self):
+        return len(self.key_list)
+
+    def build(self, key_list):
+        """ Build the index
+
+        :param key_list: Completer keys
+        :type key_list: iterable of str
+        """
+        entry_list = sorted([(key.casefold(), key) for key in set(key_list)])
+        self.folded_list = [entry[0] for entry in entry_list]
+        self.key_list = [entry[1] for entry in entry_list]
+        self.key_set = set(self.key_list)
+        self.trigram_dict = None
+
+    def build_trigrams(self):
+        """ Build the trigram index """
+        self.trigram_dict = {}
+        for folded, key in zip(self.folded_list, self.key_list):
+            for trigram in trigrams(folded):
+                self.trigram_dict.setdefault(trigram, set([])).add(key)
+
+    def add(self, key):
+        """ Add a key to the index, nothing is done when it is already in the index
+
+        :param key: Completer key
+        :type key: str
+        """
+        if key in self.key_set:
+            return
+
+        folded = key.casefold()
+        position = bisect.bisect_left(self.folded_list, folded)
+        while position < len(self.folded_list) and self.folded_list[position] == folded and \
+                self.key_list[position] < key:
+            position = position + 1
+
+        self.folded_list.insert(position, folded)
+        self.key_list.insert(position, key)
+        self.key_set.add(key)
+
+        if self.trigram_dict is not None:
+            for trigram in trigrams(folded):
+                self.trigram_dict.setdefault(trigram, set([])).add(key)
+
+    def remove(self, key):
+        """ Remove a key from the index, nothing is done when it is not in the index
+
+        :param key: Completer key
+        :type key: str
+        """
+        if key not in self.key_set:
+            return
+
+        folded = key.casefold()
+        position = bisect.bisect_left(self.folded_list, folded)
+        while position < len(self.key_list) and self.folded_list[position] == folded and \
+                self.key_list[position] != key:
+            position = position + 1
+
+        if position == len(self.key_list) or self.key_list[position] != key:
+            return
+
+        del self.folded_list[position]
+        del self.key_list[position]
+        self.key_set.discard(key)
+
+        if self.trigram_dict is not None:
+            for trigram in trigrams(folded):
+                self.trigram_dict[trigram].discard(key)
+
+    def update(self, key_list):
+        """ Update the index to contain the given keys
+
+        :param key_list: Completer keys
+        :type key_list: iterable of str
+        """
+        key_list = set(key_list)
+        added = key_list - self.key_set
+        removed = self.key_set - key_list
+
+        if len(added) + len(removed) > REBUILD_LIMIT:
+            self.build(key_list)
+            return
+
+        for key in removed:
+            self.remove(key)
+        for key in added:
+            self.add(key)
+
+    def prefix(self, text, limit=LIMIT):
+        """ Return the keys starting with a text, in case insensitive order
+
+        :param text: Typed text
+        :type text: str
+        :param limit: Maximum number of keys
+        :type limit: int
+        :return: list of str
+        """
+        text = text.casefold()
+        start = bisect.bisect_left(self.folded_list, text)
+        end = start
+
+        while end < len(self.folded_list) and end - start < limit and self.folded_list[end].startswith(text):
+            end = end + 1
+
+        return self.key_list[start:end]
+
+    def fuzzy(self, text, limit=LIMIT):
+        """ Return the keys sharing the most trigrams with a text
+
+        At least a third of the trigrams of the text must be in a key. The candidates are taken from the smallest posting
+        lists only, a key that contains enough trigrams is always in one of them. The merge stops at CANDIDATE_LIMIT keys
+        so that a text made of common trigrams is not compared with most of the keys.
+
+        :param text: Typed text
+        :type text: str
+        :param limit: Maximum number of keys
+        :type limit: int
+        :return: list of str
+        """
+        query = trigrams(text.casefold())
+        if not query:
+            return []
+
+        if self.trigram_dict is None:
+            self.build_trigrams()
+
+        posting_list = sorted([self.trigram_dict.get(trigram, set([])) for trigram in query], key=len)
+        threshold = (len(posting_list) + 2) // 3
+
+        # Count the trigrams of the candidates found in the smallest lists then look them up in the others. The first list
+        # is cut at the limit and the next ones are merged while the limit is not reached.
+        count_dict = Counter(itertools.islice(posting_list[0], CANDIDATE_LIMIT))
+        merged = min(len(posting_list[0]), CANDIDATE_LIMIT)
+        split = 1
+        while split < len(posting_list) - threshold + 1 and merged + len(posting_list[split]) <= CANDIDATE_LIMIT:
+            count_dict.update(posting_list[split])
+            merged = merged + len(posting_list[split])
+            split = split + 1
+
+        scored = []
+        for key, score in count_dict.items():
+            for posting in posting_list[split:]:
+                if key in posting:
+                    score = score + 1
+            if score >= threshold:
+                scored.append((-score, len(key), key))
+
+        return [entry[2] for entry in heapq.nsmallest(limit, scored)]
+
+    def search(self, text, limit=LIMIT):
+        """ Return the completions of a text
+
+        The keys starting with the text come first, followed by the closest keys when there are not enough of them.
+
+        :param text: Typed text
+        :type text: str
+        :param limit: Maximum number of keys
+        :type limit: int
+        :return: list of str
+        """
+        completion_list = self.prefix(text, limit)
+
+        # The texts shorter than a trigram have no close keys
+        if len(completion_list) < limit and len(text) >= 3:
+            found = set(completion_list)
+            for key in self.fuzzy(text, limit + len(completion_list)):
+                if key not in found:
+                    completion_list.append(key)
+                    if len(completion_list) == limit:
+                        break
+
+        return completion_list
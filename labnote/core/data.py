@@ -62,6 +62,38 @@ def prepare_textedit(textedit):
         return None
 
 
+def reference_label(ref_key, author=None, year=None, title=None):
+    """ Prepare the 'Author (year), title' label of a reference and its sort key
+
+    :param ref_key: Reference key used when the reference has no author, year and title
+    :type ref_key: str
+    :param author: Authors in the 'First Last, First Last' format
+    :type author: str
+    :param year: Year of publication
+    :type year: int
+    :param title: Title
+    :type title: str
+    :return: tuple (label, sort key)
+    """
+    label = ""
+
+    if author:
+        name_list = [name.split()[-1] for name in author.split(',') if name.split()]
+        if len(name_list) == 1:
+            label = name_list[0]
+        elif len(name_list) == 2:
+            label = "{} & {}".format(name_list[0], name_list[1])
+        elif name_list:
+            label = "{} et al.".format(name_list[0])
+    if year:
+        label = "{} ({})".format(label, year).strip()
+    if title:
+        label = "{}, {}".format(label, title) if label else title
+
+    label = label or ref_key
+    return label, label.casefold()
+
+
 """
 UUID format
 """
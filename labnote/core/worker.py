@@ -0,0 +1,48 @@
+""" This module contains the classes used to run a function outside of the GUI thread """
+
+# Python import
+import sys
+
+# PyQt import
+from PyQt5.QtCore import QObject, QRunnable, pyqtSignal, pyqtSlot
+
+
+class WorkerSignals(QObject):
+    """ Signals available from a running worker
+
+    QRunnable is not a QObject subclass, the signals are therefore defined in this class. The progress signal can be
+    emitted by the function when progress.emit is given as its progress callback.
+    """
+
+    result = pyqtSignal(object)
+    error = pyqtSignal(object)
+    progress = pyqtSignal(int, int)
+    finished = pyqtSignal()
+
+
+class Worker(QRunnable):
+    """ Run a function in a QThreadPool
+
+    The function must not touch any widget. The signals are delivered in the thread that owns the receiver, which is
+    the GUI thread for the interface classes.
+    """
+
+    def __init__(self, function, *args, **kwargs):
+        super(Worker, self).__init__()
+
+        self.function = function
+        self.args = args
+        self.kwargs = kwargs
+        self.signals = WorkerSignals()
+
+    @pyqtSlot()
+    def run(self):
+        """ Execute the function and emit the result or the exception """
+        try:
+            result = self.function(*self.args, **self.kwargs)
+        except Exception:
+            self.signals.error.emit(sys.exc_info()[1])
+        else:
+            self.signals.result.emit(result)
+        finally:
+            self.signals.finished.emit()
@@ -0,0 +1,121 @@
+"""
+This module contains the classes that export several entries in PDF or HTML files
+"""
+
+# Python import
+import os
+
+# PyQt import
+from PyQt5.QtWidgets import QProgressDialog, QMessageBox, QFileDialog
+from PyQt5.QtGui import QDesktopServices
+from PyQt5.QtCore import Qt, QDir, QUrl
+
+# Project import
+from labnote.utils import export
+from labnote.interface.widget.object import BatchExport
+
+# File dialog filter of each export format
+FILE_FILTER = {export.PDF: "PDF Files (*.pdf)", export.HTML: "HTML Files (*.html)"}
+
+
+class ExportProgress(QProgressDialog):
+    """
+    Class that ask the export destination and show the export progress
+    """
+
+    def __init__(self, entry_list, name, file_format=export.PDF, parent=None):
+        super(ExportProgress, self).__init__(parent)
+
+        # Global variable definition
+        self.entry_list = entry_list
+        self.name = name
+        self.file_format = file_format
+        self.batch_export = None
+        self.destination = None
+
+        self.setWindowTitle("LabNote")
+        self.setWindowModality(Qt.WindowModal)
+        self.setAutoClose(True)
+        self.setMinimumDuration(0)
+
+    def start(self):
+        """ Ask the destination and start the export
+
+        :return bool: False if the export was canceled
+        """
+        if not self.entry_list:
+            message = QMessageBox(QMessageBox.Information, "Nothing to export",
+                                  "There is no entry to export in '{}'.".format(self.name), QMessageBox.Ok)
+            message.setWindowTitle("LabNote")
+            message.exec()
+            return False
+
+        merge = True
+        if len(self.entry_list) > 1:
+            message = QMessageBox()
+            message.setWindowTitle("LabNote")
+            message.setText("Export '{}'".format(self.name))
+            message.setInformativeText("Do you want to export the {0} entries in a single {1} file or in one {1} file "
+                                       "per entry?".format(len(self.entry_list), self.file_format.upper()))
+            message.setIcon(QMessageBox.Question)
+            single_button = message.addButton("Single file", QMessageBox.AcceptRole)
+            message.addButton("One file per entry", QMessageBox.AcceptRole)
+            message.addButton(QMessageBox.Cancel)
+            message.setDefaultButton(single_button)
+            message.exec()
+
+            if message.buttonRole(message.clickedButton()) != QMessageBox.AcceptRole:
+                return False
+            merge = message.clickedButton() == single_button
+
+        title = "Export {}".format(self.file_format.upper())
+        default_path = QDir().cleanPath(QDir().homePath() + QDir().separator() + self.name)
+        if merge:
+            self.destination = QFileDialog.getSaveFileName(self.parent(), title,
+                                                           "{}.{}".format(default_path, self.file_format),
+                                                           FILE_FILTER[self.file_format])[0]
+        else:
+            self.destination = QFileDialog.getExistingDirectory(self.parent(), title, QDir().homePath())
+
+        if not self.destination:
+            return False
+
+        self.batch_export = BatchExport(self.entry_list, self.destination, merge=merge, file_format=self.file_format,
+                                        parent=self)
+        self.batch_export.progress.connect(lambda done, total: self.setValue(done))
+        self.batch_export.finished.connect(self.export_done)
+        self.canceled.connect(self.batch_export.cancel)
+
+        self.setLabelText("Exporting '{}'".format(self.name))
+        self.setRange(0, self.batch_export.total())
+        self.setValue(0)
+        self.show()
+        self.batch_export.start()
+        return True
+
+    def export_done(self, error_list):
+        """ Show the exported files or the errors
+
+        :param error_list: Entries that could not be exported with the exception
+        :type error_list: list of tuple
+        """
+        self.reset()
+
+        if error_list:
+            details = []
+            for entry, exception in error_list:
+                if entry:
+                    details.append("{} : {}".format(entry.key or entry.title, str(exception)))
+                else:
+                    details.append(str(exception))
+
+            message = QMessageBox(QMessageBox.Warning, "Unable to export",
+                                  "An error occurred while exporting {} entries.".format(len(error_list)),
+                                  QMessageBox.Ok)
+            message.setWindowTitle("LabNote")
+            message.setDetailedText("\n".join(details))
+            message.exec()
+        elif not self.batch_export.canceled and os.path.exists(self.destination):
+            QDesktopServices.openUrl(QUrl.fromLocalFile(self.destination))
+
+        self.deleteLater()
@@ -9,18 +9,19 @@ import os
 
 # PyQt import
 from PyQt5.QtWidgets import QDialog, QLabel, QMessageBox, QWidget, QVBoxLayout, QLineEdit
-from PyQt5.QtCore import Qt, QSettings, pyqtSignal, QFileInfo, QItemSelectionModel
+from PyQt5.QtCore import Qt, QSettings, pyqtSignal, QFileInfo, QItemSelectionModel, QThreadPool
 from PyQt5.QtGui import QColor, QPixmap, QPainter, QPen, QBrush
 
 # Project import
 from labnote.ui.ui_library import Ui_Library
 from labnote.core import stylesheet, sqlite_error, data, common
+from labnote.core.worker import Worker
 from labnote.interface.widget.textedit import CompleterTextEdit, PlainTextEdit
 from labnote.utils import database, fsentry, directory, layout
 from labnote.interface.widget.lineedit import LineEdit, NumberLineEdit, YearLineEdit, SearchLineEdit
 from labnote.interface.widget.widget import CategoryFrame
 from labnote.interface.widget import widget
-from labnote.interface.widget.object import KeyValidator
+from labnote.interface.widget.object import KeyValidator, TextIndexer
 
 
 # Constant definition
@@ -106,6 +107,14 @@ class Library(QDialog, Ui_Library):
         self.pdf_box.setFixedWidth(180)
         self.main_frame.layout().addWidget(self.pdf_box)
 
+        # PDF files are imported in the background, the progress of each import is kept by reference uuid
+        self.pdf_import = {}
+        self.thread_pool = QThreadPool(self)
+
+        # Index the text of the PDF files for the search
+        self.text_indexer = TextIndexer(self)
+        self.text_indexer.start()
+
         # Setup the form layout
         self.lbl_author = QLabel("Author")
         self.txt_author = LineEdit()
@@ -207,6 +216,9 @@ class Library(QDialog, Ui_Library):
         self.category_frame.delete.connect(self.delete_reference)
         self.category_frame.list_displayed.connect(self.restore_treeview_state)
         self.category_frame.view_tree.clicked.connect(self.selection_change)
+        self.category_frame.list_displayed.connect(self.search_reference)
+        self.txt_search.textChanged.connect(self.search_reference)
+        self.text_indexer.finished.connect(lambda count: self.search_reference() if count else None)
 
         self.txt_key.textChanged.connect(self.set_window_modified)
         self.txt_author.textChanged.connect(self.set_window_modified)
@@ -241,6 +253,29 @@ class Library(QDialog, Ui_Library):
         else:
             self.current_reference = None
 
+    def search_reference(self):
+        """ Show only the references that match the search in their informations or their PDF text """
+        search = self.txt_search.text().strip()
+
+        if not search:
+            self.category_frame.filter_entries(None)
+            self.category_frame.view_tree.collapseAll()
+            self.restore_treeview_state()
+            return
+
+        try:
+            uuid_list = database.select_reference_search(search)
+        except sqlite3.Error as exception:
+            message = QMessageBox(QMessageBox.Warning, "Unable to search",
+                                  "An error occurred while searching the references.", QMessageBox.Ok)
+            message.setWindowTitle("LabNote")
+            message.setDetailedText(str(exception))
+            message.exec()
+            return
+
+        self.category_frame.filter_entries(uuid_list)
+        self.category_frame.view_tree.expandAll()
+
     def show_reference(self, ref_uuid):
         """ Show the reference with the given uuid
 
@@ -255,41 +290,70 @@ class Library(QDialog, Ui_Library):
             self.selection_change(match[0])
             self.category_frame.view_tree.repaint()
 
-    def get_tag_list(self):
-        """ Get the list of all tag """
-        tag_list = []
-
-        try:
-            tag_list = database.select_tag_list()
-        except sqlite3.Error as exception:
-            message = QMessageBox(QMessageBox.Warning, "Unable to get tag list",
-                                  "An error occurred while getting the tag list.", QMessageBox.Ok)
-            message.setWindowTitle("LabNote")
-            message.setDetailedText(str(exception))
-            message.exec()
-            return
-
-        self.tag_list = tag_list
-
     def add_pdf(self, file):
         """ Add a PDF to a reference
 
+        The file is copied by a worker and the reference is updated once the copy is done.
+
         :param file: PDF file URL
         :type file: str
         """
         ref_uuid = self.category_frame.get_user_data()
 
-        try:
-            reference_file = fsentry.add_reference_pdf(ref_uuid=ref_uuid, file=file)
-        except (sqlite3.Error, OSError) as exception:
-            message = QMessageBox(QMessageBox.Warning, "Unable to save reference",
-                                  "An error occurred while saving the reference PDF.", QMessageBox.Ok)
-            message.setWindowTitle("LabNote")
-            message.setDetailedText(str(exception))
-            message.exec()
-            return
+        worker = Worker(fsentry.add_reference_pdf, ref_uuid, file)
+        worker.kwargs['progress'] = worker.signals.progress.emit
+        worker.signals.progress.connect(lambda done, total: self.pdf_import_progress(ref_uuid, done, total))
+        worker.signals.result.connect(lambda reference_file: self.pdf_import_done(ref_uuid, reference_file))
+        worker.signals.error.connect(lambda exception: self.pdf_import_error(ref_uuid, exception))
 
-        self.pdf_added.emit(reference_file)
+        self.pdf_import_progress(ref_uuid, 0, os.path.getsize(file) if os.path.isfile(file) else 0)
+        self.thread_pool.start(worker)
+
+    def pdf_import_progress(self, ref_uuid, done, total):
+        """ Show the progress of a PDF import
+
+        :param ref_uuid: Reference uuid
+        :type ref_uuid: str
+        :param done: Number of bytes copied
+        :type done: int
+        :param total: File size
+        :type total: int
+        """
+        self.pdf_import[ref_uuid] = (done, total)
+        if ref_uuid == self.current_reference:
+            self.pdf_widget.show_progress(done, total)
+
+    def pdf_import_done(self, ref_uuid, reference_file):
+        """ Show the PDF once it is imported
+
+        :param ref_uuid: Reference uuid
+        :type ref_uuid: str
+        :param reference_file: Reference PDF path
+        :type reference_file: str
+        """
+        self.pdf_import.pop(ref_uuid, None)
+        if ref_uuid == self.current_reference:
+            self.pdf_added.emit(reference_file)
+
+        self.text_indexer.start()
+
+    def pdf_import_error(self, ref_uuid, exception):
+        """ Show the error that occurred while importing a PDF
+
+        :param ref_uuid: Reference uuid
+        :type ref_uuid: str
+        :param exception: Exception raised by the import
+        :type exception: Exception
+        """
+        self.pdf_import.pop(ref_uuid, None)
+        if ref_uuid == self.current_reference:
+            self.pdf_widget.clear_form()
+
+        message = QMessageBox(QMessageBox.Warning, "Unable to save reference",
+                              "An error occurred while saving the reference PDF.", QMessageBox.Ok)
+        message.setWindowTitle("LabNote")
+        message.setDetailedText(str(exception))
+        message.exec()
 
     def remove_pdf(self):
         """ Remove the PDF from the database and file structure """
@@ -372,7 +436,9 @@ class Library(QDialog, Ui_Library):
             self.comboBox.setCurrentText('Thesis')
 
         # Show the PDF file
-        if reference['file']:
+        if reference['uuid'] in self.pdf_import:
+            self.pdf_widget.show_progress(*self.pdf_import[reference['uuid']])
+        elif reference['file']:
             file = os.path.join(directory.REFERENCES_DIRECTORY_PATH + "/{}.pdf".format(reference['uuid']))
             self.pdf_widget.show_pdf(file=file)
 
@@ -577,7 +643,6 @@ class Library(QDialog, Ui_Library):
             self.category_frame.view_tree.selectionModel().setCurrentIndex(match[0],
                                                                            QItemSelectionModel.ClearAndSelect)
             self.category_frame.view_tree.repaint()
-        self.get_tag_list()
 
     def show_field(self, text):
         """ Show the field related to a specific type of literature """
@@ -730,6 +795,13 @@ class Library(QDialog, Ui_Library):
         self.set_visible(visible)
 
     def closeEvent(self, event):
+        # Let the PDF imports finish
+        self.thread_pool.waitForDone()
+        self.text_indexer.cancel()
+
+        # Save the expanded state without the search
+        self.txt_search.clear()
+
         self.save_treeview_state()
         self.save_settings()
         self.closed.emit()
@@ -860,6 +932,18 @@ class PDFWidget(QWidget):
                 if ret == QMessageBox.Yes:
                     self.delete.emit()
 
+    def show_progress(self, done, total):
+        """ Show the progress of the PDF import
+
+        :param done: Number of bytes copied
+        :type done: int
+        :param total: File size
+        :type total: int
+        """
+        self.contains_file = True
+        self.file = None
+        self.lbl_no_pdf.set_progress(done, total)
+
     def show_pdf(self, file):
         """ Show a PDF image """
         self.contains_file = True
@@ -924,6 +1008,17 @@ class PDFLabel(QLabel):
         self.setMinimumSize(0, 0)
         self.setMaximumSize(16777215, 16777215)
 
+    def set_progress(self, done, total):
+        """ Set the import progress text
+
+        :param done: Number of bytes copied
+        :type done: int
+        :param total: File size
+        :type total: int
+        """
+        self.set_text()
+        self.setText("Importing PDF\n{}%".format(int(done * 100 / total) if total else 0))
+
     def set_icon(self):
         """ Set PDF icon """
         image = QPixmap(":/Icons/Library/icons/library/1xpdf.png")
@@ -3,20 +3,21 @@
 # Python import
 import sqlite3
 import uuid
-import os
 
 # PyQt import
 from PyQt5.QtWidgets import QDialog, QMessageBox, QFileDialog
-from PyQt5.QtCore import QSettings, Qt, QItemSelectionModel, pyqtSignal, QDir
-from PyQt5.QtGui import QIcon, QTextDocument
+from PyQt5.QtCore import QSettings, Qt, QItemSelectionModel, pyqtSignal, QDir, QUrl, QThreadPool
+from PyQt5.QtGui import QIcon, QDesktopServices
 from PyQt5.QtPrintSupport import QPrinter
 
 # Project import
 from labnote.ui.ui_protocol import Ui_Protocol
 from labnote.interface.widget.lineedit import SearchLineEdit
 from labnote.interface.widget.widget import CategoryFrame, ProtocolTextEditor, NoEntryWidget
-from labnote.core import stylesheet, common, data, sqlite_error
-from labnote.utils import database, layout, fsentry, date, pdftools
+from labnote.interface.dialog.export import ExportProgress
+from labnote.core import stylesheet, common, data, sqlite_error, cache
+from labnote.core.worker import Worker
+from labnote.utils import database, layout, fsentry, date, export, document
 from labnote.interface.library import Library
 
 
@@ -84,7 +85,12 @@ class Protocol(QDialog, Ui_Protocol):
         self.category_frame.view_tree.clicked.connect(self.selection_change)
 
     def share(self):
-        """ Share the protocol """
+        """ Share the protocol or all the protocols of the selected category """
+
+        index = self.category_frame.view_tree.selectionModel().currentIndex()
+        if self.category_frame.is_category(index) or self.category_frame.is_subcategory(index):
+            self.share_category(index)
+            return
 
         dialog = QFileDialog()
         key = self.editor.txt_key.text()
@@ -97,26 +103,55 @@ class Protocol(QDialog, Ui_Protocol):
             update = data.prepare_string(self.editor.lbl_updated.text())
             body = self.editor.txt_body.toHtml()
 
-            html = pdftools.prepare_html_pdf(title=title, key=key, date=date, update=update, body=body)
+            # Print the protocol in the background
+            page_layout = QPrinter(QPrinter.HighResolution).pageLayout()
+            worker = Worker(export.export_body_pdf, title, key, date, update, body, filename[0], page_layout)
+            worker.signals.result.connect(lambda result: QDesktopServices.openUrl(QUrl.fromLocalFile(filename[0])))
+            worker.signals.error.connect(self.share_error)
+            QThreadPool.globalInstance().start(worker)
+
+    def share_error(self, exception):
+        """ Show the error that occurred while exporting the protocol
+
+        :param exception: Exception raised while exporting
+        :type exception: Exception
+        """
+        message = QMessageBox(QMessageBox.Warning, "Unable to export protocol",
+                              "An error occurred while exporting the protocol.", QMessageBox.Ok)
+        message.setWindowTitle("LabNote")
+        message.setDetailedText(str(exception))
+        message.exec()
+
+    def share_category(self, index):
+        """ Export all the protocols of a category or a subcategory
 
-            printer = QPrinter(QPrinter.HighResolution)
-            printer.setOutputFormat(QPrinter.PdfFormat)
-            printer.setOutputFileName(filename[0])
-            document = QTextDocument()
-            document.setHtml(html)
-            document.print(printer)
+        :param index: Category or subcategory index
+        :type index: QModelIndex
+        """
+        try:
+            if self.category_frame.is_subcategory(index):
+                entry_list = export.protocol_entries(subcategory_id=index.data(Qt.UserRole))
+            else:
+                entry_list = export.protocol_entries(category_id=index.data(Qt.UserRole))
+        except sqlite3.Error as exception:
+            message = QMessageBox(QMessageBox.Warning, "Error while loading data",
+                                  "An error occurred while loading the protocols to export.", QMessageBox.Ok)
+            message.setWindowTitle("LabNote")
+            message.setDetailedText(str(exception))
+            message.exec()
+            return
 
-            os.system("open {}".format(filename[0]))
+        self.export_progress = ExportProgress(entry_list, index.data(Qt.DisplayRole), parent=self)
+        self.export_progress.start()
 
     def selection_change(self, index):
         """ Handle selection change in the category frame """
         self.clear_form()
 
-        if self.category_frame.is_category(index) or self.category_frame.is_subcategory(index):
-            self.btn_export.setEnabled(False)
-        else:
+        # The categories and subcategories are exported with all their protocols
+        if not (self.category_frame.is_category(index) or self.category_frame.is_subcategory(index)):
             self.show_protocol_details(index.data(Qt.UserRole))
-            self.btn_export.setEnabled(True)
+        self.btn_export.setEnabled(True)
 
     def show_protocol(self, prt_uuid):
         """ Show the protocol with the given uuid
@@ -150,23 +185,7 @@ class Protocol(QDialog, Ui_Protocol):
         self.category_frame.show_list()
 
     def show_reference(self, ref_uuid):
-        Library(self.tag_list, ref_uuid=ref_uuid, parent=self)
-
-    def get_tag_list(self):
-        """ Get the list of all tag """
-        tag_list = []
-
-        try:
-            tag_list = database.select_tag_list()
-        except sqlite3.Error as exception:
-            message = QMessageBox(QMessageBox.Warning, "Unable to get tag list",
-                                  "An error occurred while getting the tag list.", QMessageBox.Ok)
-            message.setWindowTitle("LabNote")
-            message.setDetailedText(str(exception))
-            message.exec()
-            return
-
-        self.tag_list = tag_list
+        Library(cache.completer_cache.entries(cache.TAG), ref_uuid=ref_uuid, parent=self)
 
     def clear_form(self):
         """ Clear all data in the form """
@@ -203,8 +222,9 @@ class Protocol(QDialog, Ui_Protocol):
     def create_editor(self, prt_uuid=None):
         """ Add the editor widget to the layout """
         layout.empty_layout(self, self.layout_entry)
-        self.editor = ProtocolTextEditor(editor_type=common.TYPE_PROTOCOL, tag_list=self.tag_list,
-                                         reference_list=self.reference_list)
+        self.editor = ProtocolTextEditor(editor_type=common.TYPE_PROTOCOL,
+                                         tag_list=cache.completer_cache.entries(cache.TAG),
+                                         reference_list=cache.completer_cache.entries(cache.REFERENCE))
         if prt_uuid:
             self.editor.txt_body.set_uuid(prt_uuid)
         self.editor.btn_save.clicked.connect(self.process_protocol)
@@ -226,7 +246,7 @@ class Protocol(QDialog, Ui_Protocol):
                 # Get the protocol content
                 name = data.prepare_string(self.editor.txt_title.toPlainText())
                 description = data.prepare_textedit(self.editor.txt_description)
-                body = self.editor.txt_body.toHtml()
+                body = document.serialize(self.editor.txt_body.document())
 
                 description_anchor = self.editor.txt_description.anchors()
                 body_anchor = self.editor.txt_body.anchors()
@@ -328,9 +348,6 @@ class Protocol(QDialog, Ui_Protocol):
         # Reset the deleted images value
         self.editor.txt_body.deleted_image = set([])
 
-        # Update the tag list
-        self.get_tag_list()
-
     def show_protocol_details(self, prt_uuid):
         """ Show a reference details when it is selected """
         try:
@@ -365,7 +382,7 @@ class Protocol(QDialog, Ui_Protocol):
 
         body = protocol['body']
         if body:
-            self.editor.txt_body.setHtml(body)
+            self.editor.txt_body.set_document(self.editor.txt_body.new_document(body))
 
     def closeEvent(self, event):
         self.save_treeview_state()
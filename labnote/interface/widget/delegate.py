@@ -0,0 +1,63 @@
+""" This module contains the item delegates used in labnote """
+
+# Python import
+
+# PyQt import
+from PyQt5.QtWidgets import QStyledItemDelegate, QStyle, QApplication
+from PyQt5.QtCore import Qt, QSize, QRect
+from PyQt5.QtGui import QColor, QPen, QPalette
+
+# Project import
+from labnote.interface.widget.model import ExperimentListModel
+
+
+class ExperimentDelegate(QStyledItemDelegate):
+    """ Paint the key and the name of an experiment on two lines
+
+    The items are painted directly so that the list does not create a widget for every experiment.
+    """
+
+    # Margin around the text and spacing between the two lines
+    MARGIN = 6
+    SPACING = 5
+
+    def __init__(self, parent=None):
+        super(ExperimentDelegate, self).__init__(parent)
+        self.separator_pen = QPen(QColor(212, 212, 212))
+
+    def sizeHint(self, option, index):
+        line_height = option.fontMetrics.height()
+        return QSize(option.rect.width(), 2 * self.MARGIN + 2 * line_height + self.SPACING)
+
+    def paint(self, painter, option, index):
+        self.initStyleOption(option, index)
+        widget = option.widget
+        style = widget.style() if widget else QApplication.style()
+
+        painter.save()
+
+        # Paint the background and the selection without the text
+        painter.fillRect(option.rect, Qt.white)
+        option.text = ""
+        style.drawPrimitive(QStyle.PE_PanelItemViewItem, option, painter, widget)
+
+        metrics = option.fontMetrics
+        line_height = metrics.height()
+        text_rect = option.rect.adjusted(self.MARGIN, self.MARGIN, -self.MARGIN, -self.MARGIN)
+        key_rect = QRect(text_rect.left(), text_rect.top(), text_rect.width(), line_height)
+        name_rect = key_rect.translated(0, line_height + self.SPACING)
+
+        painter.setFont(option.font)
+        painter.setPen(option.palette.color(QPalette.Text))
+        key = index.data(ExperimentListModel.KeyRole) or ""
+        name = index.data(Qt.DisplayRole) or ""
+        painter.drawText(key_rect, Qt.AlignLeft | Qt.AlignVCenter, metrics.elidedText(key, Qt.ElideRight,
+                                                                                       key_rect.width()))
+        painter.drawText(name_rect, Qt.AlignLeft | Qt.AlignVCenter, metrics.elidedText(name, Qt.ElideRight,
+                                                                                        name_rect.width()))
+
+        # Separator between the experiments
+        painter.setPen(self.separator_pen)
+        painter.drawLine(option.rect.bottomLeft(), option.rect.bottomRight())
+
+        painter.restore()
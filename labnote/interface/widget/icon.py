@@ -0,0 +1,51 @@
+""" This module contains the cache of the icons painted by labnote
+
+Some toolbar icons are painted with a QPainter instead of being read from the resources. Each distinct icon is painted
+once for a device pixel ratio and then shared by every widget that shows it.
+"""
+
+# PyQt import
+from PyQt5.QtGui import QPixmap
+from PyQt5.QtCore import Qt
+
+# Icons already painted, by drawing parameters and device pixel ratio
+icon_cache = {}
+
+
+def new_pixmap(width, height, dpr):
+    """ Create a transparent pixmap for an icon
+
+    The pixmap pixel ratio is set so that the icon looks good in normal as well as HiDPI screens.
+
+    :param width: Icon width in device independent pixels
+    :type width: float
+    :param height: Icon height in device independent pixels
+    :type height: float
+    :param dpr: Device pixel ratio
+    :type dpr: float
+    :return: QPixmap
+    """
+    pixmap = QPixmap(width * dpr, height * dpr)
+    pixmap.setDevicePixelRatio(dpr)
+    pixmap.fill(Qt.transparent)  # Required to create a transparent background
+    return pixmap
+
+
+def cached_icon(key, dpr, draw):
+    """ Return an icon, it is only drawn the first time it is requested
+
+    :param key: Drawing parameters that identify the icon, they must be hashable
+    :type key: tuple
+    :param dpr: Device pixel ratio
+    :type dpr: float
+    :param draw: Function called with the device pixel ratio that draws the icon
+    :type draw: callable
+    :return: QIcon or QPixmap returned by the draw function
+    """
+    cache_key = (key, dpr)
+    icon = icon_cache.get(cache_key)
+    if icon is None:
+        icon = draw(dpr)
+        icon_cache[cache_key] = icon
+    return icon
+
@@ -1,14 +1,159 @@
 """ This module contains all the models used in labnote """
 
 # Python import
+import sqlite3
 
 # PyQt import
 from PyQt5.QtGui import QStandardItemModel
+from PyQt5.QtCore import Qt, QAbstractListModel, QModelIndex, QVariant, pyqtSignal
 
 # Project import
+from labnote.core import completion, data
+from labnote.utils import database
 
 
 class StandardItemModel(QStandardItemModel):
     """ Custom standard item model class """
     def get_persistant_index_list(self):
-        return self.persistentIndexList()
\ No newline at end of file
+        return self.persistentIndexList()
+
+
+class CompletionModel(QAbstractListModel):
+    """ Model that contains the completions of the typed text only
+
+    The completions are searched in a completion index each time the typed text changes, the model is therefore used
+    with a completer that does not filter it.
+    """
+    def __init__(self, index, limit=completion.LIMIT, parent=None):
+        super(CompletionModel, self).__init__(parent)
+        self.index = index
+        self.limit = limit
+        self.prefix = None
+        self.completion_list = []
+
+    def set_prefix(self, prefix):
+        """ Search the completions of a text
+
+        :param prefix: Typed text
+        :type prefix: str
+        """
+        if prefix == self.prefix:
+            return
+
+        self.beginResetModel()
+        self.prefix = prefix
+        self.completion_list = self.index.search(prefix, self.limit)
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.completion_list)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if index.isValid() and role in (Qt.DisplayRole, Qt.EditRole):
+            return self.completion_list[index.row()]
+        return QVariant()
+
+
+class ExperimentListModel(QAbstractListModel):
+    """ Model of the experiments of a notebook
+
+    The experiments are read one page at a time when the view needs more rows. The display role is the experiment name,
+    the user role its UUID and the key role its key. The pages are read while the view is painted, the errors are
+    therefore reported by the failed signal.
+    """
+
+    # Signal definition
+    failed = pyqtSignal(object)
+
+    # Data role of the experiment key
+    KeyRole = Qt.UserRole + 2
+
+    # Number of experiments read at once
+    PAGE_SIZE = 200
+
+    def __init__(self, parent=None):
+        super(ExperimentListModel, self).__init__(parent)
+        self.nb_uuid = None
+        self.experiment_list = []
+        self.complete = True
+
+    def set_notebook(self, nb_uuid):
+        """ Show the experiments of a notebook
+
+        :param nb_uuid: Notebook UUID or None to clear the model
+        :type nb_uuid: str
+        """
+        self.beginResetModel()
+        self.nb_uuid = nb_uuid
+        self.experiment_list = []
+        self.complete = nb_uuid is None
+        self.endResetModel()
+
+        if not self.complete:
+            self.fetchMore()
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.experiment_list)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return QVariant()
+
+        experiment = self.experiment_list[index.row()]
+        if role == Qt.DisplayRole:
+            return experiment['name']
+        elif role == Qt.UserRole:
+            return data.uuid_string(experiment['exp_uuid'])
+        elif role == self.KeyRole:
+            return experiment['key']
+        return QVariant()
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self.complete
+
+    def fetchMore(self, parent=QModelIndex()):
+        """ Read the next page of experiments """
+        if parent.isValid() or self.complete:
+            return
+
+        after = None
+        if self.experiment_list:
+            last = self.experiment_list[-1]
+            after = (last['key'], last['exp_uuid'])
+
+        try:
+            page = database.get_experiment_list_notebook(data.uuid_bytes(self.nb_uuid), after=after,
+                                                         limit=self.PAGE_SIZE)
+        except sqlite3.Error as exception:
+            # The remaining experiments are not shown
+            self.complete = True
+            self.failed.emit(exception)
+            return
+
+        self.complete = len(page) < self.PAGE_SIZE
+        if page:
+            self.beginInsertRows(QModelIndex(), len(self.experiment_list), len(self.experiment_list) + len(page) - 1)
+            self.experiment_list.extend(page)
+            self.endInsertRows()
+
+    def find(self, exp_uuid):
+        """ Return the row of an experiment, the pages are read until it is found
+
+        :param exp_uuid: Experiment UUID
+        :type exp_uuid: str
+        :return int: Row or -1 when the experiment is not in the notebook
+        """
+        row = 0
+        while True:
+            for experiment in self.experiment_list[row:]:
+                if data.uuid_string(experiment['exp_uuid']) == exp_uuid:
+                    return row
+                row = row + 1
+
+            if self.complete:
+                return -1
+            self.fetchMore()
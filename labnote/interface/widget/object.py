@@ -1,13 +1,42 @@
 """ This module contains QObject subclasses used in LabNote """
 
 # Python import
+import sqlite3
+from collections import OrderedDict
 
 # PyQt import
 from PyQt5.QtWidgets import QCompleter
-from PyQt5.QtCore import Qt, QStringListModel, QRegExp
-from PyQt5.QtGui import QRegExpValidator
+from PyQt5.QtCore import Qt, QStringListModel, QRegExp, QObject, QTimer, QThread, QThreadPool, pyqtSignal
+from PyQt5.QtGui import QRegExpValidator, QImage, QPixmap, QColor
+from PyQt5.QtPrintSupport import QPrinter
 
 # Project import
+from labnote.core import data, cache
+from labnote.core.worker import Worker
+from labnote.utils import fsentry, export, collector, textindex, image, document
+
+
+def connect_until_destroyed(signal, slot, receiver):
+    """ Connect a signal of a global object to a slot that is disconnected when its receiver is destroyed
+
+    The global objects outlive the widgets, their signals would otherwise keep calling the slots of deleted widgets.
+
+    :param signal: Signal of the global object
+    :type signal: pyqtBoundSignal
+    :param slot: Slot of the receiver
+    :type slot: function
+    :param receiver: Object that owns the slot
+    :type receiver: QObject
+    """
+    def disconnect(*args):
+        try:
+            signal.disconnect(slot)
+        except TypeError:
+            # The slot is already disconnected
+            pass
+
+    signal.connect(slot)
+    receiver.destroyed.connect(disconnect)
 
 
 class SearchCompleter(QCompleter):
@@ -16,12 +45,36 @@ class SearchCompleter(QCompleter):
     def __init__(self, tag_list):
         super(SearchCompleter, self).__init__()
 
-        self.setModel(QStringListModel(tag_list))
+        self.setModel(QStringListModel(sorted(tag_list, key=str.lower)))
         self.setModelSorting(QCompleter.CaseInsensitivelySortedModel)
         self.setCaseSensitivity(Qt.CaseInsensitive)
         self.setWrapAround(False)
         self.setCompletionMode(QCompleter.PopupCompletion)
 
+        # Follow the changes of the tags
+        self.generation = cache.completer_cache.generation[cache.TAG]
+        connect_until_destroyed(cache.completer_cache.changed, self.completer_changed, self)
+
+    def completer_changed(self, kind, generation, updated, removed):
+        """ Update the tags after they changed in the database
+
+        :param kind: Completer list kind
+        :type kind: str
+        :param generation: Generation of the change
+        :type generation: int
+        :param updated: Tags added
+        :type updated: list
+        :param removed: Tags removed
+        :type removed: list
+        """
+        if kind != cache.TAG:
+            return
+
+        tag_list = cache.completer_cache.update_list(kind, generation, self.generation, self.model().stringList(),
+                                                     updated, removed)
+        self.generation = max(generation, self.generation)
+        self.model().setStringList(sorted(tag_list, key=str.lower))
+
 class NameValidator(QRegExpValidator):
     """ RegExpValidator subclass used for the names """
     def __init__(self):
@@ -34,3 +87,724 @@ class KeyValidator(QRegExpValidator):
     def __init__(self):
         super(KeyValidator, self).__init__()
         self.setRegExp(QRegExp("^[a-z]{1}[0-9a-z_-]+$"))
+
+
+class AutoSave(QObject):
+    """ Save the experiment shown in an editor in the background once the user stops typing
+
+    The documents content is read in the GUI thread when the delay expires and is written to the database and the file
+    system by a worker. Nothing is written when the documents revisions did not change since the last save.
+    """
+
+    # Delay without modification before the experiment is saved in ms
+    DELAY = 2000
+
+    # Signal definition
+    saved = pyqtSignal(str)
+    failed = pyqtSignal(str, object)
+
+    def __init__(self, parent=None):
+        super(AutoSave, self).__init__(parent)
+
+        self.editor = None
+        self.exp_uuid = None
+        self.nb_uuid = None
+        self.saved_revision = None
+        self.generation = 0
+        self.running = False
+        self.pending = False
+
+        # Saves are written one at a time so that an old content never overwrite a newer one
+        self.thread_pool = QThreadPool(self)
+        self.thread_pool.setMaxThreadCount(1)
+
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(self.DELAY)
+        self.timer.timeout.connect(self.save)
+
+    def watch(self, editor, exp_uuid, nb_uuid):
+        """ Start saving the experiment shown in the editor
+
+        :param editor: Experiment editor
+        :type editor: ExperimentTextEditor
+        :param exp_uuid: Experiment UUID
+        :type exp_uuid: str
+        :param nb_uuid: Notebook UUID
+        :type nb_uuid: str
+        """
+        self.finish()
+
+        self.editor = editor
+        self.exp_uuid = exp_uuid
+        self.nb_uuid = nb_uuid
+        self.saved_revision = self.revision()
+
+        editor.txt_title.document().contentsChange.connect(self.schedule)
+        editor.txt_description.document().contentsChange.connect(self.schedule)
+        editor.txt_body.document().contentsChange.connect(self.schedule)
+        editor.txt_key.textEdited.connect(self.schedule)
+        editor.destroyed.connect(self.stop)
+
+    def stop(self):
+        """ Stop watching the editor without saving the pending modifications """
+        self.wait()
+
+        if self.editor:
+            try:
+                self.editor.txt_title.document().contentsChange.disconnect(self.schedule)
+                self.editor.txt_description.document().contentsChange.disconnect(self.schedule)
+                self.editor.txt_body.document().contentsChange.disconnect(self.schedule)
+                self.editor.txt_key.textEdited.disconnect(self.schedule)
+                self.editor.destroyed.disconnect(self.stop)
+            except (TypeError, RuntimeError):
+                # The editor is already deleted
+                pass
+
+        self.editor = None
+        self.exp_uuid = None
+        self.nb_uuid = None
+        self.generation = self.generation + 1
+        self.running = False
+        self.pending = False
+
+    def wait(self):
+        """ Cancel the scheduled save and wait for the running one to finish """
+        self.timer.stop()
+        self.thread_pool.waitForDone()
+
+    def flush(self):
+        """ Write the pending modifications immediately """
+        if self.editor:
+            self.wait()
+
+            revision = self.revision()
+            content = self.content()
+            if content:
+                try:
+                    fsentry.save_experiment(**content)
+                except (sqlite3.Error, OSError) as exception:
+                    self.failed.emit(self.exp_uuid, exception)
+                else:
+                    self.saved_revision = revision
+                    self.saved.emit(self.exp_uuid)
+
+    def finish(self):
+        """ Write the pending modifications and stop watching the editor before it is closed """
+        self.flush()
+        self.stop()
+
+    def schedule(self, *args):
+        """ Restart the delay each time the documents are modified """
+        self.timer.start()
+
+    def revision(self):
+        """ Return the current revision of the editor content
+
+        :return: tuple
+        """
+        return (self.editor.txt_title.document().revision(), self.editor.txt_description.document().revision(),
+                self.editor.txt_body.document().revision(), self.editor.txt_key.text())
+
+    def content(self):
+        """ Read the editor content in the GUI thread
+
+        :return: dict of the save_experiment arguments or None if there is nothing to save
+        """
+        if not self.editor:
+            return None
+
+        name = data.prepare_string(self.editor.txt_title.toPlainText())
+        if self.revision() == self.saved_revision or not name:
+            return None
+
+        description_anchor = self.editor.txt_description.anchors()
+        body_anchor = self.editor.txt_body.anchors()
+
+        # Deleted images are only removed by an explicit save since the user can still undo the deletion
+        return {'exp_uuid': self.exp_uuid, 'nb_uuid': self.nb_uuid, 'name': name,
+                'exp_key': data.prepare_string(self.editor.txt_key.text()),
+                'description': data.prepare_textedit(self.editor.txt_description),
+                'body': document.serialize(self.editor.txt_body.document()), 'tag_list': description_anchor['tag'],
+                'reference_list': body_anchor['reference'], 'dataset_list': body_anchor['dataset'],
+                'protocol_list': body_anchor['protocol'], 'deleted_image': set()}
+
+    def save(self):
+        """ Save the experiment in a worker thread """
+        if self.running:
+            self.pending = True
+            return
+
+        revision = self.revision() if self.editor else None
+        content = self.content()
+        if not content:
+            return
+
+        self.running = True
+        self.pending = False
+
+        generation = self.generation
+        worker = Worker(fsentry.save_experiment, **content)
+        worker.signals.result.connect(lambda result: self.save_done(generation, revision))
+        worker.signals.error.connect(lambda exception: self.save_error(generation, exception))
+        self.thread_pool.start(worker)
+
+    def save_done(self, generation, revision):
+        """ Start the next save once the worker is done
+
+        :param generation: Watch generation of the save
+        :type generation: int
+        :param revision: Revision that was saved
+        :type revision: tuple
+        """
+        if generation == self.generation:
+            self.running = False
+            self.saved_revision = revision
+            self.saved.emit(self.exp_uuid)
+            if self.pending:
+                self.save()
+
+    def save_error(self, generation, exception):
+        """ Report an error that occurred in the worker
+
+        :param generation: Watch generation of the save
+        :type generation: int
+        :param exception: Exception raised by the worker
+        :type exception: Exception
+        """
+        if generation == self.generation:
+            self.running = False
+            self.pending = False
+            self.failed.emit(self.exp_uuid, exception)
+
+
+class DocumentCache(QObject):
+    """ Keep the recently viewed experiments parsed in memory
+
+    Each entry holds the experiment content read by fsentry, its body parsed in a document of the text edit and the
+    stamp of the experiment when it was read. An entry is only used while the stamp of the experiment is unchanged. The
+    cache is bounded by the number of entries and the number of characters of their bodies, the least recently used
+    entries are removed first.
+
+    The experiments can be prefetched, they are then read by a worker and parsed in the GUI thread one at a time when
+    the event loop is idle.
+    """
+
+    # Maximum number of entries
+    MAX_ENTRIES = 32
+
+    # Maximum number of body characters
+    MAX_SIZE = 32 * 1024 * 1024
+
+    # Number of experiments prefetched before and after the one shown
+    PREFETCH = 2
+
+    def __init__(self, textedit, parent=None):
+        super(DocumentCache, self).__init__(parent)
+
+        self.textedit = textedit
+        self.entry_dict = OrderedDict()
+        self.size = 0
+        self.generation = 0
+        self.parse_list = []
+
+        self.thread_pool = QThreadPool(self)
+        self.thread_pool.setMaxThreadCount(1)
+
+        self.parse_timer = QTimer(self)
+        self.parse_timer.setSingleShot(True)
+        self.parse_timer.setInterval(0)
+        self.parse_timer.timeout.connect(self.parse_next)
+
+    def get(self, nb_uuid, exp_uuid):
+        """ Return an experiment content and its body document, the experiment is read when it is not in the cache
+
+        :param nb_uuid: Notebook UUID
+        :type nb_uuid: str
+        :param exp_uuid: Experiment UUID
+        :type exp_uuid: str
+        :return: tuple (experiment content, QTextDocument)
+        """
+        stamp = fsentry.experiment_stamp(nb_uuid, exp_uuid)
+
+        entry = self.entry_dict.get(exp_uuid)
+        if entry and stamp is not None and entry[0] == stamp:
+            self.entry_dict.move_to_end(exp_uuid)
+            return entry[1], entry[2]
+
+        self.discard(exp_uuid)
+        experiment = fsentry.read_experiment(nb_uuid, exp_uuid)
+        return experiment, self.insert(exp_uuid, stamp, experiment)
+
+    def insert(self, exp_uuid, stamp, experiment):
+        """ Parse an experiment body and add it to the cache
+
+        :param exp_uuid: Experiment UUID
+        :type exp_uuid: str
+        :param stamp: Experiment stamp when it was read
+        :type stamp: tuple
+        :param experiment: Experiment content
+        :type experiment: dict
+        :return: QTextDocument
+        """
+        body = experiment['body'] or ""
+        body_document = self.textedit.new_document(body)
+        body_document.setProperty('cached', True)
+
+        self.entry_dict[exp_uuid] = (stamp, experiment, body_document, len(body))
+        self.size = self.size + len(body)
+
+        while len(self.entry_dict) > 1 and (len(self.entry_dict) > self.MAX_ENTRIES or self.size > self.MAX_SIZE):
+            self.discard(next(iter(self.entry_dict)))
+
+        return body_document
+
+    def discard(self, exp_uuid):
+        """ Remove an experiment from the cache
+
+        The document is deleted once the text edit does not show it anymore.
+
+        :param exp_uuid: Experiment UUID
+        :type exp_uuid: str
+        """
+        entry = self.entry_dict.pop(exp_uuid, None)
+        if entry:
+            self.size = self.size - entry[3]
+            entry[2].setProperty('cached', False)
+            if self.textedit.document() is not entry[2]:
+                entry[2].deleteLater()
+
+    def prefetch(self, nb_uuid, exp_list):
+        """ Read the experiments that are not in the cache in the background
+
+        The experiments of a previous prefetch that are not read yet are forgotten.
+
+        :param nb_uuid: Notebook UUID
+        :type nb_uuid: str
+        :param exp_list: Experiments UUID
+        :type exp_list: list of str
+        """
+        self.generation = self.generation + 1
+        self.parse_list = []
+
+        exp_list = [exp_uuid for exp_uuid in exp_list if exp_uuid not in self.entry_dict]
+        if exp_list:
+            generation = self.generation
+            worker = Worker(self.read, nb_uuid, exp_list)
+            worker.signals.result.connect(lambda result: self.read_done(generation, result))
+            self.thread_pool.start(worker)
+
+    def read(self, nb_uuid, exp_list):
+        """ Read experiments in the worker thread
+
+        :param nb_uuid: Notebook UUID
+        :type nb_uuid: str
+        :param exp_list: Experiments UUID
+        :type exp_list: list of str
+        :return: list of tuple (experiment UUID, stamp, experiment content)
+        """
+        result = []
+        for exp_uuid in exp_list:
+            try:
+                stamp = fsentry.experiment_stamp(nb_uuid, exp_uuid)
+                if stamp is not None:
+                    result.append((exp_uuid, stamp, fsentry.read_experiment(nb_uuid, exp_uuid)))
+            except (sqlite3.Error, OSError):
+                # The experiment is read again when it is shown
+                continue
+        return result
+
+    def read_done(self, generation, result):
+        """ Parse the experiments read by the worker unless another prefetch started
+
+        :param generation: Prefetch generation
+        :type generation: int
+        :param result: Experiments read
+        :type result: list
+        """
+        if generation == self.generation:
+            self.parse_list.extend(result)
+            self.parse_timer.start()
+
+    def parse_next(self):
+        """ Parse one prefetched experiment and leave the event loop process the other events before the next one """
+        if self.parse_list:
+            exp_uuid, stamp, experiment = self.parse_list.pop(0)
+            if exp_uuid not in self.entry_dict:
+                self.insert(exp_uuid, stamp, experiment)
+
+        if self.parse_list:
+            self.parse_timer.start()
+
+    def cancel(self):
+        """ Forget the pending prefetch and wait for the worker """
+        self.generation = self.generation + 1
+        self.parse_list = []
+        self.parse_timer.stop()
+        self.thread_pool.waitForDone()
+
+
+class ImageLoader(QObject):
+    """ Load the images of the text edits in the background
+
+    The display derivatives of the images are decoded by a thread pool and kept as pixmaps in a cache shared by every
+    document. The cache is bounded by the memory used by the pixmaps, the least recently used are removed first. The
+    loaded signal is emitted with the image path once it was read, its pixmap is then in the cache unless the image
+    cannot be read.
+    """
+
+    # Signal definition
+    loaded = pyqtSignal(str)
+
+    # Maximum memory used by the pixmaps in bytes
+    MAX_SIZE = 256 * 1024 * 1024
+
+    # Maximum number of placeholders kept
+    MAX_PLACEHOLDERS = 16
+
+    def __init__(self, parent=None):
+        super(ImageLoader, self).__init__(parent)
+
+        self.pixmap_dict = OrderedDict()
+        self.placeholder_dict = OrderedDict()
+        self.size = 0
+        self.pending = set([])
+
+        self.thread_pool = QThreadPool(self)
+        self.thread_pool.setMaxThreadCount(max(1, min(4, QThread.idealThreadCount())))
+
+    def pixmap(self, path):
+        """ Return the pixmap of an image
+
+        :param path: Original image path
+        :type path: str
+        :return: QPixmap or None when the image is not loaded
+        """
+        entry = self.pixmap_dict.get(path)
+        if entry is None:
+            return None
+
+        self.pixmap_dict.move_to_end(path)
+        return entry[0]
+
+    def placeholder(self, path):
+        """ Return a pixmap of the size of an image that is shown while it is loaded
+
+        :param path: Original image path
+        :type path: str
+        :return: QPixmap, null when the image cannot be read
+        """
+        size = image.display_image_size(path)
+        if not size.isValid():
+            return QPixmap()
+
+        key = (size.width(), size.height())
+        placeholder = self.placeholder_dict.get(key)
+        if placeholder is None:
+            placeholder = QPixmap(size)
+            placeholder.fill(QColor(240, 240, 240))
+            self.placeholder_dict[key] = placeholder
+            if len(self.placeholder_dict) > self.MAX_PLACEHOLDERS:
+                self.placeholder_dict.popitem(last=False)
+        return placeholder
+
+    def load(self, path):
+        """ Load an image in the background unless it is already loaded or loading
+
+        :param path: Original image path
+        :type path: str
+        """
+        if path in self.pixmap_dict or path in self.pending:
+            return
+
+        self.pending.add(path)
+        worker = Worker(self.read, path)
+        worker.signals.result.connect(lambda result: self.read_done(path, result))
+        worker.signals.error.connect(lambda exception: self.read_done(path, QImage()))
+        self.thread_pool.start(worker)
+
+    def read(self, path):
+        """ Decode the display derivative of an image in the worker thread
+
+        :param path: Original image path
+        :type path: str
+        :return: QImage
+        """
+        try:
+            return QImage(image.display_image_path(path))
+        except OSError:
+            return QImage(path)
+
+    def read_done(self, path, result):
+        """ Add an image decoded by a worker to the cache
+
+        :param path: Original image path
+        :type path: str
+        :param result: Decoded image, null when it cannot be read
+        :type result: QImage
+        """
+        self.pending.discard(path)
+        if result.isNull():
+            self.loaded.emit(path)
+            return
+
+        pixmap = QPixmap.fromImage(result)
+        size = pixmap.width() * pixmap.height() * pixmap.depth() // 8
+        self.pixmap_dict[path] = (pixmap, size)
+        self.size = self.size + size
+
+        while len(self.pixmap_dict) > 1 and self.size > self.MAX_SIZE:
+            self.size = self.size - self.pixmap_dict.popitem(last=False)[1][1]
+
+        self.loaded.emit(path)
+
+
+class BatchExport(QObject):
+    """ Export entries in PDF or HTML files with the global thread pool
+
+    Each entry is rendered in its own worker. When the entries are merged, the workers prepare the HTML of each entry
+    and a last worker writes all of them in a single file.
+    """
+
+    # Signal definition
+    progress = pyqtSignal(int, int)
+    finished = pyqtSignal(list)
+
+    def __init__(self, entry_list, destination, merge=False, file_format=export.PDF, parent=None):
+        """ Prepare the export
+
+        :param entry_list: Entries to export
+        :type entry_list: list of export.Entry
+        :param destination: Destination directory or file when the entries are merged
+        :type destination: str
+        :param merge: Merge all the entries in a single file
+        :type merge: bool
+        :param file_format: Export format, export.PDF or export.HTML
+        :type file_format: str
+        """
+        super(BatchExport, self).__init__(parent)
+
+        self.entry_list = entry_list
+        self.destination = destination
+        self.merge = merge
+        self.file_format = file_format
+        self.html_list = [None] * len(entry_list)
+        self.error_list = []
+        self.done = 0
+        self.canceled = False
+
+        # QPrinter can only be created in the GUI thread
+        self.page_layout = QPrinter(QPrinter.HighResolution).pageLayout()
+        self.thread_pool = QThreadPool.globalInstance()
+
+    def total(self):
+        """ Return the number of steps of the export
+
+        :return: int
+        """
+        if self.merge:
+            return len(self.entry_list) + 1
+        return len(self.entry_list)
+
+    def start(self):
+        """ Start the export workers """
+        if not self.entry_list:
+            self.finished.emit(self.error_list)
+            return
+
+        if self.merge:
+            for position, entry in enumerate(self.entry_list):
+                self.start_worker(entry, position, export.entry_html, entry)
+        elif self.file_format == export.HTML:
+            filename_list = export.entry_filenames(self.entry_list, self.destination, export.HTML)
+            for position, entry in enumerate(self.entry_list):
+                self.start_worker(entry, position, export.export_html, entry, filename_list[position])
+        else:
+            filename_list = export.entry_filenames(self.entry_list, self.destination)
+            for position, entry in enumerate(self.entry_list):
+                self.start_worker(entry, position, export.export_pdf, entry, filename_list[position],
+                                  self.page_layout)
+
+    def cancel(self):
+        """ Skip the entries that are not exported yet """
+        self.canceled = True
+
+    def run(self, function, *args):
+        """ Run an export function unless the export is canceled
+
+        :param function: Export function
+        :type function: function
+        :return: Function result
+        """
+        if self.canceled:
+            return None
+        return function(*args)
+
+    def start_worker(self, entry, position, function, *args):
+        """ Run an export function in the thread pool
+
+        :param entry: Exported entry
+        :type entry: export.Entry
+        :param position: Entry position
+        :type position: int
+        :param function: Export function
+        :type function: function
+        """
+        worker = Worker(self.run, function, *args)
+        worker.signals.result.connect(lambda result: self.entry_done(position, result))
+        worker.signals.error.connect(lambda exception: self.error_list.append((entry, exception)))
+        worker.signals.finished.connect(self.worker_finished)
+        self.thread_pool.start(worker)
+
+    def entry_done(self, position, result):
+        """ Keep the entry HTML when the entries are merged
+
+        :param position: Entry position
+        :type position: int
+        :param result: Export function result
+        """
+        if self.merge:
+            self.html_list[position] = result
+
+    def worker_finished(self):
+        """ Report the progress and print the merged document once all the entries are ready """
+        self.done = self.done + 1
+        self.progress.emit(self.done, self.total())
+
+        if self.done == len(self.entry_list) and self.merge and not self.canceled:
+            html_list = [html for html in self.html_list if html is not None]
+
+            if self.file_format == export.HTML:
+                worker = Worker(self.run, export.write_html, html_list, self.destination)
+            else:
+                worker = Worker(self.run, export.print_pdf, html_list, self.destination, self.page_layout)
+            worker.signals.error.connect(lambda exception: self.error_list.append((None, exception)))
+            worker.signals.finished.connect(self.worker_finished)
+            self.thread_pool.start(worker)
+        elif self.done >= self.total() or (self.canceled and self.done >= len(self.entry_list)):
+            self.finished.emit(self.error_list)
+
+
+class GarbageCollector(QObject):
+    """ Remove the resources that are not used by any entry in the background
+
+    The collection is done one step at a time by a worker and can be canceled between two steps.
+    """
+
+    # Delay after the program launch before the collection starts in ms
+    DELAY = 30000
+
+    # Signal definition
+    finished = pyqtSignal(object)
+    failed = pyqtSignal(object)
+
+    def __init__(self, parent=None):
+        super(GarbageCollector, self).__init__(parent)
+
+        self.running = False
+        self.canceled = False
+
+        self.thread_pool = QThreadPool(self)
+        self.thread_pool.setMaxThreadCount(1)
+
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(self.DELAY)
+        self.timer.timeout.connect(self.start)
+
+    def schedule(self):
+        """ Start the collection once the delay expires """
+        self.timer.start()
+
+    def start(self):
+        """ Start the collection unless it is already running """
+        self.timer.stop()
+        if self.running:
+            return
+
+        self.running = True
+        self.canceled = False
+
+        worker = Worker(self.run)
+        worker.signals.result.connect(self.collect_done)
+        worker.signals.error.connect(self.failed.emit)
+        worker.signals.finished.connect(self.worker_finished)
+        self.thread_pool.start(worker)
+
+    def cancel(self):
+        """ Stop the collection after the current step and wait for the worker """
+        self.timer.stop()
+        self.canceled = True
+        self.thread_pool.waitForDone()
+
+    def run(self):
+        """ Run the collection steps until it is done or canceled
+
+        :return collector.Report: Complete report or None when the collection is canceled
+        """
+        for report in collector.collect():
+            if self.canceled:
+                return None
+        return report
+
+    def collect_done(self, report):
+        """ Report the result of a complete collection
+
+        :param report: Collection report
+        :type report: collector.Report
+        """
+        if report is not None:
+            self.finished.emit(report)
+
+    def worker_finished(self):
+        self.running = False
+
+
+class TextIndexer(QObject):
+    """ Index the text of the reference PDF files in the background
+
+    A new indexing is done once the current one is finished when it is requested while the indexing is running.
+    """
+
+    # Signal definition
+    finished = pyqtSignal(int)
+
+    def __init__(self, parent=None):
+        super(TextIndexer, self).__init__(parent)
+
+        self.running = False
+        self.pending = False
+        self.canceled = False
+
+        self.thread_pool = QThreadPool(self)
+        self.thread_pool.setMaxThreadCount(1)
+
+    def start(self):
+        """ Start the indexing """
+        if self.running:
+            self.pending = True
+            return
+
+        self.running = True
+        self.pending = False
+        self.canceled = False
+
+        worker = Worker(textindex.index_references, canceled=lambda: self.canceled)
+        worker.signals.result.connect(self.finished.emit)
+        worker.signals.finished.connect(self.worker_finished)
+        self.thread_pool.start(worker)
+
+    def cancel(self):
+        """ Stop the indexing after the references being extracted and wait for the worker """
+        self.canceled = True
+        self.pending = False
+        self.thread_pool.waitForDone()
+
+    def worker_finished(self):
+        self.running = False
+        if self.pending and not self.canceled:
+            self.start()
+
+
+# Image loader shared by every text edit
+image_loader = ImageLoader()
@@ -3,15 +3,31 @@ This module contains the textedit subclasses used in LabNote software
 """
 
 # Python import
+import os
+import sip
 
 # PyQt import
 from PyQt5.QtWidgets import QTextEdit, QCompleter, QPlainTextEdit, QApplication
-from PyQt5.QtCore import Qt, QStringListModel, QUrl, QFileInfo, QEvent, pyqtSignal
-from PyQt5.QtGui import QTextCursor, QColor, QImage, QImageReader, QTextCharFormat
+from PyQt5.QtCore import Qt, QUrl, QFileInfo, QEvent, pyqtSignal
+from PyQt5.QtGui import QTextCursor, QColor, QImageReader, QTextCharFormat, QTextDocument, QDesktopServices
 
 # Project import
-from labnote.utils import files
-from labnote.core import common
+from labnote.utils import files, document, image, blobstore
+from labnote.core import common, cache, completion
+from labnote.interface.widget.model import CompletionModel
+from labnote.interface.widget.object import image_loader, connect_until_destroyed
+
+
+class ResourceDocument(QTextDocument):
+    """ Document whose resources are loaded by its parent text edit, which is told the document that requests them """
+
+    def loadResource(self, resource_type, name):
+        text_edit = self.parent()
+        text_edit.loading_document = self
+        try:
+            return super(ResourceDocument, self).loadResource(resource_type, name)
+        finally:
+            text_edit.loading_document = None
 
 
 class PlainTextEdit(QPlainTextEdit):
@@ -40,6 +56,13 @@ REFERENCE_COMPLETER = 21
 PROTOCOL_COMPLETER = 22
 DATASET_COMPLETER = 23
 
+# Completer started by each shortcut used with the control key
+COMPLETER_SHORTCUT = {Qt.Key_T: TAG_COMPLETER, Qt.Key_R: REFERENCE_COMPLETER,
+                      Qt.Key_D: DATASET_COMPLETER, Qt.Key_P: PROTOCOL_COMPLETER}
+
+# Keys sent to the completer popup when it is visible
+COMPLETER_KEY = (Qt.Key_Enter, Qt.Key_Return, Qt.Key_Escape, Qt.Key_Tab, Qt.Key_Backtab)
+
 
 class CompleterTextEdit(TextEdit):
     """ This class is the base subclass of QTextEdit
@@ -52,12 +75,16 @@ class CompleterTextEdit(TextEdit):
     launch = True  # Changed to false when the text is first formatted
     start_position = -1
     completer = None
+    completion_model = None
+    popup_rect = None
+    scrollbar_width = None
     completer_status = False
     completer_type = -1
     accept_tag = False
     accept_reference = False
     accept_dataset = False
     accept_protocol = False
+    anchor_cache = None
 
     def __init__(self, tag_list=None, reference_list=None, dataset_list=None, protocol_list=None):
         super(CompleterTextEdit, self).__init__()
@@ -80,64 +107,174 @@ class CompleterTextEdit(TextEdit):
             self.protocol_key_list = [protocol['key'] for protocol in protocol_list]
             self.accept_protocol = True
 
+        # Completion index of each completer, built when the completer is first used
+        self.completion_index = {}
+
+        # Follow the changes of the completer lists
+        self.completer_generation = dict(cache.completer_cache.generation)
+        connect_until_destroyed(cache.completer_cache.changed, self.completer_changed, self)
+
+    def completer_changed(self, kind, generation, updated, removed):
+        """ Update a completer list after it changed in the database
+
+        :param kind: Completer list kind
+        :type kind: str
+        :param generation: Generation of the change
+        :type generation: int
+        :param updated: Entries added or updated
+        :type updated: list
+        :param removed: Identifiers of the entries removed
+        :type removed: list
+        """
+        known_generation = self.completer_generation.get(kind, 0)
+        self.completer_generation[kind] = max(generation, known_generation)
+
+        if kind == cache.TAG and self.accept_tag:
+            self.tag_list = set(cache.completer_cache.update_list(kind, generation, known_generation,
+                                                                  self.tag_list, updated, removed))
+            self.update_completion_index(TAG_COMPLETER, self.tag_list)
+        elif kind == cache.REFERENCE and self.accept_reference:
+            self.reference_list = cache.completer_cache.update_list(kind, generation, known_generation,
+                                                                    self.reference_list, updated, removed)
+            self.reference_key_list = [reference['key'] for reference in self.reference_list]
+            self.update_completion_index(REFERENCE_COMPLETER, self.reference_key_list)
+        elif kind == cache.DATASET and self.accept_dataset:
+            self.dataset_list = cache.completer_cache.update_list(kind, generation, known_generation,
+                                                                  self.dataset_list, updated, removed)
+            self.dataset_key_list = [dataset['key'] for dataset in self.dataset_list]
+            self.update_completion_index(DATASET_COMPLETER, self.dataset_key_list)
+        elif kind == cache.PROTOCOL and self.accept_protocol:
+            self.protocol_list = cache.completer_cache.update_list(kind, generation, known_generation,
+                                                                   self.protocol_list, updated, removed)
+            self.protocol_key_list = [protocol['key'] for protocol in self.protocol_list]
+            self.update_completion_index(PROTOCOL_COMPLETER, self.protocol_key_list)
+
+    def completer_list(self, completer_type):
+        """ Return the keys of a completer
+
+        :param completer_type: Completer type
+        :type completer_type: int
+        :return: Completer keys or None when the completer is not accepted
+        """
+        if completer_type == TAG_COMPLETER and self.accept_tag:
+            return self.tag_list
+        elif completer_type == REFERENCE_COMPLETER and self.accept_reference:
+            return self.reference_key_list
+        elif completer_type == DATASET_COMPLETER and self.accept_dataset:
+            return self.dataset_key_list
+        elif completer_type == PROTOCOL_COMPLETER and self.accept_protocol:
+            return self.protocol_key_list
+        return None
+
+    def update_completion_index(self, completer_type, key_list):
+        """ Update the completion index of a completer once it is built
+
+        :param completer_type: Completer type
+        :type completer_type: int
+        :param key_list: Completer keys
+        :type key_list: list
+        """
+        index = self.completion_index.get(completer_type)
+        if index is not None:
+            index.update(key_list)
+
     def setHtml(self, html):
         QTextEdit.setHtml(self, html)
+        self.anchor_cache = None
         self.set_tag_format()
 
-    def set_tag_format(self):
-        """ Set the TextEdit base format """
-        cursor = self.textCursor()
-        cursor.setPosition(0)
+    def new_document(self, html=""):
+        """ Create a document that can be shown in the text edit
 
-        while not cursor.atEnd():
-            cursor.setPosition(cursor.selectionEnd())
-            cursor.movePosition(QTextCursor.NextCharacter, QTextCursor.KeepAnchor)
-            fmt = QTextCharFormat()
+        The document is a child of the text edit so that its resources are loaded by the text edit.
 
-            if cursor.charFormat().isAnchor():
-                href = cursor.charFormat().anchorHref().split('/')
-                prefix = href[0]
+        :param html: Serialized document or HTML content
+        :type html: str
+        :return: QTextDocument
+        """
+        new_document = ResourceDocument(self)
+        new_document.setDefaultFont(self.document().defaultFont())
+        if document.is_serialized(html):
+            document.deserialize(html, new_document)
+        else:
+            new_document.setHtml(html)
+        self.set_tag_format(new_document)
+        new_document.clearUndoRedoStacks()
+        return new_document
 
-                if prefix == 'tag':
-                    fmt.setFontUnderline(False)
-                    fmt.setBackground(QColor(182, 211, 230, 150))
-                    cursor.mergeCharFormat(fmt)
+    def set_document(self, new_document):
+        """ Show another document in the text edit
+
+        The previous document is deleted when it was created by new_document, unless it is kept in a document cache
+        which then sets its cached property.
+
+        :param new_document: Document to show
+        :type new_document: QTextDocument
+        """
+        old_document = self.document()
+        if new_document is old_document:
+            return
+
+        # The first document of the text edit is deleted by setDocument
+        created = old_document.parent() is self and not old_document.property('cached')
+
+        if self.completer_status:
+            self.stop_completer()
+        self.setDocument(new_document)
+        self.anchor_cache = None
+
+        if created:
+            old_document.deleteLater()
+
+    def set_tag_format(self, text_document=None):
+        """ Set the TextEdit base format
+
+        :param text_document: Document to format, the current document when it is None
+        :type text_document: QTextDocument
+        """
+        text_document = text_document or self.document()
+
+        fmt = QTextCharFormat()
+        fmt.setFontUnderline(False)
+        fmt.setBackground(QColor(182, 211, 230, 150))
+
+        # Find the tags before changing the format since merging the format invalidate the fragments
+        tag_fragments = []
+        for fragment in document.fragments(text_document):
+            char_format = fragment.charFormat()
+            if char_format.isAnchor() and char_format.anchorHref().split('/')[0] == 'tag':
+                tag_fragments.append((fragment.position(), fragment.length()))
+
+        cursor = QTextCursor(text_document)
+        for position, length in tag_fragments:
+            cursor.setPosition(position)
+            cursor.setPosition(position + length, QTextCursor.KeepAnchor)
+            cursor.mergeCharFormat(fmt)
 
     def keyPressEvent(self, event):
         """ Handle keypress event for the completer """
-        is_tag = ((event.modifiers() == Qt.ControlModifier) and event.key() == Qt.Key_T)
-        is_reference = ((event.modifiers() == Qt.ControlModifier) and event.key() == Qt.Key_R)
-        is_dataset = ((event.modifiers() == Qt.ControlModifier) and event.key() == Qt.Key_D)
-        is_protocol = ((event.modifiers() == Qt.ControlModifier) and event.key() == Qt.Key_P)
-        ctrlOrShift = event.modifiers() == (Qt.ControlModifier or Qt.ShiftModifier)
-
-        # Start the tag completer when the shortcut is pressed
-        if self.accept_tag and is_tag:
-            if not self.completer_status:
-                self.start_completer(self.tag_list, TAG_COMPLETER)
-            else:
-                return
+        key = event.key()
+        modifiers = event.modifiers()
+        text = event.text()
 
-        if self.accept_reference and is_reference:
-            if not self.completer_status:
-                self.start_completer(self.reference_key_list, REFERENCE_COMPLETER)
-            else:
-                return
-
-        if self.accept_dataset and is_dataset:
-            if not self.completer_status:
-                self.start_completer(self.dataset_key_list, DATASET_COMPLETER)
-            else:
+        # Text typed outside an anchor while the completer is inactive is handled by the text edit directly
+        if not self.completer_status and text and key != Qt.Key_Backspace and not modifiers & Qt.ControlModifier:
+            cursor = self.textCursor()
+            if cursor.hasSelection() or not cursor.charFormat().isAnchor():
+                QTextEdit.keyPressEvent(self, event)
                 return
 
-        if self.accept_protocol and is_protocol:
-            if not self.completer_status:
-                self.start_completer(self.protocol_key_list, PROTOCOL_COMPLETER)
-            else:
-                return
+        # Start a completer when its shortcut is pressed
+        if modifiers == Qt.ControlModifier and key in COMPLETER_SHORTCUT:
+            completer_type = COMPLETER_SHORTCUT[key]
+            completer_list = self.completer_list(completer_type)
+            if completer_list is not None:
+                if self.completer_status:
+                    return
+                self.start_completer(completer_list, completer_type)
 
         # Handle delete a tag when the completer is inactive
-        if event.key() == Qt.Key_Backspace and not self.completer_status:
+        if key == Qt.Key_Backspace and not self.completer_status:
             cursor = self.textCursor()
             if cursor.hasSelection():
                 start = cursor.selectionStart()
@@ -177,7 +314,7 @@ class CompleterTextEdit(TextEdit):
                     return
 
         # Remove the anchor format for the text added directory after an anchor
-        if event.text() and self.textCursor().charFormat().isAnchor() and not self.textCursor().hasSelection():
+        if text and self.textCursor().charFormat().isAnchor() and not self.textCursor().hasSelection():
 
             cursor = self.textCursor()
             old_position = cursor.position()
@@ -199,21 +336,18 @@ class CompleterTextEdit(TextEdit):
             return
 
         # Stop on control or shift or if the event does not contain text
-        if ctrlOrShift or not event.text():
-            if self.completer_status and self.textCursor().hasSelection() and event.key() == Qt.Key_Right:
+        if modifiers == Qt.ControlModifier or not text:
+            if self.textCursor().hasSelection() and key == Qt.Key_Right:
                 QTextEdit.keyPressEvent(self, event)
             return
 
         # Ignore keys that must be send to completer
-        if self.completer.popup().isVisible():
-            if event.key() == Qt.Key_Enter or event.key() == Qt.Key_Return or \
-                    event.key() == Qt.Key_Escape or event.key() == Qt.Key_Tab or \
-                    event.key() == Qt.Key_Backtab:
-                event.ignore()
-                return
+        if key in COMPLETER_KEY and self.completer.popup().isVisible():
+            event.ignore()
+            return
 
         # Handle delete when the tag completer is active
-        if event.key() == Qt.Key_Backspace:
+        if key == Qt.Key_Backspace:
             if self.textCursor().hasSelection():
                 QTextEdit.keyPressEvent(self, event)
                 self.stop_completer()
@@ -228,10 +362,7 @@ class CompleterTextEdit(TextEdit):
                 return
 
         # Add the tag when the end of the word is reached
-        if self.is_space(event.text()[0]) or self.is_word_separator(event.text()[0]) or \
-                event.key() == Qt.Key_Enter or event.key() == Qt.Key_Return or \
-                event.key() == Qt.Key_Escape or event.key() == Qt.Key_Tab or \
-                event.key() == Qt.Key_Backtab:
+        if self.is_space(text[0]) or self.is_word_separator(text[0]) or key in COMPLETER_KEY:
             if self.completer_type == TAG_COMPLETER:
                 self.format_completion()
             else:
@@ -250,28 +381,36 @@ class CompleterTextEdit(TextEdit):
         #    self.completer.popup().hide()
         #    return
 
+        # The popup is placed under the start of the completed text and only resized when the completions change
+        popup = self.completer.popup()
         if completion_prefix != self.completer.completionPrefix():
+            self.completion_model.set_prefix(completion_prefix)
             self.completer.setCompletionPrefix(completion_prefix)
-            self.completer.popup().setCurrentIndex(self.completer.completionModel().index(0, 0))
-
-        rect = self.cursorRect()
-        rect.setWidth(self.completer.popup().sizeHintForColumn(0) +
-                        self.completer.popup().verticalScrollBar().sizeHint().width())
-        self.completer.complete(rect)
+            popup.setCurrentIndex(self.completer.completionModel().index(0, 0))
+            self.popup_rect.setWidth(popup.sizeHintForColumn(0) + self.scrollbar_width)
+            self.completer.complete(self.popup_rect)
+        elif not popup.isVisible():
+            self.completer.complete(self.popup_rect)
 
     def anchors(self):
-        """ Return all the anchors in the current document """
-        cursor = self.textCursor()
-        cursor.setPosition(0)
+        """ Return all the anchors in the current document
+
+        The anchors are read once per format run and the result is kept until the document is modified.
+        """
+        revision = self.document().revision()
+        if self.anchor_cache and self.anchor_cache[0] == revision:
+            return {key: list(value) for key, value in self.anchor_cache[1].items()}
 
         tag_list = set([])
         reference_list = set([])
         dataset_list = set([])
         protocol_list = set([])
 
-        while cursor.movePosition(QTextCursor.NextCharacter):
-            if cursor.charFormat().isAnchor():
-                href = cursor.charFormat().anchorHref().split('/')
+        for fragment in document.fragments(self.document()):
+            char_format = fragment.charFormat()
+
+            if char_format.isAnchor():
+                href = char_format.anchorHref().split('/')
                 prefix = href[0]
                 value = href[1]
 
@@ -294,7 +433,8 @@ class CompleterTextEdit(TextEdit):
         if self.accept_protocol:
             anchor['protocol'] = list(protocol_list)
 
-        return anchor
+        self.anchor_cache = (revision, anchor)
+        return {key: list(value) for key, value in anchor.items()}
 
     def format_completion(self, *args):
         """ Format the completed text
@@ -364,20 +504,38 @@ class CompleterTextEdit(TextEdit):
             self.stop_completer()
 
     def start_completer(self, completer_list, completer_type):
-        model = QStringListModel()
-        model.setStringList(list(completer_list))
+        """ Start a completer
+
+        The completer shows the content of a completion model searched in the completion index on each key press
+        instead of filtering the whole list itself.
+
+        :param completer_list: Completer keys
+        :type completer_list: list
+        :param completer_type: Completer type
+        :type completer_type: int
+        """
+        index = self.completion_index.get(completer_type)
+        if index is None:
+            index = completion.CompletionIndex(completer_list)
+            self.completion_index[completer_type] = index
+
+        self.completion_model = CompletionModel(index)
+        self.completion_model.set_prefix('')
 
         completer = QCompleter()
-        completer.setModel(model)
-        completer.setModelSorting(QCompleter.CaseSensitivelySortedModel)
+        completer.setModel(self.completion_model)
         completer.setCaseSensitivity(Qt.CaseInsensitive)
         completer.setWrapAround(False)
-        completer.setCompletionMode(QCompleter.PopupCompletion)
+        completer.setCompletionMode(QCompleter.UnfilteredPopupCompletion)
         self.set_completer(completer)
         self.completer_status = True
         self.completer_type = completer_type
         self.start_position = self.textCursor().position()
 
+        self.popup_rect = self.cursorRect()
+        if self.scrollbar_width is None:
+            self.scrollbar_width = completer.popup().verticalScrollBar().sizeHint().width()
+
     def stop_completer(self):
         self.completer.setWidget(None)
         self.completer_status = False
@@ -396,10 +554,16 @@ class CompleterTextEdit(TextEdit):
         self.completer.activated.connect(self.insert_completion)
 
     def insert_completion(self, completion):
-        """ Insert the completed word """
-        extra = len(completion) - len(self.completer.completionPrefix())
-        if extra != 0:
-            self.textCursor().insertText(completion[-extra:])
+        """ Insert the completed word
+
+        The typed text is replaced since a completion does not always start with it.
+        """
+        cursor = self.textCursor()
+        current_position = cursor.position()
+        cursor.setPosition(self.start_position)
+        cursor.setPosition(current_position, QTextCursor.KeepAnchor)
+        cursor.insertText(completion)
+        self.setTextCursor(cursor)
         self.format_completion()
 
     def select_anchor(self):
@@ -485,7 +649,6 @@ class ImageTextEdit(CompleterTextEdit):
     accept_image = False
     uuid = None
     parent_uuid = None
-    deleted_image = set([])
 
     # Signals
     reference_pressed = pyqtSignal(str)
@@ -496,9 +659,15 @@ class ImageTextEdit(CompleterTextEdit):
         super(ImageTextEdit, self).__init__(reference_list=reference_list,
                                             dataset_list=dataset_list, protocol_list=protocol_list)
         self.editor_type = editor_type
+        self.deleted_image = set([])
         self.viewport().setMouseTracking(True)
         self.viewport().installEventFilter(self)
 
+        # Images shown with a placeholder until they are loaded, by path, and the document that is loading a resource
+        self.pending_image = {}
+        self.loading_document = None
+        connect_until_destroyed(image_loader.loaded, self.image_loaded, self)
+
     def eventFilter(self, object, event):
         if event.type() == QEvent.MouseButtonPress:
             anchor = self.anchorAt(event.pos())
@@ -529,8 +698,14 @@ class ImageTextEdit(CompleterTextEdit):
         self.uuid = uuid
         self.parent_uuid = parent_uuid
 
+    def clear_uuid(self):
+        """ Stop accepting images, for example before the editor is used for another entry """
+        self.accept_image = False
+        self.uuid = None
+        self.parent_uuid = None
+
     def keyPressEvent(self, event):
-        if event.key() == Qt.Key_Backspace:
+        if event.key() in (Qt.Key_Backspace, Qt.Key_Delete):
             cursor = self.textCursor()
             if cursor.hasSelection():
                 start = cursor.selectionStart()
@@ -541,6 +716,9 @@ class ImageTextEdit(CompleterTextEdit):
                     if cursor.charFormat().isImageFormat():
                         self.deleted_image.add(cursor.charFormat().toImageFormat().name())
             else:
+                # The format is the one of the character before the cursor
+                if event.key() == Qt.Key_Delete:
+                    cursor.movePosition(QTextCursor.NextCharacter)
                 if cursor.charFormat().isImageFormat():
                     self.deleted_image.add(cursor.charFormat().toImageFormat().name())
 
@@ -584,6 +762,8 @@ class ImageTextEdit(CompleterTextEdit):
     def insert_image(self, url):
         """ Insert image in the document
 
+        The original image is copied in the resources and the document shows its display derivative.
+
         :param url: File url
         :type url: QUrl
         """
@@ -596,15 +776,92 @@ class ImageTextEdit(CompleterTextEdit):
                                                   path=url.toLocalFile(),
                                                   extention=QFileInfo(url.toLocalFile()).suffix())
         if path:
-            image = QImage(path)
-            if image:
+            # Read the size without decoding the image, the display derivative is created in the background
+            size = image.display_image_size(path)
+            if size.isValid():
                 self.textCursor().insertImage(path)
 
                 cursor = self.textCursor()
                 cursor.setPosition(self.textCursor().position()-1)
                 cursor.setPosition(self.textCursor().position(), QTextCursor.KeepAnchor)
                 fmt = cursor.charFormat().toImageFormat()
-                fmt.setWidth(image.width())
-                fmt.setHeight(image.height())
+                fmt.setWidth(size.width())
+                fmt.setHeight(size.height())
                 cursor.setCharFormat(fmt)
                 self.setTextCursor(cursor)
+
+    def loadResource(self, resource_type, name):
+        """ Load the display derivative of the images instead of the original
+
+        The images are decoded in the background, a placeholder of their size is returned until they are loaded.
+
+        :param resource_type: Resource type
+        :type resource_type: int
+        :param name: Resource name
+        :type name: QUrl
+        :return: Resource
+        """
+        if resource_type == QTextDocument.ImageResource:
+            path = name.toLocalFile() or name.toString()
+            if os.path.isfile(path):
+                pixmap = image_loader.pixmap(path)
+                if pixmap is not None:
+                    return pixmap
+
+                placeholder = image_loader.placeholder(path)
+                if not placeholder.isNull():
+                    text_document = self.loading_document or self.document()
+                    self.pending_image.setdefault(path, []).append((text_document, QUrl(name), placeholder.size()))
+                    image_loader.load(path)
+                    return placeholder
+
+        return super(ImageTextEdit, self).loadResource(resource_type, name)
+
+    def image_loaded(self, path):
+        """ Replace the placeholder of an image by the loaded image in the documents that requested it
+
+        Only these documents keep a reference to the pixmap, it is freed once they and the image loader release it.
+
+        :param path: Original image path
+        :type path: str
+        """
+        pending_list = self.pending_image.pop(path, None)
+        pixmap = image_loader.pixmap(path)
+        if not pending_list or pixmap is None:
+            return
+
+        for text_document, url, size in pending_list:
+            # The documents parsed in advance can be deleted by the document cache while the image is loaded
+            if sip.isdeleted(text_document):
+                continue
+
+            text_document.addResource(QTextDocument.ImageResource, url, pixmap)
+
+            # The layout used the size of the placeholder
+            if size != pixmap.size():
+                text_document.markContentsDirty(0, text_document.characterCount())
+
+        self.viewport().update()
+
+    def mouseDoubleClickEvent(self, event):
+        """ Open the original image when an image is double clicked """
+        cursor = self.cursorForPosition(event.pos())
+        fmt = cursor.charFormat()
+
+        # The cursor is after the character when it is on the right half of the image
+        if not fmt.isImageFormat() and not cursor.atEnd():
+            cursor.movePosition(QTextCursor.NextCharacter)
+            fmt = cursor.charFormat()
+
+        if fmt.isImageFormat():
+            path = fmt.toImageFormat().name()
+            if os.path.isfile(path):
+                # The application can modify its own copy of the image, the blob is shared by other entries
+                try:
+                    blobstore.detach_file(path)
+                except OSError:
+                    pass
+                QDesktopServices.openUrl(QUrl.fromLocalFile(path))
+                return
+
+        super(ImageTextEdit, self).mouseDoubleClickEvent(event)
@@ -2,6 +2,7 @@
 
 # Python import
 import sqlite3
+import collections
 import sip
 
 # PyQt import
@@ -9,16 +10,18 @@ from PyQt5.QtWidgets import QWidget, QLabel, QVBoxLayout, QFrame, QHBoxLayout, Q
     QMessageBox, QAbstractItemView, QPlainTextEdit, QCompleter
 from PyQt5.QtGui import QPixmap, QFont, QStandardItem, QColor, QTextCharFormat, QBrush, QPainter, QPen, QIcon, \
     QTextListFormat, QPainterPath, QTextDocument, QRegExpValidator, QTextCursor
-from PyQt5.QtCore import Qt, pyqtSignal, QModelIndex, QRectF, QEvent, QRegExp, QItemSelectionModel
+from PyQt5.QtCore import Qt, pyqtSignal, QModelIndex, QRectF, QEvent, QRegExp, QItemSelectionModel, QStringListModel, \
+    QTimer
 
 # Project import
 from labnote.core import stylesheet
+from labnote.interface.widget.icon import new_pixmap, cached_icon
 from labnote.interface.widget.view import DragDropTreeView
 from labnote.interface.widget.model import StandardItemModel
 from labnote.interface.dialog.category import Category, Subcategory
 from labnote.interface.widget.textedit import CompleterTextEdit, ImageTextEdit
 from labnote.interface.widget.lineedit import LineEdit
-from labnote.utils import database
+from labnote.utils import database, date
 from labnote.core import sqlite_error, common
 from labnote.ui.widget.ui_texteditor import Ui_TextEditor
 
@@ -42,6 +45,11 @@ LEVEL_CATEGORY = common.LEVEL_CATEGORY
 LEVEL_SUBCATEGORY = common.LEVEL_SUBCATEGORY
 LEVEL_ENTRY = common.LEVEL_ENTRY
 
+# Format shown by the text editor buttons
+ButtonState = collections.namedtuple('ButtonState', ['bold', 'italic', 'underline', 'strikethrough',
+                                                     'vertical_alignment', 'highlight', 'color', 'list', 'image_size',
+                                                     'alignment'])
+
 
 class NoEntryWidget(QWidget):
     """Widget that indicate that no entry is selected """
@@ -422,44 +430,14 @@ class CategoryFrame(QWidget):
 
                         if subcategory.entry:
                             for entry in subcategory.entry:
-                                author = None
-                                label = ""
-                                if entry.author:
-                                    author_list = entry.author.split(',')
-                                    label = "{}".format(author_list[0].split()[len(author_list[0].split()) - 1])
-                                if entry.year:
-                                    if label != "":
-                                        label = "{} ({})".format(label, entry.year)
-                                    else:
-                                        label = "({})".format(entry.year)
-                                if entry.title:
-                                    if label != "":
-                                        label = "{}, {}".format(label, entry.title)
-                                    else:
-                                        label = "{}".format(entry.title)
-                                reference_item = QStandardItem(label)
+                                reference_item = QStandardItem(entry.label)
                                 reference_item.setData(entry.uuid, Qt.UserRole)
                                 reference_item.setData(LEVEL_ENTRY, QT_LevelRole)
                                 reference_item.setForeground(QColor(96, 96, 96))
                                 subcategory_item.appendRow(reference_item)
                 if category.entry:
                     for reference in category.entry:
-                        author = None
-                        label = ""
-                        if reference.author:
-                            author = reference.author.split()[0]
-                            label = "{}".format(author)
-                        if reference.year:
-                            if label != "":
-                                label = "{} ({})".format(label, reference.year)
-                            else:
-                                label = "({})".format(reference.year)
-                        if reference.title:
-                            if label != "":
-                                label = "{}, {}".format(label, reference.title)
-                            else:
-                                label = "{}".format(reference.title)
-                        reference_item = QStandardItem(label)
+                        reference_item = QStandardItem(reference.label)
                         reference_item.setData(reference.uuid, Qt.UserRole)
                         reference_item.setData(LEVEL_ENTRY, QT_LevelRole)
                         reference_item.setForeground(QColor(96, 96, 96))
@@ -583,6 +561,25 @@ class CategoryFrame(QWidget):
         else:
             return None
 
+    def filter_entries(self, uuid_list=None):
+        """ Hide the entries that are not in a list
+
+        :param uuid_list: UUID of the entries to show, every entry is shown when it is None
+        :type uuid_list: set
+        """
+        model = self.view_tree.model()
+        parent_list = [model.index(row, 0) for row in range(model.rowCount())]
+
+        while parent_list:
+            parent = parent_list.pop()
+            for row in range(model.rowCount(parent)):
+                index = model.index(row, 0, parent)
+                if index.data(QT_LevelRole) == LEVEL_ENTRY:
+                    self.view_tree.setRowHidden(row, parent, uuid_list is not None and
+                                                index.data(Qt.UserRole) not in uuid_list)
+                else:
+                    parent_list.append(index)
+
     def get_user_data(self):
         """ Return the data in the current item for user role """
         index = self.view_tree.selectionModel().currentIndex()
@@ -621,6 +618,10 @@ class TextEditor(QWidget, Ui_TextEditor):
 
     # Class variable definition
     width_height_ratio = 1
+    button_state = None
+
+    # Minimum delay between two button updates while the cursor moves, in milliseconds
+    BUTTON_UPDATE_DELAY = 16
 
     def __init__(self, editor_type, tag_list=None, reference_list=None, dataset_list=None, protocol_list=None):
         super(TextEditor, self).__init__()
@@ -842,21 +843,13 @@ class TextEditor(QWidget, Ui_TextEditor):
                                    ":/StyleSheet/Widget/style-sheet/widget/widget/text_editor_button_frame.qss")
 
         # Superscript button text
-        text = QTextDocument()
-        text.setHtml("<p style = color:#484848 >X<sup>&thinsp;2</sup></p>")
-
-        pixmap = self.draw_text(text)
-        icon = QIcon(pixmap)
-        self.btn_superscript.setIcon(icon)
+        pixmap = self.draw_text("<p style = color:#484848 >X<sup>&thinsp;2</sup></p>")
+        self.btn_superscript.setIcon(QIcon(pixmap))
         self.btn_superscript.setIconSize(pixmap.rect().size() / self.devicePixelRatioF())
 
         # Subscript button text
-        text = QTextDocument()
-        text.setHtml("<p style = color:#484848 >X<sub>&thinsp;2</sub></p>")
-
-        pixmap = self.draw_text(text)
-        icon = QIcon(pixmap)
-        self.btn_subscript.setIcon(icon)
+        pixmap = self.draw_text("<p style = color:#484848 >X<sub>&thinsp;2</sub></p>")
+        self.btn_subscript.setIcon(QIcon(pixmap))
         self.btn_subscript.setIconSize(pixmap.rect().size() / self.devicePixelRatioF())
 
         # Default color icons
@@ -870,6 +863,12 @@ class TextEditor(QWidget, Ui_TextEditor):
         self.txt_body.installEventFilter(self)
         self.txt_description.setVisible(False)
 
+        # The buttons are updated at most once per frame when the cursor moves
+        self.button_timer = QTimer(self)
+        self.button_timer.setSingleShot(True)
+        self.button_timer.setInterval(self.BUTTON_UPDATE_DELAY)
+        self.button_timer.timeout.connect(lambda: self.update_button(changed_only=True))
+
     def init_connection(self):
         self.btn_bold.clicked.connect(self.format_bold)
         self.btn_italic.clicked.connect(self.format_italic)
@@ -884,7 +883,7 @@ class TextEditor(QWidget, Ui_TextEditor):
         self.color_menu.triggered.connect(self.format_text_color)
         self.highlight_menu.triggered.connect(self.format_highlight)
         self.style_menu.triggered.connect(self.format_style)
-        self.txt_body.cursorPositionChanged.connect(self.update_button)
+        self.txt_body.cursorPositionChanged.connect(self.schedule_button_update)
         self.txt_width.textEdited.connect(self.update_height)
         self.txt_height.textEdited.connect(self.update_width)
         self.txt_width.editingFinished.connect(self.update_image_size)
@@ -893,6 +892,13 @@ class TextEditor(QWidget, Ui_TextEditor):
         self.btn_center.clicked.connect(self.format_align_center)
         self.btn_justify.clicked.connect(self.format_align_justify)
 
+        # The buttons toggled by the user no longer match the last update
+        for button in (self.btn_bold, self.btn_italic, self.btn_underline, self.btn_strikethrough,
+                       self.btn_superscript, self.btn_subscript, self.btn_list):
+            button.clicked.connect(self.forget_button_state)
+        for menu in (self.highlight_menu, self.color_menu, self.list_menu):
+            menu.triggered.connect(self.forget_button_state)
+
     def update_height(self):
         """ Update height value when the width is changed """
         if self.txt_width.text():
@@ -928,6 +934,61 @@ class TextEditor(QWidget, Ui_TextEditor):
                 self.edit_body()
         return QWidget.eventFilter(self, object, event)
 
+    def reset(self):
+        """ Clear the editor so that it can be used for another entry
+
+        The body document is replaced by an empty one so that the undo history of the previous entry is discarded.
+        """
+        self.txt_title.clear()
+        self.txt_key.clear()
+        self.txt_description.clear()
+        self.lbl_created.clear()
+        self.lbl_updated.clear()
+
+        self.txt_body.set_document(self.txt_body.new_document())
+        self.txt_body.deleted_image.clear()
+        self.txt_body.clear_uuid()
+
+        # Show the interface elements as in a new editor
+        self.icon_frame.setVisible(False)
+        self.txt_description.setVisible(False)
+        self.txt_key.setVisible(False)
+
+    def load(self, entry, body_document=None):
+        """ Show an entry in the editor
+
+        :param entry: Entry content as returned by fsentry
+        :type entry: dict
+        :param body_document: Document of the body already parsed, it is created from the entry body when it is None
+        :type body_document: QTextDocument
+        """
+        self.txt_key.setText(entry['key'])
+
+        if entry['name']:
+            self.txt_title.setPlainText(entry['name'])
+        else:
+            self.txt_title.clear()
+
+        if entry['description']:
+            self.txt_description.setHtml(entry['description'])
+        else:
+            self.txt_description.clear()
+
+        if entry['created']:
+            self.lbl_created.setText("Original : {}".format(date.utc_to_local(entry['created'])))
+        else:
+            self.lbl_created.clear()
+
+        if entry['updated']:
+            self.lbl_updated.setText("Last update : {}".format(date.utc_to_local(entry['updated'])))
+        else:
+            self.lbl_updated.clear()
+
+        if body_document is None:
+            body_document = self.txt_body.new_document(entry['body'] or "")
+        self.txt_body.set_document(body_document)
+        self.txt_body.deleted_image.clear()
+
     def edit_title(self):
         """ Show the interface element required to edit title """
         self.icon_frame.setVisible(False)
@@ -975,105 +1036,67 @@ class TextEditor(QWidget, Ui_TextEditor):
 
         :param separator_list: List of the bullets
         :type separator_list: List[str]
-        :returns:  QPixmap -- Icon pixmap
+        :returns:  QIcon -- Icon
         """
-        # Create a base pixmap
-        # Set the pixmap pixel ratio so that the image looks good in normal as well as HiDPI screens
-        dpr = self.devicePixelRatioF()
-        pixmap = QPixmap(16 * dpr, 16 * dpr)
-        pixmap.setDevicePixelRatio(dpr)
-        pixmap.fill(Qt.transparent)  # Required to create a transparent background
-
-        # Paint the elements of the icon
-        painter = QPainter(pixmap)
-        painter.setFont(QFont(self.font().family(), 5, 50))
-        pen = QPen(QColor(72, 72, 72), 1)
-        painter.setPen(pen)
-        painter.drawLine(7, 3, 15, 3)
-        painter.drawText(0, 0, 32, 22, Qt.AlignLeft, separator_list[0])
-        painter.drawLine(7, 8, 15, 8)
-        painter.drawText(0, 5, 32, 22, Qt.AlignLeft, separator_list[1])
-        painter.drawLine(7, 13, 15, 13)
-        painter.drawText(0, 10, 32, 22, Qt.AlignLeft, separator_list[2])
-        painter.end()
-
-        return QIcon(pixmap)
+        family = self.font().family()
+
+        def draw(dpr):
+            pixmap = new_pixmap(16, 16, dpr)
+
+            # Paint the elements of the icon
+            painter = QPainter(pixmap)
+            painter.setFont(QFont(family, 5, 50))
+            pen = QPen(QColor(72, 72, 72), 1)
+            painter.setPen(pen)
+            painter.drawLine(7, 3, 15, 3)
+            painter.drawText(0, 0, 32, 22, Qt.AlignLeft, separator_list[0])
+            painter.drawLine(7, 8, 15, 8)
+            painter.drawText(0, 5, 32, 22, Qt.AlignLeft, separator_list[1])
+            painter.drawLine(7, 13, 15, 13)
+            painter.drawText(0, 10, 32, 22, Qt.AlignLeft, separator_list[2])
+            painter.end()
+
+            return QIcon(pixmap)
+
+        return cached_icon(('list', family, tuple(separator_list)), self.devicePixelRatioF(), draw)
+
+    def draw_lines(self, line_list):
+        """ Draw an icon made of horizontal lines such as the align icons
+
+        :param line_list: Start and end of the lines as (x1, y1, x2, y2)
+        :type line_list: tuple
+        :returns: QIcon -- Icon
+        """
+        def draw(dpr):
+            pixmap = new_pixmap(16, 16, dpr)
+
+            # Paint the elements of the icon
+            painter = QPainter(pixmap)
+            pen = QPen(QColor(72, 72, 72), 1)
+            painter.setPen(pen)
+            for line in line_list:
+                painter.drawLine(*line)
+            painter.end()
+
+            return QIcon(pixmap)
+
+        return cached_icon(('lines', line_list), self.devicePixelRatioF(), draw)
 
     def draw_left(self):
         """ Draw the icon for the align left button """
-        dpr = self.devicePixelRatioF()
-        pixmap = QPixmap(16 * dpr, 16 * dpr)
-        pixmap.setDevicePixelRatio(dpr)
-        pixmap.fill(Qt.transparent)  # Required to create a transparent background
-
-        # Paint the elements of the icon
-        painter = QPainter(pixmap)
-        pen = QPen(QColor(72, 72, 72), 1)
-        painter.setPen(pen)
-        painter.drawLine(2, 3, 15, 3)
-        painter.drawLine(2, 6, 11, 6)
-        painter.drawLine(2, 9, 15, 9)
-        painter.drawLine(2, 12, 13, 12)
-        painter.end()
-
-        return QIcon(pixmap)
+        return self.draw_lines(((2, 3, 15, 3), (2, 6, 11, 6), (2, 9, 15, 9), (2, 12, 13, 12)))
 
     def draw_center(self):
-        """ Draw the icon for the align left button """
-        dpr = self.devicePixelRatioF()
-        pixmap = QPixmap(16 * dpr, 16 * dpr)
-        pixmap.setDevicePixelRatio(dpr)
-        pixmap.fill(Qt.transparent)  # Required to create a transparent background
-
-        # Paint the elements of the icon
-        painter = QPainter(pixmap)
-        pen = QPen(QColor(72, 72, 72), 1)
-        painter.setPen(pen)
-        painter.drawLine(2, 3, 15, 3)
-        painter.drawLine(5, 6, 11, 6)
-        painter.drawLine(2, 9, 15, 9)
-        painter.drawLine(4, 12, 13, 12)
-        painter.end()
-
-        return QIcon(pixmap)
+        """ Draw the icon for the align center button """
+        return self.draw_lines(((2, 3, 15, 3), (5, 6, 11, 6), (2, 9, 15, 9), (4, 12, 13, 12)))
 
     def draw_right(self):
-        """ Draw the icon for the align left button """
-        dpr = self.devicePixelRatioF()
-        pixmap = QPixmap(16 * dpr, 16 * dpr)
-        pixmap.setDevicePixelRatio(dpr)
-        pixmap.fill(Qt.transparent)  # Required to create a transparent background
-
-        # Paint the elements of the icon
-        painter = QPainter(pixmap)
-        pen = QPen(QColor(72, 72, 72), 1)
-        painter.setPen(pen)
-        painter.drawLine(3, 3, 15, 3)
-        painter.drawLine(6, 6, 15, 6)
-        painter.drawLine(2, 9, 15, 9)
-        painter.drawLine(4, 12, 15, 12)
-        painter.end()
-
-        return QIcon(pixmap)
+        """ Draw the icon for the align right button """
+        return self.draw_lines(((3, 3, 15, 3), (6, 6, 15, 6), (2, 9, 15, 9), (4, 12, 15, 12)))
 
     def draw_justify(self):
-        """ Draw the icon for the align left button """
-        dpr = self.devicePixelRatioF()
-        pixmap = QPixmap(16 * dpr, 16 * dpr)
-        pixmap.setDevicePixelRatio(dpr)
-        pixmap.fill(Qt.transparent)  # Required to create a transparent background
-
-        # Paint the elements of the icon
-        painter = QPainter(pixmap)
-        pen = QPen(QColor(72, 72, 72), 1)
-        painter.setPen(pen)
-        painter.drawLine(2, 3, 15, 3)
-        painter.drawLine(2, 6, 15, 6)
-        painter.drawLine(2, 9, 15, 9)
-        painter.drawLine(2, 12, 15, 12)
-        painter.end()
-
-        return QIcon(pixmap)
+        """ Draw the icon for the justify button """
+        return self.draw_lines(((2, 3, 15, 3), (2, 6, 15, 6), (2, 9, 15, 9), (2, 12, 15, 12)))
 
     def change_text_color_button_icon(self, action):
         """Change the text color button icon to the selected color
@@ -1130,37 +1153,38 @@ class TextEditor(QWidget, Ui_TextEditor):
         :type fill: QColor
         :param border: Border color.
         :type border: QColor
-        :returns:  QPixmap -- Icon pixmap
+        :returns:  QIcon -- Icon
         """
-        # Create a base pixmap
-        # Set the pixmap pixel ratio so that the image looks good in normal as well as HiDPI screens
-        dpr = self.devicePixelRatioF()
-        pixmap = QPixmap(16 * dpr, 16 * dpr)
-        pixmap.setDevicePixelRatio(dpr)
-        pixmap.fill(Qt.transparent)
-
-        # Paint the elements of the icon
-        painter = QPainter(pixmap)
-        painter.setRenderHint(QPainter.Antialiasing)
-        path = QPainterPath()
-        path.addRoundedRect(QRectF(2, 2, 12, 12), 2, 2)
-
-        pen = QPen(border, 1)
-        painter.setPen(pen)
-        painter.fillPath(path, fill)
-        painter.drawPath(path)
-        painter.end()
-
-        return QIcon(pixmap)
-
-    def draw_text(self, text):
+        fill = QColor(fill)
+        border = QColor(border)
+
+        def draw(dpr):
+            pixmap = new_pixmap(16, 16, dpr)
+
+            # Paint the elements of the icon
+            painter = QPainter(pixmap)
+            painter.setRenderHint(QPainter.Antialiasing)
+            path = QPainterPath()
+            path.addRoundedRect(QRectF(2, 2, 12, 12), 2, 2)
+
+            pen = QPen(border, 1)
+            painter.setPen(pen)
+            painter.fillPath(path, fill)
+            painter.drawPath(path)
+            painter.end()
+
+            return QIcon(pixmap)
+
+        return cached_icon(('color', fill.rgba(), border.rgba()), self.devicePixelRatioF(), draw)
+
+    def draw_text(self, html):
         """Draw an icon from a html text and return it as a pixmap.
 
         .. note::
             This function handle HiDPI as well a regular screen.
 
-        :param text: QTextDocument with HTML code for the icon.
-        :type text: QTextDocument
+        :param html: HTML code for the icon.
+        :type html: str
         :returns:  QPixmap -- Returns pixmap that can be used to create the icon
 
         .. note::
@@ -1168,19 +1192,19 @@ class TextEditor(QWidget, Ui_TextEditor):
             a good sized icon. This should therefore not be changed unless the the output icon size is right (it is
             currently too small).
         """
-        # Create a base pixmap
-        # Set the pixmap pixel ratio so that the image looks good in normal as well as HiDPI screens
-        dpr = self.devicePixelRatioF()
-        pixmap = QPixmap(text.size().width() * dpr, text.size().height() * dpr)
-        pixmap.setDevicePixelRatio(dpr)
-        pixmap.fill(Qt.transparent)
+        def draw(dpr):
+            text = QTextDocument()
+            text.setHtml(html)
+            pixmap = new_pixmap(text.size().width(), text.size().height(), dpr)
 
-        # Paint the elements of the icon
-        painter = QPainter(pixmap)
-        text.drawContents(painter, QRectF(pixmap.rect()))
-        painter.end()
+            # Paint the elements of the icon
+            painter = QPainter(pixmap)
+            text.drawContents(painter, QRectF(pixmap.rect()))
+            painter.end()
 
-        return pixmap
+            return pixmap
+
+        return cached_icon(('text', html), self.devicePixelRatioF(), draw)
 
     def merge_format_on_word_or_selection(self, fmt):
         """ Change the caracter format when a format button is pressed.
@@ -1432,127 +1456,131 @@ class TextEditor(QWidget, Ui_TextEditor):
 
         self.merge_format_on_word_or_selection(fmt=fmt)
 
-    def update_button(self):
-        """ Set the button states to match the selected text format """
-
-        # Get text format
-        cfmt = self.txt_body.textCursor().charFormat()
+    def schedule_button_update(self):
+        """ Update the buttons once the cursor stops moving or at the next frame """
+        if not self.button_timer.isActive():
+            self.button_timer.start()
 
-        # Bold button
-        if cfmt.fontWeight() == 75:
-            self.btn_bold.setChecked(True)
-        else:
-            self.btn_bold.setChecked(False)
+    def forget_button_state(self):
+        """ Update every button the next time, their state was changed by the user """
+        self.button_state = None
 
-        # Italic button
-        if cfmt.fontItalic():
-            self.btn_italic.setChecked(True)
-        else:
-            self.btn_italic.setChecked(False)
+    def read_button_state(self):
+        """ Return the format of the text at the cursor position
 
-        # Underline button
-        if cfmt.fontUnderline():
-            self.btn_underline.setChecked(True)
-        else:
-            self.btn_underline.setChecked(False)
-
-        # Strikethrough button
-        if cfmt.fontStrikeOut():
-            self.btn_strikethrough.setChecked(True)
-        else:
-            self.btn_strikethrough.setChecked(False)
-
-        # Superscript button
-        if cfmt.verticalAlignment() == QTextCharFormat.AlignSuperScript:
-            self.btn_superscript.setChecked(True)
-        else:
-            self.btn_superscript.setChecked(False)
-
-        # Subscript button
-        if cfmt.verticalAlignment() == QTextCharFormat.AlignSubScript:
-            self.btn_subscript.setChecked(True)
-        else:
-            self.btn_subscript.setChecked(False)
+        :returns: ButtonState
+        """
+        cursor = self.txt_body.textCursor()
+        cfmt = cursor.charFormat()
 
-        # Get color format
         # Background color
         background_color = cfmt.background().color()
         if background_color.rgb() == common.HIGHLIGHT_COLOR['red'].color.rgb():
-            self.change_highlight_button_icon(self.act_red_highlight)
+            highlight = self.act_red_highlight
         elif background_color.rgb() == common.HIGHLIGHT_COLOR['orange'].color.rgb():
-            self.change_highlight_button_icon(self.act_orange_highlight)
+            highlight = self.act_orange_highlight
         elif background_color.rgb() == common.HIGHLIGHT_COLOR['yellow'].color.rgb():
-            self.change_highlight_button_icon(self.act_yellow_highlight)
+            highlight = self.act_yellow_highlight
         elif background_color.rgb() == common.HIGHLIGHT_COLOR['green'].color.rgb():
-            self.change_highlight_button_icon(self.act_green_highlight)
+            highlight = self.act_green_highlight
         elif background_color.rgb() == common.HIGHLIGHT_COLOR['blue'].color.rgb():
-            self.change_highlight_button_icon(self.act_blue_highlight)
+            highlight = self.act_blue_highlight
         elif background_color.rgb() == common.HIGHLIGHT_COLOR['purple'].color.rgb():
-            self.change_highlight_button_icon(self.act_purple_highlight)
+            highlight = self.act_purple_highlight
         elif background_color.rgb() == common.HIGHLIGHT_COLOR['gray'].color.rgb():
-            self.change_highlight_button_icon(self.act_gray_highlight)
+            highlight = self.act_gray_highlight
         else:
-            self.change_highlight_button_icon(self.act_clear_highlight)
+            highlight = self.act_clear_highlight
 
         # Text color
         text_color = cfmt.foreground().color()
-
         if text_color == common.TEXT_COLOR['gray'].color:
-            self.change_text_color_button_icon(self.act_gray_text)
+            color = self.act_gray_text
         elif text_color == common.TEXT_COLOR['red'].color:
-            self.change_text_color_button_icon(self.act_red_text)
+            color = self.act_red_text
         elif text_color == common.TEXT_COLOR['orange'].color:
-            self.change_text_color_button_icon(self.act_orange_text)
+            color = self.act_orange_text
         elif text_color == common.TEXT_COLOR['yellow'].color:
-            self.change_text_color_button_icon(self.act_yellow_text)
-        elif text_color == common.TEXT_COLOR['gray'].color:
-            self.change_text_color_button_icon(self.act_gray_text)
+            color = self.act_yellow_text
         elif text_color == common.TEXT_COLOR['green'].color:
-            self.change_text_color_button_icon(self.act_green_text)
+            color = self.act_green_text
         elif text_color == common.TEXT_COLOR['blue'].color:
-            self.change_text_color_button_icon(self.act_blue_text)
+            color = self.act_blue_text
         elif text_color == common.TEXT_COLOR['purple'].color:
-            self.change_text_color_button_icon(self.act_purple_text)
+            color = self.act_purple_text
         else:
-            self.change_text_color_button_icon(self.act_black_text)
+            color = self.act_black_text
 
-        # Get list format
-        if self.txt_body.textCursor().currentList():
-            self.btn_list.setChecked(True)
-        else:
-            self.btn_list.setChecked(False)
-
-        if self.txt_body.is_image():
-            fmt = self.txt_body.textCursor().charFormat().toImageFormat()
-            self.txt_height.setText("{:d}".format(int(fmt.height())))
-            self.txt_width.setText("{:d}".format(int(fmt.width())))
-            self.width_height_ratio = fmt.width() / fmt.height()
-            self.txt_width.setEnabled(True)
-            self.txt_height.setEnabled(True)
-        else:
-            self.txt_width.setEnabled(False)
-            self.txt_height.setEnabled(False)
+        # Image size
+        image_size = None
+        if cfmt.isImageFormat():
+            fmt = cfmt.toImageFormat()
+            image_size = (fmt.width(), fmt.height())
 
-        # Get align format
-        if self.txt_body.alignment() == Qt.AlignLeft:
-            self.btn_left.setChecked(True)
-        else:
-            self.btn_left.setChecked(False)
+        return ButtonState(bold=cfmt.fontWeight() == 75, italic=cfmt.fontItalic(), underline=cfmt.fontUnderline(),
+                           strikethrough=cfmt.fontStrikeOut(), vertical_alignment=cfmt.verticalAlignment(),
+                           highlight=highlight, color=color, list=cursor.currentList() is not None,
+                           image_size=image_size, alignment=self.txt_body.alignment())
 
-        if self.txt_body.alignment() == Qt.AlignCenter:
-            self.btn_center.setChecked(True)
-        else:
-            self.btn_center.setChecked(False)
+    def update_button(self, changed_only=False):
+        """ Set the button states to match the selected text format
 
-        if self.txt_body.alignment() == Qt.AlignRight:
-            self.btn_right.setChecked(True)
-        else:
-            self.btn_right.setChecked(False)
+        :param changed_only: Only update the buttons whose format changed since the last update
+        :type changed_only: bool
+        """
+        self.button_timer.stop()
+        state = self.read_button_state()
+        previous = self.button_state if changed_only else None
+        self.button_state = state
 
-        if self.txt_body.alignment() == Qt.AlignJustify:
-            self.btn_justify.setChecked(True)
-        else:
-            self.btn_justify.setChecked(False)
+        if state == previous:
+            return
+
+        def changed(field):
+            return previous is None or getattr(previous, field) != getattr(state, field)
+
+        # Character format buttons
+        if changed('bold'):
+            self.btn_bold.setChecked(state.bold)
+        if changed('italic'):
+            self.btn_italic.setChecked(state.italic)
+        if changed('underline'):
+            self.btn_underline.setChecked(state.underline)
+        if changed('strikethrough'):
+            self.btn_strikethrough.setChecked(state.strikethrough)
+        if changed('vertical_alignment'):
+            self.btn_superscript.setChecked(state.vertical_alignment == QTextCharFormat.AlignSuperScript)
+            self.btn_subscript.setChecked(state.vertical_alignment == QTextCharFormat.AlignSubScript)
+
+        # Color buttons
+        if changed('highlight'):
+            self.change_highlight_button_icon(state.highlight)
+        if changed('color'):
+            self.change_text_color_button_icon(state.color)
+
+        # List format
+        if changed('list'):
+            self.btn_list.setChecked(state.list)
+
+        # Image size
+        if changed('image_size'):
+            if state.image_size:
+                width, height = state.image_size
+                self.txt_height.setText("{:d}".format(int(height)))
+                self.txt_width.setText("{:d}".format(int(width)))
+                self.width_height_ratio = width / height
+                self.txt_width.setEnabled(True)
+                self.txt_height.setEnabled(True)
+            else:
+                self.txt_width.setEnabled(False)
+                self.txt_height.setEnabled(False)
+
+        # Align format
+        if changed('alignment'):
+            self.btn_left.setChecked(state.alignment == Qt.AlignLeft)
+            self.btn_center.setChecked(state.alignment == Qt.AlignCenter)
+            self.btn_right.setChecked(state.alignment == Qt.AlignRight)
+            self.btn_justify.setChecked(state.alignment == Qt.AlignJustify)
 
 
 class ProtocolTextEditor(TextEditor):
@@ -1569,9 +1597,20 @@ class ExperimentTextEditor(TextEditor):
                                                    reference_list=reference_list,
                                                    dataset_list=dataset_list, protocol_list=protocol_list)
 
-        completer = QCompleter(key_list)
+        # The completer model is kept so that the keys can be changed when another notebook is shown
+        self.key_model = QStringListModel(key_list)
+        completer = QCompleter()
+        completer.setModel(self.key_model)
         self.txt_key.setCompleter(completer)
 
         # Remove the save button
         self.btn_save.deleteLater()
         sip.delete(self.save_layout)
+
+    def set_key_list(self, key_list):
+        """ Change the keys proposed by the key completer
+
+        :param key_list: Experiment keys
+        :type key_list: list
+        """
+        self.key_model.setStringList(key_list)
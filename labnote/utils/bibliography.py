@@ -0,0 +1,877 @@
+""" This module imports and exports the references of the library in BibTeX, RIS and CSL-JSON files
+
+The files are read one entry at a time and the references are inserted in batches so that libraries of several
+thousand references can be imported without loading the whole file in memory. The exports are written one reference at
+a time as they are read from the database for the same reason.
+"""
+
+# Python import
+import os
+import re
+import uuid
+import json
+import sqlite3
+import unicodedata
+from collections import namedtuple
+
+# Project import
+from labnote.core import common, data
+from labnote.utils import database
+
+# Result of an import
+ImportReport = namedtuple('ImportReport', ['imported', 'duplicates'])
+
+# Number of references inserted in each transaction
+BATCH_SIZE = 500
+
+FORMAT_BIBTEX = 'bibtex'
+FORMAT_RIS = 'ris'
+FORMAT_CSL_JSON = 'csl-json'
+
+# Reference type of the BibTeX entry types and the RIS types
+BIBTEX_TYPE = {'article': common.TYPE_ARTICLE,
+               'book': common.TYPE_BOOK,
+               'booklet': common.TYPE_BOOK,
+               'manual': common.TYPE_BOOK,
+               'proceedings': common.TYPE_BOOK,
+               'inbook': common.TYPE_CHAPTER,
+               'incollection': common.TYPE_CHAPTER,
+               'inproceedings': common.TYPE_CHAPTER,
+               'conference': common.TYPE_CHAPTER,
+               'phdthesis': common.TYPE_THESIS,
+               'mastersthesis': common.TYPE_THESIS,
+               'thesis': common.TYPE_THESIS}
+
+RIS_TYPE = {'JOUR': common.TYPE_ARTICLE,
+            'JFULL': common.TYPE_ARTICLE,
+            'MGZN': common.TYPE_ARTICLE,
+            'NEWS': common.TYPE_ARTICLE,
+            'EJOUR': common.TYPE_ARTICLE,
+            'BOOK': common.TYPE_BOOK,
+            'EBOOK': common.TYPE_BOOK,
+            'EDBOOK': common.TYPE_BOOK,
+            'CHAP': common.TYPE_CHAPTER,
+            'ECHAP': common.TYPE_CHAPTER,
+            'CONF': common.TYPE_CHAPTER,
+            'CPAPER': common.TYPE_CHAPTER,
+            'THES': common.TYPE_THESIS}
+
+# BibTeX entry type and CSL type of the reference types
+BIBTEX_EXPORT_TYPE = {common.TYPE_ARTICLE: 'article',
+                      common.TYPE_BOOK: 'book',
+                      common.TYPE_CHAPTER: 'incollection',
+                      common.TYPE_THESIS: 'phdthesis'}
+
+CSL_TYPE = {common.TYPE_ARTICLE: 'article-journal',
+            common.TYPE_BOOK: 'book',
+            common.TYPE_CHAPTER: 'chapter',
+            common.TYPE_THESIS: 'thesis'}
+
+# BibTeX month macros
+BIBTEX_MONTH = {'jan': 'January', 'feb': 'February', 'mar': 'March', 'apr': 'April', 'may': 'May', 'jun': 'June',
+                'jul': 'July', 'aug': 'August', 'sep': 'September', 'oct': 'October', 'nov': 'November',
+                'dec': 'December'}
+
+# Combining character of the LaTeX accent commands
+LATEX_ACCENT = {'`': '\u0300', "'": '\u0301', '^': '\u0302', '~': '\u0303', '=': '\u0304', 'u': '\u0306',
+                '.': '\u0307', '"': '\u0308', 'H': '\u030B', 'v': '\u030C', 'c': '\u0327', 'k': '\u0328'}
+
+LATEX_SYMBOL = {'ss': 'ß', 'o': 'ø', 'O': 'Ø', 'aa': 'å', 'AA': 'Å', 'ae': 'æ', 'AE': 'Æ', 'oe': 'œ', 'OE': 'Œ',
+                'l': 'ł', 'L': 'Ł', 'i': 'ı'}
+
+ENTRY_START = re.compile(r'@\s*(\w+)\s*([{(])')
+ENTRY_INCOMPLETE = re.compile(r'@\s*\w*\s*$')
+FIELD_NAME = re.compile(r'[,\s]*([^\s=,{}"#]+)\s*=\s*')
+VALUE_WORD = re.compile(r'[^\s,#{}"]+')
+AUTHOR_SEPARATOR = re.compile(r'\s+and\s+', re.IGNORECASE)
+ACCENT_COMMAND = re.compile(r'''\\([`'^~=."uvHck])\s*(?:{\s*(\\?\w)\s*}|(\\?\w))''')
+SYMBOL_COMMAND = re.compile(r'\\(ss|aa|AA|ae|AE|oe|OE|o|O|l|L|i)(?![a-zA-Z])\s*')
+OTHER_COMMAND = re.compile(r'\\[a-zA-Z]+\*?\s*')
+BIBTEX_SPECIAL = re.compile(r'([&%$#_{}])')
+RIS_LINE = re.compile(r'^([A-Z][A-Z0-9])  -(?: (.*))?$')
+YEAR = re.compile(r'\d{4}')
+DOI_PREFIX = re.compile(r'^(?:https?://(?:dx\.)?doi\.org/|doi:\s*)', re.IGNORECASE)
+
+# Keys accepted by the editors, see KeyValidator
+REFERENCE_KEY = re.compile(r'^[a-z][0-9a-z_-]+$')
+
+
+"""
+File reading
+"""
+
+
+def read_lines(file, progress=None):
+    """ Decode the lines of a binary file and report the number of bytes read
+
+    :param file: File opened in binary mode
+    :type file: io.BufferedReader
+    :param progress: Function called with the number of bytes read and the file size
+    :type progress: function
+    :return: generator of str
+    """
+    size = os.fstat(file.fileno()).st_size
+    position = 0
+
+    for line in file:
+        position = position + len(line)
+        if position == len(line) and line.startswith(b'\xef\xbb\xbf'):
+            line = line[3:]
+        yield line.decode('utf-8', errors='replace')
+
+        if progress:
+            progress(position, size)
+
+
+"""
+BibTeX
+"""
+
+
+def closing_position(text, start, delimiter, depth=0):
+    """ Return the position of the delimiter that closes an entry
+
+    The scan can be resumed on the next text of the entry with the depth returned.
+
+    :param text: Text of the entry
+    :type text: str
+    :param start: Position after the opening delimiter
+    :type start: int
+    :param delimiter: Opening delimiter, '{' or '('
+    :type delimiter: str
+    :param depth: Brace depth at the start position
+    :type depth: int
+    :return: tuple (position of the closing delimiter or None when the entry is not complete, brace depth at the end)
+    """
+    for position in range(start, len(text)):
+        character = text[position]
+        if character == '{':
+            depth = depth + 1
+        elif character == '}':
+            if depth == 0:
+                if delimiter == '{':
+                    return position, depth
+            else:
+                depth = depth - 1
+        elif character == ')' and delimiter == '(' and depth == 0:
+            return position, depth
+
+    return None, depth
+
+
+def bibtex_entries(lines):
+    """ Split BibTeX lines in entries
+
+    Text outside of the entries is ignored as BibTeX does. Each line is scanned once, the text of an entry is only joined
+    when it is complete.
+
+    :param lines: Lines of the file
+    :type lines: iterable of str
+    :return: generator of tuple (entry type, entry content)
+    """
+    buffer = ""
+    entry = None
+    content = []
+    depth = 0
+
+    for line in lines:
+        buffer = buffer + line
+
+        while buffer:
+            if entry is None:
+                start = buffer.find('@')
+                if start < 0:
+                    buffer = ""
+                    break
+
+                match = ENTRY_START.match(buffer, start)
+                if not match:
+                    if ENTRY_INCOMPLETE.match(buffer, start):
+                        buffer = buffer[start:]
+                        break
+                    buffer = buffer[start + 1:]
+                    continue
+
+                # Type and delimiter of the entry being read
+                entry = (match.group(1).lower(), match.group(2))
+                content = []
+                depth = 0
+                buffer = buffer[match.end():]
+
+            end, depth = closing_position(buffer, 0, entry[1], depth)
+            if end is None:
+                content.append(buffer)
+                buffer = ""
+                break
+
+            content.append(buffer[:end])
+            yield entry[0], "".join(content)
+            buffer = buffer[end + 1:]
+            entry = None
+
+
+def bibtex_value(text, position, strings):
+    """ Read a field value made of braced or quoted strings, numbers and macros joined by #
+
+    :param text: Content of the entry
+    :type text: str
+    :param position: Position of the value
+    :type position: int
+    :param strings: Values of the macros
+    :type strings: dict
+    :return: tuple (raw value, position after the value)
+    """
+    value = ""
+
+    while position < len(text):
+        while position < len(text) and text[position].isspace():
+            position = position + 1
+        if position >= len(text):
+            break
+
+        character = text[position]
+        if character in '{"':
+            end = position + 1
+            depth = 0
+            while end < len(text):
+                if text[end] == '{':
+                    depth = depth + 1
+                elif text[end] == '}':
+                    if depth == 0 and character == '{':
+                        break
+                    depth = depth - 1
+                elif text[end] == '"' and depth == 0 and character == '"':
+                    break
+                end = end + 1
+            value = value + text[position + 1:end]
+            position = end + 1
+        else:
+            match = VALUE_WORD.match(text, position)
+            if not match:
+                break
+            word = match.group()
+            value = value + (word if word.isdigit() else strings.get(word.lower(), ""))
+            position = match.end()
+
+        while position < len(text) and text[position].isspace():
+            position = position + 1
+        if position < len(text) and text[position] == '#':
+            position = position + 1
+        else:
+            break
+
+    return value, position
+
+
+def bibtex_fields(text, strings):
+    """ Read the fields of an entry
+
+    :param text: Content of the entry after its key
+    :type text: str
+    :param strings: Values of the macros
+    :type strings: dict
+    :return dict: Raw value of each field by lower case name
+    """
+    fields = {}
+    position = 0
+
+    while True:
+        match = FIELD_NAME.match(text, position)
+        if not match:
+            break
+        fields[match.group(1).lower()], position = bibtex_value(text, match.end(), strings)
+
+    return fields
+
+
+def read_bibtex(lines):
+    """ Read the entries of a BibTeX file
+
+    The @string macros are replaced in the values, @comment and @preamble are ignored.
+
+    :param lines: Lines of the file
+    :type lines: iterable of str
+    :return: generator of dict with the 'type' and the 'key' of the entry and its raw fields
+    """
+    strings = dict(BIBTEX_MONTH)
+
+    for entry_type, content in bibtex_entries(lines):
+        if entry_type in ('comment', 'preamble'):
+            continue
+        elif entry_type == 'string':
+            strings.update(bibtex_fields(content, strings))
+            continue
+
+        key, separator, content = content.partition(',')
+        entry = bibtex_fields(content, strings)
+        entry['type'] = entry_type
+        entry['key'] = key.strip()
+        yield entry
+
+
+def split_braces(text, separator):
+    """ Split a text on a separator outside of the braces
+
+    :param text: Text to split
+    :type text: str
+    :param separator: Separator pattern
+    :type separator: re.Pattern
+    :return: list of str
+    """
+    part_list = []
+    start = 0
+    depth = 0
+    position = 0
+
+    while position < len(text):
+        if text[position] == '{':
+            depth = depth + 1
+        elif text[position] == '}':
+            depth = depth - 1
+        elif depth == 0:
+            match = separator.match(text, position)
+            if match and match.end() > position:
+                part_list.append(text[start:position])
+                start = position = match.end()
+                continue
+        position = position + 1
+
+    part_list.append(text[start:])
+    return part_list
+
+
+def latex_text(text):
+    """ Convert the LaTeX markup of a value to plain text
+
+    :param text: BibTeX value
+    :type text: str
+    :return str: Plain text
+    """
+    # The dotless \i and \j are accented as i and j so that the normalization composes them
+    text = ACCENT_COMMAND.sub(lambda match: (match.group(2) or match.group(3)).lstrip('\\') +
+                              LATEX_ACCENT[match.group(1)], text)
+    text = SYMBOL_COMMAND.sub(lambda match: LATEX_SYMBOL[match.group(1)], text)
+    text = re.sub(r'\\([&%$#_{}])', r'\1', text)
+    text = OTHER_COMMAND.sub('', text)
+    text = text.replace('{', '').replace('}', '').replace('~', ' ')
+    text = text.replace('---', '\u2014').replace('``', '"').replace("''", '"')
+
+    return unicodedata.normalize('NFC', " ".join(text.split()))
+
+
+def person_list(text, separator=AUTHOR_SEPARATOR):
+    """ Convert a BibTeX name list to the 'First Last, First Last' format of the library
+
+    :param text: BibTeX names separated by 'and'
+    :type text: str
+    :return str: Names or None
+    """
+    name_list = []
+
+    for name in split_braces(text, separator):
+        part_list = [latex_text(part) for part in split_braces(name, re.compile(r'\s*,\s*'))]
+        if not part_list[0] or part_list[0].lower() == 'others':
+            continue
+
+        # Last, First or Last, Jr, First
+        if len(part_list) == 2:
+            name = "{} {}".format(part_list[1], part_list[0])
+        elif len(part_list) > 2:
+            name = "{} {} {}".format(part_list[2], part_list[0], part_list[1])
+        else:
+            name = part_list[0]
+        name_list.append(name.strip())
+
+    return ", ".join(name_list) or None
+
+
+def bibtex_reference(entry):
+    """ Map a BibTeX entry on the columns of the references
+
+    :param entry: Entry returned by read_bibtex
+    :type entry: dict
+    :return dict: Reference
+    """
+    ref_type = BIBTEX_TYPE.get(entry['type'], common.TYPE_ARTICLE)
+    value = {name: latex_text(text) for name, text in entry.items() if name not in ('author', 'editor')}
+
+    reference = new_reference(ref_type)
+    reference.update({'ref_key': value.get('key'),
+                      'title': value.get('title'),
+                      'publisher': value.get('publisher') or value.get('organization') or value.get('institution'),
+                      'year': integer(value.get('year')),
+                      'author': person_list(entry.get('author', "")),
+                      'editor': person_list(entry.get('editor', "")),
+                      'volume': integer(value.get('volume')),
+                      'address': value.get('address') or value.get('location'),
+                      'edition': integer(value.get('edition')),
+                      'journal': value.get('journal') or value.get('journaltitle'),
+                      'chapter': value.get('chapter'),
+                      'pages': value.get('pages', "").replace('--', '-') or None,
+                      'issue': integer(value.get('number') or value.get('issue')),
+                      'school': value.get('school') or value.get('institution'),
+                      'abstract': value.get('abstract'),
+                      'description': value.get('note') or value.get('annote'),
+                      'doi': normalize_doi(value.get('doi'))})
+
+    # The title of a chapter is the title of the part and the book is the booktitle
+    if ref_type == common.TYPE_CHAPTER and value.get('booktitle'):
+        reference['chapter'] = value.get('title')
+        reference['title'] = value.get('booktitle')
+
+    reference['tag_list'] = [tag.strip() for tag in re.split(r'[,;]', value.get('keywords', "")) if tag.strip()]
+    return prepare_reference(reference)
+
+
+"""
+RIS
+"""
+
+
+def read_ris(lines):
+    """ Read the records of a RIS file
+
+    :param lines: Lines of the file
+    :type lines: iterable of str
+    :return: generator of dict with the list of values of each tag
+    """
+    record = None
+    tag = None
+
+    for line in lines:
+        line = line.rstrip('\r\n')
+        match = RIS_LINE.match(line)
+
+        if match:
+            tag, value = match.group(1), (match.group(2) or "").strip()
+            if tag == 'TY':
+                record = {'TY': [value]}
+            elif tag == 'ER':
+                if record:
+                    yield record
+                record = None
+            elif record is not None:
+                record.setdefault(tag, []).append(value)
+        elif record is not None and tag in record and line.strip():
+            # Continuation of a long value
+            record[tag][-1] = "{} {}".format(record[tag][-1], line.strip())
+
+    if record:
+        yield record
+
+
+def ris_reference(record):
+    """ Map a RIS record on the columns of the references
+
+    :param record: Record returned by read_ris
+    :type record: dict
+    :return dict: Reference
+    """
+    def first(*tag_list):
+        for tag in tag_list:
+            for value in record.get(tag, []):
+                if value:
+                    return value
+        return None
+
+    ref_type = RIS_TYPE.get(first('TY'), common.TYPE_ARTICLE)
+
+    year = YEAR.search(first('PY', 'Y1', 'DA') or "")
+    pages = first('SP')
+    if pages and first('EP'):
+        pages = "{}-{}".format(pages, first('EP'))
+
+    author_list = [name for tag in ('AU', 'A1') for name in record.get(tag, []) if name]
+    editor_list = [name for tag in ('ED', 'A2', 'A3') for name in record.get(tag, []) if name]
+
+    reference = new_reference(ref_type)
+    reference.update({'ref_key': first('ID'),
+                      'title': first('TI', 'T1', 'CT', 'BT'),
+                      'publisher': first('PB'),
+                      'year': int(year.group()) if year else None,
+                      'author': person_list(";".join(author_list), re.compile(r'\s*;\s*')),
+                      'editor': person_list(";".join(editor_list), re.compile(r'\s*;\s*')),
+                      'volume': integer(first('VL')),
+                      'address': first('CY', 'PP'),
+                      'edition': integer(first('ET')),
+                      'journal': first('JO', 'JF', 'T2', 'JA', 'J2'),
+                      'pages': pages,
+                      'issue': integer(first('IS')),
+                      'abstract': first('AB', 'N2'),
+                      'description': first('N1'),
+                      'doi': normalize_doi(first('DO'))})
+
+    if ref_type == common.TYPE_CHAPTER and first('T2', 'BT'):
+        reference['chapter'] = reference['title']
+        reference['title'] = first('T2', 'BT')
+        reference['journal'] = None
+    elif ref_type == common.TYPE_THESIS:
+        reference['school'] = reference['publisher']
+        reference['publisher'] = None
+
+    reference['tag_list'] = [tag for tag in record.get('KW', []) if tag]
+    return prepare_reference(reference)
+
+
+"""
+References
+"""
+
+
+def new_reference(ref_type):
+    """ Return a reference with empty columns
+
+    :param ref_type: Reference type
+    :type ref_type: int
+    :return dict: Reference
+    """
+    return {'ref_uuid': data.uuid_bytes(str(uuid.uuid4())), 'ref_key': None, 'ref_type': ref_type,
+            'file_attached': False, 'title': None, 'publisher': None, 'year': None, 'author': None, 'editor': None,
+            'volume': None, 'address': None, 'edition': None, 'journal': None, 'chapter': None, 'pages': None,
+            'issue': None, 'description': None, 'abstract': None, 'subcategory_id': None, 'category_id': None,
+            'school': None, 'doi': None, 'tag_list': []}
+
+
+def prepare_reference(reference):
+    """ Change the empty strings of a reference to None and truncate the values to the column sizes
+
+    :param reference: Reference
+    :type reference: dict
+    :return dict: Reference
+    """
+    for name, value in reference.items():
+        if isinstance(value, str):
+            value = data.prepare_string(value.strip())
+            if value and name not in ('description', 'abstract'):
+                value = value[:16] if name == 'pages' else value[:255]
+            reference[name] = value
+
+    return reference
+
+
+def integer(text):
+    """ Return the number at the start of a value
+
+    :param text: Value
+    :type text: str
+    :return int: Number or None
+    """
+    match = re.match(r'\s*(\d+)', text or "")
+    return int(match.group(1)) if match else None
+
+
+def normalize_doi(doi):
+    """ Return a DOI without its resolver prefix in lower case
+
+    :param doi: DOI or DOI URL
+    :type doi: str
+    :return str: DOI or None
+    """
+    if not doi:
+        return None
+    return DOI_PREFIX.sub('', doi.strip()).lower() or None
+
+
+def reference_key(reference, key_list):
+    """ Generate a key that is not used yet from the first author and the year of a reference
+
+    :param reference: Reference
+    :type reference: dict
+    :param key_list: Keys already used in lower case
+    :type key_list: set of str
+    :return str: Key
+    """
+    name = ""
+    if reference['author']:
+        name = reference['author'].split(',')[0].split()[-1]
+    elif reference['title']:
+        name = reference['title'].split()[0]
+
+    name = unicodedata.normalize('NFKD', name).encode('ascii', errors='ignore').decode('ascii')
+    base = "{}{}".format(re.sub(r'\W', '', name).lower() or 'ref', reference['year'] or "")
+    if not REFERENCE_KEY.match(base):
+        base = 'ref' + base
+    key = base
+    number = 0
+
+    # Add a letter suffix as a, b, ..., z, aa, ab...
+    while key.lower() in key_list:
+        suffix = ""
+        value = number
+        while True:
+            suffix = chr(ord('a') + value % 26) + suffix
+            value = value // 26 - 1
+            if value < 0:
+                break
+        key = base + suffix
+        number = number + 1
+
+    return key
+
+
+def import_references(path, category_id, subcategory_id=None, file_format=None, progress=None,
+                      batch_size=BATCH_SIZE):
+    """ Import the references of a BibTeX or a RIS file
+
+    References whose DOI is already in the library are skipped, as well as references without DOI whose key is already
+    used. The references without key or whose key is used by another reference get a generated key.
+
+    :param path: File path
+    :type path: str
+    :param category_id: Category of the references
+    :type category_id: int
+    :param subcategory_id: Subcategory of the references
+    :type subcategory_id: int
+    :param file_format: FORMAT_BIBTEX or FORMAT_RIS, guessed from the file extension when it is None
+    :type file_format: str
+    :param progress: Function called with the number of bytes read and the file size
+    :type progress: function
+    :param batch_size: Number of references inserted in each transaction
+    :type batch_size: int
+    :return ImportReport: Number of references imported and skipped
+    """
+    if file_format is None:
+        extension = os.path.splitext(path)[1].lower()
+        file_format = FORMAT_RIS if extension in ('.ris', '.txt') else FORMAT_BIBTEX
+
+    if file_format == FORMAT_RIS:
+        read, convert = read_ris, ris_reference
+    else:
+        read, convert = read_bibtex, bibtex_reference
+
+    imported = 0
+    duplicates = 0
+
+    with open(path, 'rb') as file:
+        conn = sqlite3.connect(database.MAIN_DATABASE_FILE_PATH)
+        try:
+            conn.isolation_level = None
+            conn.execute("PRAGMA foreign_keys = ON;")
+            cursor = conn.cursor()
+
+            # SQLite compares the unique keys with their case but the keys are used as citation keys
+            key_list = set([row[0].lower() for row in cursor.execute(database.SELECT_REFERENCE_KEY)])
+            doi_list = set([row[0] for row in cursor.execute(database.SELECT_REFERENCE_DOI)])
+            reference_list = []
+
+            for entry in read(read_lines(file, progress)):
+                reference = convert(entry)
+                doi = reference['doi']
+                key = reference['ref_key']
+
+                if doi in doi_list or (not doi and key and key.lower() in key_list):
+                    duplicates = duplicates + 1
+                    continue
+
+                # The keys are written in lower case, those that are still not valid in the editors are replaced
+                if key:
+                    key = key.lower()
+                if not key or not REFERENCE_KEY.match(key) or key in key_list:
+                    key = reference_key(reference, key_list)
+                reference['ref_key'] = key
+
+                reference['category_id'] = category_id
+                reference['subcategory_id'] = subcategory_id
+                key_list.add(reference['ref_key'].lower())
+                if doi:
+                    doi_list.add(doi)
+
+                reference_list.append(reference)
+                if len(reference_list) >= batch_size:
+                    database.insert_ref_list(cursor, reference_list)
+                    imported = imported + len(reference_list)
+                    reference_list = []
+
+            if reference_list:
+                database.insert_ref_list(cursor, reference_list)
+                imported = imported + len(reference_list)
+        finally:
+            conn.close()
+
+    return ImportReport(imported=imported, duplicates=duplicates)
+
+
+"""
+Export
+"""
+
+
+def split_person(name):
+    """ Split a 'First Last' name of the library
+
+    :param name: Name
+    :type name: str
+    :return: tuple (given names, family name)
+    """
+    part_list = name.split()
+    return " ".join(part_list[:-1]), part_list[-1]
+
+
+def bibtex_text(text):
+    """ Escape the characters of a value that have a meaning in BibTeX
+
+    :param text: Value
+    :type text: str
+    :return str: BibTeX value
+    """
+    return BIBTEX_SPECIAL.sub(r'\\\1', str(text))
+
+
+def bibtex_person(names):
+    """ Convert names of the library to a BibTeX name list
+
+    :param names: Names in the 'First Last, First Last' format
+    :type names: str
+    :return str: Names separated by 'and'
+    """
+    person_list = []
+
+    for name in names.split(','):
+        if name.strip():
+            given, family = split_person(name)
+            person_list.append("{}, {}".format(family, given) if given else family)
+
+    return " and ".join(person_list)
+
+
+def bibtex_entry(reference):
+    """ Write a reference as a BibTeX entry
+
+    :param reference: Reference returned by database.select_reference_export
+    :type reference: dict
+    :return str: BibTeX entry
+    """
+    title = reference['title']
+    booktitle = None
+    if reference['ref_type'] == common.TYPE_CHAPTER and reference['chapter']:
+        title, booktitle = reference['chapter'], reference['title']
+
+    field_list = [('author', bibtex_person(reference['author'] or "")),
+                  ('editor', bibtex_person(reference['editor'] or "")),
+                  ('title', title),
+                  ('booktitle', booktitle),
+                  ('journal', reference['journal']),
+                  ('school', reference['school']),
+                  ('publisher', reference['publisher']),
+                  ('address', reference['address']),
+                  ('edition', reference['edition']),
+                  ('year', reference['year']),
+                  ('volume', reference['volume']),
+                  ('number', reference['issue']),
+                  ('pages', reference['pages'].replace('-', '--') if reference['pages'] else None),
+                  ('doi', reference['doi']),
+                  ('keywords', reference['tags']),
+                  ('abstract', reference['abstract']),
+                  ('note', reference['description'])]
+
+    lines = ["@{}{{{},".format(BIBTEX_EXPORT_TYPE.get(reference['ref_type'], 'misc'), reference['ref_key'])]
+    for name, value in field_list:
+        if value or value == 0:
+            # Names are not escaped since the comma separates the family name
+            value = value if name in ('author', 'editor') else bibtex_text(value)
+            lines.append("  {} = {{{}}},".format(name, " ".join(value.split())))
+    lines.append("}\n")
+
+    return "\n".join(lines)
+
+
+def csl_person(names):
+    """ Convert names of the library to CSL names
+
+    :param names: Names in the 'First Last, First Last' format
+    :type names: str
+    :return: list of dict
+    """
+    person_list = []
+
+    for name in (names or "").split(','):
+        if name.strip():
+            given, family = split_person(name)
+            person_list.append({'family': family, 'given': given} if given else {'literal': family})
+
+    return person_list
+
+
+def csl_item(reference):
+    """ Convert a reference to a CSL-JSON item
+
+    :param reference: Reference returned by database.select_reference_export
+    :type reference: dict
+    :return dict: CSL item
+    """
+    item = {'id': reference['ref_key'], 'type': CSL_TYPE.get(reference['ref_type'], 'article')}
+
+    title = reference['title']
+    container = reference['journal']
+    if reference['ref_type'] == common.TYPE_CHAPTER and reference['chapter']:
+        title, container = reference['chapter'], reference['title']
+
+    field_list = [('title', title),
+                  ('container-title', container),
+                  ('author', csl_person(reference['author'])),
+                  ('editor', csl_person(reference['editor'])),
+                  ('issued', {'date-parts': [[reference['year']]]} if reference['year'] else None),
+                  ('publisher', reference['school'] or reference['publisher']),
+                  ('publisher-place', reference['address']),
+                  ('edition', reference['edition']),
+                  ('volume', reference['volume']),
+                  ('issue', reference['issue']),
+                  ('page', reference['pages']),
+                  ('DOI', reference['doi']),
+                  ('keyword', reference['tags']),
+                  ('abstract', reference['abstract']),
+                  ('note', reference['description'])]
+
+    for name, value in field_list:
+        if value or value == 0:
+            item[name] = value
+
+    return item
+
+
+def export_references(path, file_format=None, category_id=None, subcategory_id=None, tag=None, progress=None):
+    """ Export the references of the library in a BibTeX or a CSL-JSON file
+
+    The references are written as they are read from the database so the memory used does not depend on their number.
+
+    :param path: File path
+    :type path: str
+    :param file_format: FORMAT_BIBTEX or FORMAT_CSL_JSON, guessed from the file extension when it is None
+    :type file_format: str
+    :param category_id: Only export the references of this category
+    :type category_id: int
+    :param subcategory_id: Only export the references of this subcategory
+    :type subcategory_id: int
+    :param tag: Only export the references with this tag
+    :type tag: str
+    :param progress: Function called with the number of references written and the number of references to export
+    :type progress: function
+    :return int: Number of references exported
+    """
+    if file_format is None:
+        file_format = FORMAT_CSL_JSON if os.path.splitext(path)[1].lower() == '.json' else FORMAT_BIBTEX
+
+    total = database.count_reference_export(category_id=category_id, subcategory_id=subcategory_id, tag=tag) \
+        if progress else 0
+    count = 0
+
+    with open(path, 'w', encoding='utf-8', newline='\n') as file:
+        if file_format == FORMAT_CSL_JSON:
+            file.write("[")
+
+        for reference in database.select_reference_export(category_id=category_id, subcategory_id=subcategory_id,
+                                                          tag=tag):
+            if file_format == FORMAT_CSL_JSON:
+                file.write("{}\n  {}".format("," if count else "", json.dumps(csl_item(reference),
+                                                                             ensure_ascii=False)))
+            else:
+                file.write("{}{}".format("\n" if count else "", bibtex_entry(reference)))
+
+            count = count + 1
+            if progress:
+                progress(count, total)
+
+        if file_format == FORMAT_CSL_JSON:
+            file.write("\n]\n")
+
+    return count
@@ -0,0 +1,368 @@
+""" This module contains the content addressed store used for the images and the PDF files
+
+Each distinct file content is stored once in the blob directory under its SHA-256 hash. The files used by the entries
+are clones of the blob, or hard links when the file system cannot clone files, so the content is written once on the
+disk. Each link is recorded in the database with a reference count on the blob. The blobs are read only so that a hard
+linked entry is never modified in place, detach_file replaces it by a private copy before it is opened in another
+application. Blobs that are not referenced anymore are removed by purge.
+"""
+
+# Python import
+import os
+import stat
+import hashlib
+import tempfile
+import sqlite3
+
+# Project import
+from labnote.utils import database, directory, files
+
+# Write permissions removed from the blobs
+WRITE_PERMISSIONS = stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH
+
+# Content hash of the files already hashed by (path, modification time, size)
+hash_cache = {}
+
+
+def file_hash(path):
+    """ Return the SHA-256 hash of a file content
+
+    :param path: File path
+    :type path: str
+    :return str: Hexadecimal hash
+    """
+    stat = os.stat(path)
+    key = (path, stat.st_mtime_ns, stat.st_size)
+
+    digest = hash_cache.get(key)
+    if digest is None:
+        sha = hashlib.sha256()
+        with open(path, 'rb') as file:
+            for chunk in iter(lambda: file.read(1024 * 1024), b''):
+                sha.update(chunk)
+        digest = sha.hexdigest()
+        hash_cache[key] = digest
+
+    return digest
+
+
+def blob_path(blob_hash):
+    """ Return the path of a blob
+
+    :param blob_hash: Blob content hash
+    :type blob_hash: str
+    :return str: Blob path
+    """
+    return os.path.join(directory.BLOB_DIRECTORY_PATH + "/{}/{}".format(blob_hash[:2], blob_hash))
+
+
+def relative_path(path):
+    """ Return a path relative to the main directory as stored in the database
+
+    :param path: File path
+    :type path: str
+    :return str: Relative path
+    """
+    return os.path.relpath(path, directory.DEFAULT_MAIN_DIRECTORY_PATH).replace(os.sep, '/')
+
+
+def link_hash(path):
+    """ Return the hash of the blob linked at a path
+
+    :param path: File path
+    :type path: str
+    :return str: Blob content hash or None when the file is not in the blob store
+    """
+    buffer = database.execute_query(database.SELECT_BLOB_LINK, path=relative_path(path))
+    return buffer[0][1] if buffer else None
+
+
+def read_only(path):
+    """ Remove the write permissions of a file
+
+    :param path: File path
+    :type path: str
+    """
+    mode = stat.S_IMODE(os.stat(path).st_mode)
+    if mode & WRITE_PERMISSIONS:
+        os.chmod(path, mode & ~WRITE_PERMISSIONS)
+
+
+def writable(path):
+    """ Give the write permission of a file to its owner
+
+    :param path: File path
+    :type path: str
+    """
+    os.chmod(path, stat.S_IMODE(os.stat(path).st_mode) | stat.S_IWUSR)
+
+
+def link_blob(blob_hash, destination):
+    """ Create an entry file that shares the content of a blob
+
+    The file is a clone of the blob when the file system supports it, the clone can be modified without changing the
+    blob. Otherwise it is a hard link to the read only blob, and a copy only when hard links are not supported.
+
+    :param blob_hash: Blob content hash
+    :type blob_hash: str
+    :param destination: Entry file path
+    :type destination: str
+    """
+    blob_file = blob_path(blob_hash)
+
+    if files.clone_path(blob_file, destination):
+        # The clone keeps the modification time of the blob so that it is known to be unmodified
+        blob_stat = os.stat(blob_file)
+        os.utime(destination, ns=(blob_stat.st_atime_ns, blob_stat.st_mtime_ns))
+        writable(destination)
+        return
+
+    try:
+        read_only(blob_file)
+        os.link(blob_file, destination)
+    except OSError:
+        files.copy_file(blob_file, destination)
+        writable(destination)
+
+
+def is_linked(path, blob_hash):
+    """ Return if an entry file still has the content of its blob, without reading it
+
+    :param path: Entry file path
+    :type path: str
+    :param blob_hash: Hash of the blob linked at the path
+    :type blob_hash: str
+    :return bool: True when the file is a hard link to the blob or an unmodified clone
+    """
+    file_stat = os.stat(path)
+    blob_stat = os.stat(blob_path(blob_hash))
+    return os.path.samestat(file_stat, blob_stat) or (file_stat.st_size == blob_stat.st_size and
+                                                      file_stat.st_mtime_ns == blob_stat.st_mtime_ns)
+
+
+def detach_file(path):
+    """ Replace an entry file hard linked to its blob by a private copy
+
+    This is done before the file is opened in another application, which can then modify it without changing the blob
+    and the other entries. Nothing is done for the files that are not hard linked.
+
+    :param path: Entry file path
+    :type path: str
+    """
+    blob_hash = link_hash(path)
+    if blob_hash is None or not os.path.samestat(os.stat(path), os.stat(blob_path(blob_hash))):
+        return
+
+    descriptor, temporary = tempfile.mkstemp(suffix=".tmp", dir=os.path.dirname(path))
+    os.close(descriptor)
+    try:
+        files.copy_file(path, temporary)
+        writable(temporary)
+        os.replace(temporary, path)
+    except OSError:
+        if os.path.isfile(temporary):
+            os.remove(temporary)
+        raise
+
+
+def store_file(source, progress=None):
+    """ Copy a file in the blob store unless its content is already stored
+
+    The file is not referenced in the database until it is added with add_file. This function can be called before the
+    transaction in which the file is added so that the copy does not hold the database.
+
+    :param source: Original file path
+    :type source: str
+    :param progress: Function called with the number of bytes copied and the file size
+    :type progress: function
+    :return str: Blob content hash
+    """
+    blob_hash = file_hash(source)
+    blob_file = blob_path(blob_hash)
+
+    if not os.path.isfile(blob_file):
+        os.makedirs(os.path.dirname(blob_file), exist_ok=True)
+
+        # Copy in a temporary file first so that an incomplete blob is never used, the same file can be stored by
+        # several threads at once
+        descriptor, temporary = tempfile.mkstemp(suffix=".tmp", dir=os.path.dirname(blob_file))
+        os.close(descriptor)
+        try:
+            files.copy_file(source, temporary, progress)
+            read_only(temporary)
+            os.replace(temporary, blob_file)
+        except OSError:
+            if os.path.isfile(temporary):
+                os.remove(temporary)
+            raise
+    elif progress:
+        size = os.path.getsize(blob_file)
+        progress(size, size)
+
+    return blob_hash
+
+
+def insert_link(cursor, blob_hash, path):
+    """ Record the link of an entry file to its blob and increment the blob reference count
+
+    :param cursor: Cursor of the transaction
+    :type cursor: sqlite3.Cursor
+    :param blob_hash: Blob content hash
+    :type blob_hash: str
+    :param path: Path of the file used by the entry
+    :type path: str
+    """
+    cursor.execute(database.INSERT_BLOB, {'blob_hash': blob_hash, 'size': os.path.getsize(blob_path(blob_hash))})
+    cursor.execute(database.INCREMENT_BLOB_REFCOUNT, {'blob_hash': blob_hash})
+    cursor.execute(database.INSERT_BLOB_LINK, {'path': relative_path(path), 'blob_hash': blob_hash})
+
+
+def add_file(source, destination, cursor=None):
+    """ Store a file in the blob store and create it at the destination
+
+    :param source: Original file path
+    :type source: str
+    :param destination: Path of the file used by the entry
+    :type destination: str
+    :param cursor: Cursor of the transaction in which the file is added, a new connection is used when it is None
+    :type cursor: sqlite3.Cursor
+    :return str: Destination path
+    """
+    blob_hash = store_file(source)
+    link_blob(blob_hash, destination)
+
+    conn = None
+    try:
+        if cursor is None:
+            conn = sqlite3.connect(database.MAIN_DATABASE_FILE_PATH)
+            cursor = conn.cursor()
+
+        insert_link(cursor, blob_hash, destination)
+
+        if conn:
+            conn.commit()
+    except sqlite3.Error:
+        os.remove(destination)
+        raise
+    finally:
+        if conn:
+            conn.close()
+
+    return destination
+
+
+def release(cursor, link_list):
+    """ Delete the links from the database and decrement their blob reference count
+
+    :param cursor: Cursor of the transaction
+    :type cursor: sqlite3.Cursor
+    :param link_list: Links (path, blob_hash) to release
+    :type link_list: list of tuple
+    """
+    for path, blob_hash in link_list:
+        cursor.execute(database.DELETE_BLOB_LINK, {'path': path})
+        cursor.execute(database.DECREMENT_BLOB_REFCOUNT, {'blob_hash': blob_hash})
+
+
+def release_path(cursor, path):
+    """ Release the link of an entry file without removing the file
+
+    :param cursor: Cursor of the transaction
+    :type cursor: sqlite3.Cursor
+    :param path: Path of the file used by the entry
+    :type path: str
+    """
+    cursor.execute(database.SELECT_BLOB_LINK, {'path': relative_path(path)})
+    release(cursor, cursor.fetchall())
+
+
+def remove_file(path, cursor=None):
+    """ Remove a file created by add_file
+
+    Files that are not in the blob store are simply removed.
+
+    :param path: Path of the file used by the entry
+    :type path: str
+    :param cursor: Cursor of the transaction in which the file is removed, a new connection is used when it is None
+    :type cursor: sqlite3.Cursor
+    """
+    conn = None
+    try:
+        if cursor is None:
+            conn = sqlite3.connect(database.MAIN_DATABASE_FILE_PATH)
+            cursor = conn.cursor()
+
+        release_path(cursor, path)
+        os.remove(path)
+
+        if conn:
+            conn.commit()
+    finally:
+        if conn:
+            conn.close()
+
+
+def copy_directory(source, destination, cursor):
+    """ Record the links of the files of a directory in its copy
+
+    The links are copied and the blob reference counts incremented by two statements whatever the number of files.
+
+    :param source: Directory path
+    :type source: str
+    :param destination: Path of the copy
+    :type destination: str
+    :param cursor: Cursor of the transaction in which the directory is copied
+    :type cursor: sqlite3.Cursor
+    :return dict: Blob hash by relative path of the linked files of the source directory
+    """
+    source = relative_path(source)
+    destination = relative_path(destination)
+
+    cursor.execute(database.SELECT_BLOB_LINK_DIRECTORY, {'directory': source})
+    link_dict = dict(cursor.fetchall())
+
+    cursor.execute(database.COPY_BLOB_LINK_DIRECTORY, {'directory': source, 'destination': destination})
+    cursor.execute(database.INCREMENT_BLOB_REFCOUNT_DIRECTORY, {'directory': destination})
+    return link_dict
+
+
+def remove_directory(path, cursor):
+    """ Release all the files of a directory that is going to be deleted
+
+    :param path: Directory path
+    :type path: str
+    :param cursor: Cursor of the transaction in which the directory is deleted
+    :type cursor: sqlite3.Cursor
+    """
+    cursor.execute(database.SELECT_BLOB_LINK_DIRECTORY, {'directory': relative_path(path)})
+    release(cursor, cursor.fetchall())
+
+
+def purge():
+    """ Remove the blobs that are not referenced anymore
+
+    :return int: Number of bytes reclaimed
+    """
+    reclaimed = 0
+
+    with sqlite3.connect(database.MAIN_DATABASE_FILE_PATH) as conn:
+        cursor = conn.cursor()
+        cursor.execute(database.SELECT_UNREFERENCED_BLOB)
+
+        for blob_hash in [row[0] for row in cursor.fetchall()]:
+            cursor.execute(database.DELETE_UNREFERENCED_BLOB, {'blob_hash': blob_hash})
+
+            blob_file = blob_path(blob_hash)
+            try:
+                reclaimed = reclaimed + os.path.getsize(blob_file)
+                os.remove(blob_file)
+            except FileNotFoundError:
+                pass
+
+            # Remove the hash prefix directory once it is empty
+            try:
+                os.rmdir(os.path.dirname(blob_file))
+            except OSError:
+                pass
+
+    return reclaimed
@@ -0,0 +1,197 @@
+""" This module contains the garbage collector of the entry resources
+
+The collector is a mark and sweep pass. The images referenced by every protocol and experiment body are marked, then the
+files of the resources directories that are not marked are removed along with the blobs that are not used anymore.
+The images are marked by file name since the resources are named with an UUID and the bodies keep absolute paths that
+are not valid anymore when the main directory is moved.
+"""
+
+# Python import
+import os
+import re
+import html
+import time
+import sqlite3
+from collections import namedtuple
+from urllib.parse import urlparse, unquote
+
+# Project import
+from labnote.core import data
+from labnote.utils import database, directory, files, blobstore, document
+
+# Result of a collection
+Report = namedtuple('Report', ['entries', 'referenced', 'removed', 'reclaimed'])
+
+# Files created more recently than this number of seconds are never removed since they can be used by a body that is
+# not saved yet
+GRACE_PERIOD = 24 * 60 * 60
+
+IMAGE_SOURCE = re.compile(r'<img\s[^>]*?src\s*=\s*"([^"]*)"', re.IGNORECASE)
+
+
+def image_references(body):
+    """ Return the file names of the images used in a body
+
+    :param body: Serialized or HTML body
+    :type body: str
+    :return: set of str
+    """
+    name_list = set([])
+
+    if document.is_serialized(body):
+        source_list = document.image_names(body)
+    else:
+        source_list = [html.unescape(source) for source in IMAGE_SOURCE.findall(body)]
+
+    for source in source_list:
+        if source.startswith('file:'):
+            source = unquote(urlparse(source).path)
+        name_list.add(os.path.basename(source))
+
+    return name_list
+
+
+def unused_images(path_list, body, resource_path):
+    """ Return the images deleted from a body that can be removed
+
+    An image is kept when it is still used in the body, for example after an undo, or when it is not in the resources
+    of the entry since it can then be used by another entry.
+
+    :param path_list: Paths of the images deleted from the body
+    :type path_list: set of str
+    :param body: Serialized or HTML body
+    :type body: str
+    :param resource_path: Resources directory of the entry
+    :type resource_path: str
+    :return: list of str
+    """
+    used = image_references(body)
+    resource_path = os.path.normcase(os.path.abspath(resource_path))
+
+    return [path for path in path_list if os.path.basename(path) not in used and
+            os.path.normcase(os.path.dirname(os.path.abspath(path))) == resource_path]
+
+
+def entry_list():
+    """ Return the body file and the resources directory of every protocol and experiment
+
+    :return: list of tuple
+    """
+    entries = []
+
+    for protocol in database.execute_query(database.SELECT_PROTOCOL_BODY):
+        prt_uuid = data.uuid_string(protocol[0])
+        entries.append((files.protocol_file(prt_uuid), directory.protocol_resource_path(prt_uuid)))
+
+    for experiment in database.execute_query(database.SELECT_EXPERIMENT_BODY):
+        exp_uuid = data.uuid_string(experiment[0])
+        nb_uuid = data.uuid_string(experiment[1])
+        entries.append((files.experiment_file(nb_uuid, exp_uuid), directory.experiment_resource_path(nb_uuid, exp_uuid)))
+
+    return entries
+
+
+def directory_files(path, is_directory=False):
+    """ Return the files of a directory
+
+    :param path: Directory path
+    :type path: str
+    :param is_directory: Return the subdirectories instead of the files
+    :type is_directory: bool
+    :return: list of os.DirEntry
+    """
+    try:
+        if is_directory:
+            return [entry for entry in os.scandir(path) if entry.is_dir(follow_symlinks=False)]
+        return [entry for entry in os.scandir(path) if entry.is_file(follow_symlinks=False)]
+    except OSError:
+        return []
+
+
+def sweep_blob_links(cursor):
+    """ Release the links whose file does not exist anymore and recount the references of each blob
+
+    :param cursor: Cursor of the transaction
+    :type cursor: sqlite3.Cursor
+    :return: set of the blob hash in the database
+    """
+    cursor.execute(database.SELECT_ALL_BLOB_LINK)
+    missing_list = [link for link in cursor.fetchall()
+                    if not os.path.exists(os.path.join(directory.DEFAULT_MAIN_DIRECTORY_PATH, link[0]))]
+    blobstore.release(cursor, missing_list)
+
+    cursor.execute(database.UPDATE_BLOB_REFCOUNT)
+    cursor.execute(database.SELECT_BLOB_HASH)
+    return set([row[0] for row in cursor.fetchall()])
+
+
+def collect(grace_period=GRACE_PERIOD):
+    """ Remove the resources and the blobs that are not used by any body
+
+    This function is a generator that does one step of the collection each time it is resumed, the collection can
+    therefore be run incrementally and stopped between two steps. Each step yields the report of the work done so far,
+    the last one is the complete report.
+
+    :param grace_period: Files created less than this number of seconds ago are kept
+    :type grace_period: int
+    :return: generator of Report
+    """
+    report = Report(entries=0, referenced=0, removed=0, reclaimed=0)
+    limit = time.time() - grace_period
+    entries = entry_list()
+    marked = set([])
+
+    # Mark the images used by each body
+    for body_file, resource_path in entries:
+        try:
+            with open(body_file, 'rb') as file:
+                marked.update(image_references(data.decode(file.read())))
+        except (OSError, UnicodeDecodeError):
+            # Keep every resource of a body that cannot be read
+            marked.update([entry.name for entry in directory_files(resource_path)])
+
+        report = report._replace(entries=report.entries + 1, referenced=len(marked))
+        yield report
+
+    # Sweep the resources that are not marked
+    for resource_path in [entry[1] for entry in entries]:
+        for entry in directory_files(resource_path):
+            stat = entry.stat(follow_symlinks=False)
+            if entry.name in marked or stat.st_ctime > limit:
+                continue
+
+            try:
+                blobstore.remove_file(entry.path)
+            except (OSError, sqlite3.Error):
+                continue
+
+            # The space of a file linked to a blob is reclaimed when the blob is purged
+            reclaimed = stat.st_size if stat.st_nlink <= 1 else 0
+            report = report._replace(removed=report.removed + 1, reclaimed=report.reclaimed + reclaimed)
+        yield report
+
+    # Sweep the blob links and the blob files that are not in the database
+    conn = sqlite3.connect(database.MAIN_DATABASE_FILE_PATH)
+    try:
+        cursor = conn.cursor()
+        blob_list = sweep_blob_links(cursor)
+        conn.commit()
+    finally:
+        conn.close()
+    yield report
+
+    for prefix in directory_files(directory.BLOB_DIRECTORY_PATH, is_directory=True):
+        for entry in directory_files(prefix.path):
+            stat = entry.stat(follow_symlinks=False)
+            if entry.name in blob_list or stat.st_ctime > limit:
+                continue
+
+            try:
+                os.remove(entry.path)
+            except OSError:
+                continue
+            report = report._replace(removed=report.removed + 1, reclaimed=report.reclaimed + stat.st_size)
+        yield report
+
+    report = report._replace(reclaimed=report.reclaimed + blobstore.purge())
+    yield report
@@ -1,12 +1,13 @@
 # Python import
 import sqlite3
 import os
+import re
 from collections import namedtuple
 
 # Project import
 from labnote.utils import directory
 from labnote.utils.conversion import uuid_bytes, uuid_string
-from labnote.core import data, sqlite_error
+from labnote.core import data, sqlite_error, cache
 
 """
 Database path
@@ -58,7 +59,7 @@ CREATE TRIGGER exp_date_updated
 BEGIN
     UPDATE experiment
        SET date_updated = CURRENT_TIMESTAMP
-     WHERE NEW.exp_uuid = OLD.exp_uuid;
+     WHERE exp_uuid = NEW.exp_uuid;
 END;
 """
 
@@ -107,7 +108,7 @@ CREATE TRIGGER prt_date_updated
 BEGIN
     UPDATE protocol
        SET date_updated = CURRENT_TIMESTAMP
-     WHERE NEW.prt_uuid = OLD.prt_uuid;
+     WHERE prt_uuid = NEW.prt_uuid;
 END;
 
 """
@@ -256,6 +257,80 @@ CREATE TABLE refs_tag (
 )
 """
 
+CREATE_BLOB_TABLE = """
+CREATE TABLE IF NOT EXISTS blob (
+    blob_hash CHAR (64) PRIMARY KEY,
+    size      INTEGER   NOT NULL,
+    refcount  INTEGER   NOT NULL
+                        DEFAULT (0)
+)
+"""
+
+CREATE_BLOB_LINK_TABLE = """
+CREATE TABLE IF NOT EXISTS blob_link (
+    path      TEXT      PRIMARY KEY,
+    blob_hash CHAR (64) REFERENCES blob (blob_hash) ON DELETE RESTRICT
+                        NOT NULL
+)
+"""
+
+CREATE_REFERENCE_TEXT_STATE_TABLE = """
+CREATE TABLE IF NOT EXISTS refs_text_state (
+    text_id   INTEGER   PRIMARY KEY AUTOINCREMENT,
+    ref_uuid  BLOB (16) REFERENCES refs (ref_uuid) ON DELETE CASCADE
+                        NOT NULL
+                        UNIQUE,
+    blob_hash CHAR (64) NOT NULL
+)
+"""
+
+CREATE_REFERENCE_DOI_TABLE = """
+CREATE TABLE IF NOT EXISTS refs_doi (
+    ref_uuid BLOB (16)     PRIMARY KEY
+                           REFERENCES refs (ref_uuid) ON DELETE CASCADE,
+    doi      VARCHAR (255) NOT NULL
+                           UNIQUE
+)
+"""
+
+CREATE_REFERENCE_LABEL_TABLE = """
+CREATE TABLE IF NOT EXISTS refs_label (
+    ref_uuid BLOB (16) PRIMARY KEY
+                       REFERENCES refs (ref_uuid) ON DELETE CASCADE,
+    label    TEXT      NOT NULL,
+    sort_key TEXT      NOT NULL
+)
+"""
+
+CREATE_REFERENCE_TEXT_TABLE = """
+CREATE VIRTUAL TABLE IF NOT EXISTS refs_text USING fts5(content)
+"""
+
+CREATE_REFERENCE_TEXT_DELETE_TRIGGER = """
+CREATE TRIGGER IF NOT EXISTS refs_text_delete AFTER DELETE ON refs_text_state
+BEGIN
+    DELETE FROM refs_text WHERE rowid = old.text_id;
+END
+"""
+
+CREATE_REFERENCE_TEXT_DETACH_TRIGGER = """
+CREATE TRIGGER IF NOT EXISTS refs_text_detach AFTER UPDATE OF file_attached ON refs WHEN NOT new.file_attached
+BEGIN
+    DELETE FROM refs_text_state WHERE ref_uuid = new.ref_uuid;
+END
+"""
+
+CREATE_REFERENCE_TEXT_REFERENCE_TRIGGER = """
+CREATE TRIGGER IF NOT EXISTS refs_text_reference AFTER DELETE ON refs
+BEGIN
+    DELETE FROM refs_text_state WHERE ref_uuid = old.ref_uuid;
+END
+"""
+
+CREATE_EXPERIMENT_NOTEBOOK_INDEX = """
+CREATE INDEX IF NOT EXISTS experiment_notebook ON experiment (nb_uuid, exp_key, exp_uuid)
+"""
+
 SELECT_NOTEBOOK = """
 SELECT nb_uuid, name, proj_id FROM notebook ORDER BY name ASC
 """
@@ -275,6 +350,10 @@ DELETE_NOTEBOOK = """
 DELETE FROM notebook WHERE nb_uuid = :nb_uuid
 """
 
+SELECT_NOTEBOOK_DATASET_UUID = """
+SELECT dt_uuid FROM dataset WHERE nb_uuid = :nb_uuid
+"""
+
 SELECT_PROJECT = """
 SELECT proj_id, name, description FROM project ORDER BY name ASC
 """
@@ -332,8 +411,9 @@ SELECT subcategory_id, name, category_id FROM subcategory ORDER BY category_id A
 """
 
 SELECT_REFS = """
-SELECT ref_uuid, title, author, year, category_id, subcategory_id FROM refs ORDER BY category_id ASC, 
-subcategory_id ASC
+SELECT refs.ref_uuid, refs_label.label, refs.category_id, refs.subcategory_id FROM refs 
+INNER JOIN refs_label ON refs_label.ref_uuid = refs.ref_uuid 
+ORDER BY refs.category_id ASC, refs.subcategory_id ASC, refs_label.sort_key ASC
 """
 
 INSERT_REF = """
@@ -389,6 +469,49 @@ file_attached = :file_attached
 WHERE ref_uuid = :ref_uuid
 """
 
+SELECT_REFERENCE_KEY = """
+SELECT ref_key FROM refs
+"""
+
+SELECT_REFERENCE_DOI = """
+SELECT doi FROM refs_doi
+"""
+
+REFERENCE_EXPORT_FILTER = """
+WHERE (:category_id IS NULL OR refs.category_id = :category_id)
+  AND (:subcategory_id IS NULL OR refs.subcategory_id = :subcategory_id)
+  AND (:tag IS NULL OR refs.ref_uuid IN (SELECT refs_tag.ref_uuid FROM refs_tag 
+                                         INNER JOIN tags ON tags.tag_id = refs_tag.tag_id WHERE tags.name = :tag))
+"""
+
+SELECT_REFERENCE_EXPORT = """
+SELECT refs.ref_key, refs.ref_type, refs.title, refs.publisher, refs.year, refs.author, refs.editor, refs.volume, 
+       refs.address, refs.edition, refs.journal, refs.chapter, refs.pages, refs.issue, refs.school, refs.description, 
+       refs.abstract, refs_doi.doi, 
+       (SELECT group_concat(tags.name, ', ') FROM refs_tag INNER JOIN tags ON tags.tag_id = refs_tag.tag_id 
+        WHERE refs_tag.ref_uuid = refs.ref_uuid) 
+FROM refs LEFT JOIN refs_doi ON refs_doi.ref_uuid = refs.ref_uuid
+""" + REFERENCE_EXPORT_FILTER + """
+ORDER BY refs.ref_key ASC
+"""
+
+SELECT_REFERENCE_EXPORT_COUNT = """
+SELECT COUNT(*) FROM refs
+""" + REFERENCE_EXPORT_FILTER
+
+INSERT_REFERENCE_LABEL = """
+INSERT OR REPLACE INTO refs_label (ref_uuid, label, sort_key) VALUES (:ref_uuid, :label, :sort_key)
+"""
+
+SELECT_REFERENCE_LABEL_MISSING = """
+SELECT ref_uuid, ref_key, author, year, title FROM refs 
+WHERE ref_uuid NOT IN (SELECT ref_uuid FROM refs_label)
+"""
+
+INSERT_REFERENCE_DOI = """
+INSERT INTO refs_doi (ref_uuid, doi) VALUES (:ref_uuid, :doi)
+"""
+
 INSERT_TAG = """
 INSERT OR IGNORE INTO tags (name) VALUES (:name)
 """
@@ -417,8 +540,48 @@ SELECT_TAG = """
 SELECT name FROM tags
 """
 
+SELECT_TAG_NAME_ID = """
+SELECT name FROM tags WHERE tag_id = :tag_id
+"""
+
 SELECT_REFERENCE_TAG_NAME = """
-SELECT name FROM tags WHERE tag_id = (SELECT tag_id FROM refs_tag WHERE ref_uuid=:ref_uuid)
+SELECT name FROM tags WHERE tag_id IN (SELECT tag_id FROM refs_tag WHERE ref_uuid=:ref_uuid)
+"""
+
+SELECT_REFERENCE_TEXT_STATE = """
+SELECT refs.ref_uuid, refs_text_state.blob_hash FROM refs 
+LEFT JOIN refs_text_state ON refs_text_state.ref_uuid = refs.ref_uuid WHERE refs.file_attached
+"""
+
+SELECT_REFERENCE_TEXT_ID = """
+SELECT text_id FROM refs_text_state WHERE ref_uuid=:ref_uuid
+"""
+
+INSERT_REFERENCE_TEXT_STATE = """
+INSERT INTO refs_text_state (ref_uuid, blob_hash) VALUES (:ref_uuid, :blob_hash)
+"""
+
+UPDATE_REFERENCE_TEXT_STATE = """
+UPDATE refs_text_state SET blob_hash=:blob_hash WHERE text_id=:text_id
+"""
+
+DELETE_REFERENCE_TEXT = """
+DELETE FROM refs_text WHERE rowid=:text_id
+"""
+
+INSERT_REFERENCE_TEXT = """
+INSERT INTO refs_text (rowid, content) VALUES (:text_id, :content)
+"""
+
+SELECT_REFERENCE_SEARCH = """
+SELECT ref_uuid FROM refs 
+WHERE ref_key LIKE :search OR title LIKE :search OR author LIKE :search OR journal LIKE :search 
+OR abstract LIKE :search
+"""
+
+SELECT_REFERENCE_TEXT_SEARCH = """
+SELECT refs_text_state.ref_uuid FROM refs_text 
+JOIN refs_text_state ON refs_text_state.text_id = refs_text.rowid WHERE refs_text MATCH :match
 """
 
 SELECT_SAMPLE = """
@@ -549,7 +712,9 @@ SELECT prt_key, name, description, date_created, date_updated FROM protocol WHER
 """
 
 SELECT_REFERENCE_COMPLETER_LIST = """
-SELECT ref_uuid, ref_key, author, year, title FROM refs
+SELECT refs.ref_uuid, refs.ref_key, refs_label.label FROM refs 
+INNER JOIN refs_label ON refs_label.ref_uuid = refs.ref_uuid 
+ORDER BY refs_label.sort_key ASC
 """
 
 SELECT_PROTOCOL_COMPLETER_LIST = """
@@ -570,7 +735,7 @@ INSERT OR IGNORE INTO protocol_references (prot_uuid, ref_uuid) VALUES (:prot_uu
 """
 
 SELECT_PROTOCOL_TAG_NAME = """
-SELECT name FROM tags WHERE tag_id = (SELECT tag_id FROM protocol_tag WHERE prot_uuid=:prot_uuid)
+SELECT name FROM tags WHERE tag_id IN (SELECT tag_id FROM protocol_tag WHERE prot_uuid=:prot_uuid)
 """
 
 SELECT_PROTOCOL_REFERENCE_UUID = """
@@ -594,7 +759,13 @@ SELECT exp_key FROM experiment WHERE nb_uuid=:nb_uuid
 """
 
 SELECT_EXPERIMENT_NOTEBOOK = """
-SELECT exp_uuid, name, exp_key FROM experiment WHERE nb_uuid=:nb_uuid ORDER BY exp_key ASC
+SELECT exp_uuid, name, exp_key FROM experiment WHERE nb_uuid=:nb_uuid AND (exp_key, exp_uuid) > (:exp_key, :exp_uuid)
+ORDER BY exp_key ASC, exp_uuid ASC LIMIT :limit
+"""
+
+SELECT_EXPERIMENT_NOTEBOOK_NO_KEY = """
+SELECT exp_uuid, name, exp_key FROM experiment WHERE nb_uuid=:nb_uuid AND exp_key IS NULL AND exp_uuid > :exp_uuid
+ORDER BY exp_uuid ASC LIMIT :limit
 """
 
 INSERT_EXPERIMENT = """
@@ -610,6 +781,34 @@ description=:description
 WHERE exp_uuid=:exp_uuid
 """
 
+DUPLICATE_EXPERIMENT = """
+INSERT INTO experiment (exp_uuid, exp_key, name, nb_uuid, description)
+SELECT :new_uuid, :exp_key, :name, nb_uuid, description FROM experiment WHERE exp_uuid=:exp_uuid
+"""
+
+DUPLICATE_TAG_EXPERIMENT = """
+INSERT INTO experiment_tag (exp_uuid, tag_id) SELECT :new_uuid, tag_id FROM experiment_tag WHERE exp_uuid=:exp_uuid
+"""
+
+DUPLICATE_REF_EXPERIMENT = """
+INSERT INTO experiment_references (exp_uuid, ref_uuid)
+SELECT :new_uuid, ref_uuid FROM experiment_references WHERE exp_uuid=:exp_uuid
+"""
+
+DUPLICATE_DATASET_EXPERIMENT = """
+INSERT INTO experiment_dataset (exp_uuid, dt_uuid)
+SELECT :new_uuid, dt_uuid FROM experiment_dataset WHERE exp_uuid=:exp_uuid
+"""
+
+DUPLICATE_PROTOCOL_EXPERIMENT = """
+INSERT INTO experiment_protocol (exp_uuid, prt_uuid)
+SELECT :new_uuid, prt_uuid FROM experiment_protocol WHERE exp_uuid=:exp_uuid
+"""
+
+MOVE_EXPERIMENT = """
+UPDATE experiment SET nb_uuid=:nb_uuid WHERE exp_uuid=:exp_uuid
+"""
+
 DELETE_EXPERIMENT = """
 DELETE FROM experiment WHERE exp_uuid=:exp_uuid
 """
@@ -618,6 +817,10 @@ SELECT_EXPERIMENT = """
 SELECT exp_key, name, description, date_created, date_updated FROM experiment WHERE exp_uuid=:exp_uuid
 """
 
+SELECT_EXPERIMENT_UPDATED = """
+SELECT date_updated FROM experiment WHERE exp_uuid=:exp_uuid
+"""
+
 INSERT_TAG_EXPERIMENT = """
 INSERT OR IGNORE INTO experiment_tag (exp_uuid, tag_id) 
 VALUES (:exp_uuid, (SELECT tag_id FROM tags WHERE name = :name))
@@ -653,7 +856,7 @@ DELETE FROM experiment_protocol WHERE prt_uuid=:prt_uuid AND exp_uuid=:exp_uuid
 """
 
 SELECT_EXPERIMENT_TAG_NAME = """
-SELECT name FROM tags WHERE tag_id = (SELECT tag_id FROM experiment_tag WHERE exp_uuid=:exp_uuid)
+SELECT name FROM tags WHERE tag_id IN (SELECT tag_id FROM experiment_tag WHERE exp_uuid=:exp_uuid)
 """
 
 SELECT_EXPERIMENT_REFERENCE_UUID = """
@@ -672,6 +875,106 @@ SELECT_EXPERIMENT_TAG = """
 SELECT tag_id FROM experiment_tag WHERE exp_uuid=:exp_uuid
 """
 
+INSERT_BLOB = """
+INSERT OR IGNORE INTO blob (blob_hash, size) VALUES (:blob_hash, :size)
+"""
+
+INSERT_BLOB_LINK = """
+INSERT INTO blob_link (path, blob_hash) VALUES (:path, :blob_hash)
+"""
+
+INCREMENT_BLOB_REFCOUNT = """
+UPDATE blob SET refcount = refcount + 1 WHERE blob_hash=:blob_hash
+"""
+
+DECREMENT_BLOB_REFCOUNT = """
+UPDATE blob SET refcount = refcount - 1 WHERE blob_hash=:blob_hash
+"""
+
+SELECT_BLOB_LINK = """
+SELECT path, blob_hash FROM blob_link WHERE path=:path
+"""
+
+SELECT_BLOB_LINK_DIRECTORY = """
+SELECT path, blob_hash FROM blob_link WHERE substr(path, 1, length(:directory) + 1) = :directory || '/'
+"""
+
+COPY_BLOB_LINK_DIRECTORY = """
+INSERT INTO blob_link (path, blob_hash)
+SELECT :destination || substr(path, length(:directory) + 1), blob_hash FROM blob_link
+WHERE substr(path, 1, length(:directory) + 1) = :directory || '/'
+"""
+
+INCREMENT_BLOB_REFCOUNT_DIRECTORY = """
+UPDATE blob SET refcount = refcount + (SELECT COUNT(*) FROM blob_link WHERE blob_link.blob_hash = blob.blob_hash AND
+                                       substr(path, 1, length(:directory) + 1) = :directory || '/')
+WHERE blob_hash IN (SELECT blob_hash FROM blob_link WHERE substr(path, 1, length(:directory) + 1) = :directory || '/')
+"""
+
+MOVE_BLOB_LINK_DIRECTORY = """
+UPDATE blob_link SET path = :destination || substr(path, length(:directory) + 1)
+WHERE path > :directory || '/' AND path < :directory || '0'
+"""
+
+DELETE_BLOB_LINK = """
+DELETE FROM blob_link WHERE path=:path
+"""
+
+SELECT_UNREFERENCED_BLOB = """
+SELECT blob_hash FROM blob WHERE refcount <= 0
+"""
+
+DELETE_UNREFERENCED_BLOB = """
+DELETE FROM blob WHERE blob_hash=:blob_hash AND refcount <= 0
+"""
+
+SELECT_ALL_BLOB_LINK = """
+SELECT path, blob_hash FROM blob_link
+"""
+
+SELECT_BLOB_HASH = """
+SELECT blob_hash FROM blob
+"""
+
+UPDATE_BLOB_REFCOUNT = """
+UPDATE blob SET refcount = (SELECT COUNT(*) FROM blob_link WHERE blob_link.blob_hash = blob.blob_hash)
+"""
+
+SELECT_PROTOCOL_BODY = """
+SELECT prt_uuid FROM protocol
+"""
+
+SELECT_EXPERIMENT_BODY = """
+SELECT exp_uuid, nb_uuid FROM experiment
+"""
+
+SELECT_PROTOCOL_EXPORT_CATEGORY = """
+SELECT prt_uuid, prt_key, name, date_created, date_updated FROM protocol WHERE category_id=:category_id 
+ORDER BY prt_key ASC
+"""
+
+SELECT_PROTOCOL_EXPORT_SUBCATEGORY = """
+SELECT prt_uuid, prt_key, name, date_created, date_updated FROM protocol WHERE subcategory_id=:subcategory_id 
+ORDER BY prt_key ASC
+"""
+
+SELECT_EXPERIMENT_EXPORT_NOTEBOOK = """
+SELECT exp_uuid, nb_uuid, exp_key, name, date_created, date_updated FROM experiment WHERE nb_uuid=:nb_uuid 
+ORDER BY exp_key ASC
+"""
+
+SELECT_EXPERIMENT_EXPORT_ENTRY = """
+SELECT exp_uuid, nb_uuid, exp_key, name, date_created, date_updated FROM experiment WHERE exp_uuid=:exp_uuid
+"""
+
+SELECT_EXPERIMENT_EXPORT_PROJECT = """
+SELECT experiment.exp_uuid, experiment.nb_uuid, experiment.exp_key, experiment.name, experiment.date_created, 
+       experiment.date_updated 
+FROM experiment JOIN notebook ON experiment.nb_uuid = notebook.nb_uuid 
+WHERE notebook.proj_id=:proj_id 
+ORDER BY notebook.name ASC, experiment.exp_key ASC
+"""
+
 
 """
 Database creation
@@ -705,6 +1008,48 @@ def create_main_database():
     cursor.execute(CREATE_PROTOCOL_REFS_TABLE)
     cursor.execute(CREATE_PROTOCOL_TAG_TABLE)
     cursor.execute(CREATE_REFS_TAG_TABLE)
+    cursor.execute(CREATE_BLOB_TABLE)
+    cursor.execute(CREATE_BLOB_LINK_TABLE)
+    cursor.execute(CREATE_REFERENCE_TEXT_STATE_TABLE)
+    cursor.execute(CREATE_REFERENCE_TEXT_TABLE)
+    cursor.execute(CREATE_REFERENCE_TEXT_DELETE_TRIGGER)
+    cursor.execute(CREATE_REFERENCE_TEXT_DETACH_TRIGGER)
+    cursor.execute(CREATE_REFERENCE_TEXT_REFERENCE_TRIGGER)
+    cursor.execute(CREATE_REFERENCE_DOI_TABLE)
+    cursor.execute(CREATE_REFERENCE_LABEL_TABLE)
+    cursor.execute(CREATE_EXPERIMENT_NOTEBOOK_INDEX)
+    cursor.execute("COMMIT")
+    conn.close()
+
+
+def upgrade_main_database():
+    """ Add the tables created after the first release to an existing database """
+
+    conn = sqlite3.connect(MAIN_DATABASE_FILE_PATH)
+    conn.isolation_level = None
+    cursor = conn.cursor()
+
+    cursor.execute("BEGIN")
+    cursor.execute(CREATE_BLOB_TABLE)
+    cursor.execute(CREATE_BLOB_LINK_TABLE)
+    cursor.execute(CREATE_REFERENCE_TEXT_STATE_TABLE)
+    cursor.execute(CREATE_REFERENCE_TEXT_TABLE)
+    cursor.execute(CREATE_REFERENCE_TEXT_DELETE_TRIGGER)
+    cursor.execute(CREATE_REFERENCE_TEXT_DETACH_TRIGGER)
+    cursor.execute(CREATE_REFERENCE_TEXT_REFERENCE_TRIGGER)
+    cursor.execute(CREATE_REFERENCE_DOI_TABLE)
+    cursor.execute(CREATE_REFERENCE_LABEL_TABLE)
+    cursor.execute(CREATE_EXPERIMENT_NOTEBOOK_INDEX)
+
+    # The first triggers updated the date of every row each time one of them was updated
+    cursor.execute("DROP TRIGGER IF EXISTS exp_date_updated")
+    cursor.execute(CREATE_EXPERIMENT_TABLE_TRIGGER)
+    cursor.execute("DROP TRIGGER IF EXISTS prt_date_updated")
+    cursor.execute(CREATE_PROTOCOL_TABLE_TRIGGER)
+
+    # Prepare the labels of the references created before the label table
+    cursor.execute(SELECT_REFERENCE_LABEL_MISSING)
+    cursor.executemany(INSERT_REFERENCE_LABEL, [label_values(*reference) for reference in cursor.fetchall()])
     cursor.execute("COMMIT")
     conn.close()
 
@@ -761,11 +1106,18 @@ Process functions
 
 
 def process_tag(cursor, insert_list, current_list, insert, delete, value):
+    """ Link the tags of an entry and remove the tags that are not used anymore
+
+    :return: list of the names of the tags removed from the database
+    """
+    removed_list = []
+    current_tag = [row[0] for row in current_list] if current_list else []
+
     if insert_list:
         # Create missing tags
         for tag in insert_list:
             if current_list:
-                if tag not in current_list[0]:
+                if tag not in current_tag:
                     cursor.execute(INSERT_TAG, {'name': tag})
                     value['name'] = tag
                     cursor.execute(insert, value)
@@ -775,7 +1127,7 @@ def process_tag(cursor, insert_list, current_list, insert, delete, value):
                 cursor.execute(insert, value)
         # Remove removed tags
         if current_list:
-            for tag in current_list[0]:
+            for tag in current_tag:
                 if tag not in insert_list:
                     value['name'] = tag
                     cursor.execute(delete, value)
@@ -784,6 +1136,7 @@ def process_tag(cursor, insert_list, current_list, insert, delete, value):
                     # They are expected to occur if the tag is used elsewhere
                     try:
                         cursor.execute(DELETE_TAG, {'name': tag})
+                        removed_list.append(tag)
                     except sqlite3.Error as expt:
                         error_code = sqlite_error.sqlite_err_handler(str(expt))
                         if error_code == sqlite_error.FOREIGN_KEY_CODE:
@@ -793,7 +1146,7 @@ def process_tag(cursor, insert_list, current_list, insert, delete, value):
     else:
         # Remove removed tags
         if current_list:
-            for tag in current_list[0]:
+            for tag in current_tag:
                 if tag not in insert_list:
                     value['name'] = tag
                     cursor.execute(delete, value)
@@ -802,6 +1155,7 @@ def process_tag(cursor, insert_list, current_list, insert, delete, value):
                     # They are expected to occur if the tag is used elsewhere
                     try:
                         cursor.execute(DELETE_TAG, {'name': tag})
+                        removed_list.append(tag)
                     except sqlite3.Error as expt:
                         error_code = sqlite_error.sqlite_err_handler(str(expt))
                         if error_code == sqlite_error.FOREIGN_KEY_CODE:
@@ -809,6 +1163,25 @@ def process_tag(cursor, insert_list, current_list, insert, delete, value):
                         else:
                             raise
 
+    return removed_list
+
+
+def delete_tag_id(cursor, tag_id):
+    """ Delete a tag that is not used anymore
+
+    The foreign key exception raised when the tag is still used is not handled.
+
+    :param cursor: Cursor of the transaction
+    :type cursor: sqlite3.Cursor
+    :param tag_id: Tag id
+    :type tag_id: int
+    :return: list with the name of the tag removed
+    """
+    cursor.execute(SELECT_TAG_NAME_ID, {'tag_id': tag_id})
+    name_list = [row[0] for row in cursor.fetchall()]
+    cursor.execute(DELETE_TAG_ID, {'tag_id': tag_id})
+    return name_list
+
 
 def process_key(cursor, insert_list, current_list, insert, delete, value, key):
     if insert_list:
@@ -871,8 +1244,12 @@ def delete_notebook(nb_uuid):
     :param nb_uuid: UUID of the notebook to delete
     :type nb_uuid: str
     """
+    # The datasets of the notebook are deleted with it
+    dataset_list = execute_query(SELECT_NOTEBOOK_DATASET_UUID, nb_uuid=uuid_bytes(nb_uuid))
     execute_query(DELETE_NOTEBOOK, nb_uuid=uuid_bytes(nb_uuid))
 
+    cache.completer_cache.publish(cache.DATASET, removed=[uuid_string(row[0]) for row in dataset_list])
+
 
 def get_notebook_list():
     """Get a list of all existing notebooks
@@ -1094,7 +1471,7 @@ def select_reference_category():
     # Return the references list
     Category = namedtuple('Category', ['id', 'name', 'subcategory', 'entry'])
     SubCategory = namedtuple('Subcategory', ['id', 'name', 'entry'])
-    Reference = namedtuple('Reference', ['uuid', 'title', 'author', 'year'])
+    Reference = namedtuple('Reference', ['uuid', 'label'])
 
     category_list = []
 
@@ -1113,31 +1490,52 @@ def select_reference_category():
                         reference_list = []
                         if reference_buffer:
                             for reference in reference_buffer:
-                                if reference[4] == category_id and reference[5] == subcategory_id:
+                                if reference[2] == category_id and reference[3] == subcategory_id:
                                     reference_uuid = data.uuid_string(reference[0])
-                                    reference_title = reference[1]
-                                    reference_author = reference[2]
-                                    reference_year = reference[3]
-
-                                    reference_list.append(Reference(reference_uuid, reference_title,
-                                                                    reference_author, reference_year))
+                                    reference_list.append(Reference(reference_uuid, reference[1]))
                         subcategory_list.append(SubCategory(subcategory_id, subcategory_name, reference_list))
 
             reference_list = []
             if reference_buffer:
                 for reference in reference_buffer:
-                    if reference[4] == category_id and reference[5] == None:
+                    if reference[2] == category_id and reference[3] == None:
                         reference_uuid = data.uuid_string(reference[0])
-                        reference_title = reference[1]
-                        reference_author = reference[2]
-                        reference_year = reference[3]
-
-                        reference_list.append(Reference(reference_uuid, reference_title,
-                                                        reference_author, reference_year))
+                        reference_list.append(Reference(reference_uuid, reference[1]))
             category_list.append(Category(category_id, category_name, subcategory_list, reference_list))
     return category_list
 
 
+def label_values(ref_uuid, ref_key, author=None, year=None, title=None):
+    """ Prepare the INSERT_REFERENCE_LABEL values of a reference
+
+    :param ref_uuid: Reference UUID
+    :type ref_uuid: bytes
+    :param ref_key: Reference key
+    :type ref_key: str
+    :param author: Authors
+    :type author: str
+    :param year: Year of publication
+    :type year: int
+    :param title: Title
+    :type title: str
+    :return dict: Query values
+    """
+    label, sort_key = data.reference_label(ref_key, author=author, year=year, title=title)
+    return {'ref_uuid': ref_uuid, 'label': label, 'sort_key': sort_key}
+
+
+def reference_entry(label, ref_key):
+    """ Prepare the completer entry of a reference
+
+    :param label: INSERT_REFERENCE_LABEL values of the reference
+    :type label: dict
+    :param ref_key: Reference key
+    :type ref_key: str
+    :return dict: Completer entry
+    """
+    return {'uuid': data.uuid_string(label['ref_uuid']), 'key': ref_key, 'name': label['label']}
+
+
 def insert_ref(ref_uuid, ref_key, ref_type, category_id, subcategory_id=None, file_attached=False, title=None,
                publisher=None, year=None, author=None, editor=None, volume=None, address=None, edition=None,
                journal=None, chapter=None, pages=None, issue=None, description=None, abstract=None, tag_list=None,
@@ -1174,6 +1572,8 @@ def insert_ref(ref_uuid, ref_key, ref_type, category_id, subcategory_id=None, fi
                                         'subcategory_id': subcategory_id,
                                         'category_id': category_id,
                                         'school': school})
+        label = label_values(ref_uuid, ref_key, author=author, year=year, title=title)
+        cursor.execute(INSERT_REFERENCE_LABEL, label)
 
         # Add the tags
 
@@ -1184,6 +1584,39 @@ def insert_ref(ref_uuid, ref_key, ref_type, category_id, subcategory_id=None, fi
 
         cursor.execute("COMMIT")
 
+    cache.completer_cache.publish(cache.REFERENCE, updated=[reference_entry(label, ref_key)])
+    cache.completer_cache.publish(cache.TAG, updated=tag_list)
+
+
+def insert_ref_list(cursor, reference_list):
+    """ Insert several references in a single transaction
+
+    :param cursor: Cursor of a connection in autocommit mode
+    :type cursor: sqlite3.Cursor
+    :param reference_list: INSERT_REF values of each reference with its 'doi' and its 'tag_list'
+    :type reference_list: list of dict
+    """
+    cursor.execute("BEGIN")
+    try:
+        cursor.executemany(INSERT_REF, reference_list)
+        cursor.executemany(INSERT_REFERENCE_DOI, [reference for reference in reference_list if reference['doi']])
+        label_list = [label_values(reference['ref_uuid'], reference['ref_key'], author=reference['author'],
+                                   year=reference['year'], title=reference['title']) for reference in reference_list]
+        cursor.executemany(INSERT_REFERENCE_LABEL, label_list)
+
+        tag_list = [{'ref_uuid': reference['ref_uuid'], 'name': tag} for reference in reference_list
+                    for tag in reference['tag_list']]
+        cursor.executemany(INSERT_TAG, tag_list)
+        cursor.executemany(INSERT_TAG_REF, tag_list)
+    except sqlite3.Error:
+        cursor.execute("ROLLBACK")
+        raise
+    cursor.execute("COMMIT")
+
+    cache.completer_cache.publish(cache.REFERENCE, updated=[reference_entry(label, reference['ref_key'])
+                                                            for label, reference in zip(label_list, reference_list)])
+    cache.completer_cache.publish(cache.TAG, updated=set([tag['name'] for tag in tag_list]))
+
 
 def update_ref(ref_uuid, ref_key, ref_type, title=None, publisher=None, year=None, author=None, editor=None,
                volume=None, address=None, edition=None, journal=None, chapter=None, pages=None, issue=None,
@@ -1217,17 +1650,22 @@ def update_ref(ref_uuid, ref_key, ref_type, title=None, publisher=None, year=Non
                                     'school': school,
                                     'description': description,
                                     'abstract': abstract})
+        label = label_values(ref_uuid, ref_key, author=author, year=year, title=title)
+        cursor.execute(INSERT_REFERENCE_LABEL, label)
 
         # Handle the tags
         uuid_dict = {'ref_uuid': ref_uuid}
         cursor.execute(SELECT_REFERENCE_TAG_NAME, uuid_dict)
         current_tag_list = cursor.fetchall()
 
-        process_tag(cursor=cursor, insert_list=tag_list, current_list=current_tag_list,
-                    insert=INSERT_TAG_REF, delete=DELETE_TAG_REF, value=uuid_dict)
+        removed_tag = process_tag(cursor=cursor, insert_list=tag_list, current_list=current_tag_list,
+                                  insert=INSERT_TAG_REF, delete=DELETE_TAG_REF, value=uuid_dict)
 
         cursor.execute("COMMIT")
 
+    cache.completer_cache.publish(cache.REFERENCE, updated=[reference_entry(label, ref_key)])
+    cache.completer_cache.publish(cache.TAG, updated=tag_list, removed=removed_tag)
+
 
 def select_reference(ref_uuid):
     """ Select data for a specific reference
@@ -1272,41 +1710,129 @@ def select_reference_tag_name(ref_uuid):
     return tag_list
 
 
+def select_reference_text_state():
+    """ Get the content hash of the indexed PDF of every reference with a PDF
+
+    :return: list of (ref_uuid, blob_hash), the hash is None when the PDF is not indexed
+    """
+    buffer = execute_query(SELECT_REFERENCE_TEXT_STATE)
+
+    state_list = []
+
+    for reference in buffer:
+        state_list.append((data.uuid_string(reference[0]), reference[1]))
+    return state_list
+
+
+def update_reference_text(ref_uuid, blob_hash, content):
+    """ Replace the indexed text of a reference PDF
+
+    :param ref_uuid: Reference UUID
+    :type ref_uuid: str
+    :param blob_hash: Content hash of the indexed PDF
+    :type blob_hash: str
+    :param content: PDF text
+    :type content: str
+    """
+    conn = sqlite3.connect(MAIN_DATABASE_FILE_PATH)
+    conn.isolation_level = None
+    conn.execute("PRAGMA foreign_keys = ON")
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute("BEGIN")
+        cursor.execute(SELECT_REFERENCE_TEXT_ID, {'ref_uuid': data.uuid_bytes(ref_uuid)})
+        buffer = cursor.fetchall()
+
+        if buffer:
+            text_id = buffer[0][0]
+            cursor.execute(UPDATE_REFERENCE_TEXT_STATE, {'text_id': text_id, 'blob_hash': blob_hash})
+            cursor.execute(DELETE_REFERENCE_TEXT, {'text_id': text_id})
+        else:
+            cursor.execute(INSERT_REFERENCE_TEXT_STATE, {'ref_uuid': data.uuid_bytes(ref_uuid), 'blob_hash': blob_hash})
+            text_id = cursor.lastrowid
+
+        cursor.execute(INSERT_REFERENCE_TEXT, {'text_id': text_id, 'content': content})
+        cursor.execute("COMMIT")
+    except sqlite3.Error:
+        cursor.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+
+def select_reference_export(category_id=None, subcategory_id=None, tag=None):
+    """ Iterate over the references to export
+
+    The rows are read from the cursor one at a time instead of being fetched at once so that the memory used does not
+    depend on the number of references. The connection is closed when the generator is exhausted or closed.
+
+    :param category_id: Category id
+    :type category_id: int
+    :param subcategory_id: Subcategory id
+    :type subcategory_id: int
+    :param tag: Tag name
+    :type tag: str
+    :return: generator of reference dict
+    """
+    column_list = ['ref_key', 'ref_type', 'title', 'publisher', 'year', 'author', 'editor', 'volume', 'address',
+                   'edition', 'journal', 'chapter', 'pages', 'issue', 'school', 'description', 'abstract', 'doi',
+                   'tags']
+    conn = sqlite3.connect(MAIN_DATABASE_FILE_PATH)
+    try:
+        cursor = conn.cursor()
+        cursor.execute(SELECT_REFERENCE_EXPORT, {'category_id': category_id, 'subcategory_id': subcategory_id,
+                                                 'tag': tag})
+        for row in cursor:
+            yield dict(zip(column_list, row))
+    finally:
+        conn.close()
+
+
+def count_reference_export(category_id=None, subcategory_id=None, tag=None):
+    """ Count the references to export
+
+    :param category_id: Category id
+    :type category_id: int
+    :param subcategory_id: Subcategory id
+    :type subcategory_id: int
+    :param tag: Tag name
+    :type tag: str
+    :return int: Number of references
+    """
+    return execute_query(SELECT_REFERENCE_EXPORT_COUNT, category_id=category_id, subcategory_id=subcategory_id,
+                         tag=tag)[0][0]
+
+
+def select_reference_search(search):
+    """ Get the references whose informations or PDF text match a search
+
+    :param search: Searched text
+    :type search: str
+    :return: set of reference UUID
+    """
+    buffer = execute_query(SELECT_REFERENCE_SEARCH, search='%{}%'.format(search))
+
+    # Every word must be in the text, the last one can be incomplete
+    word_list = re.findall(r"\w+", search)
+    if word_list:
+        match = " ".join(['"{}"'.format(word) for word in word_list]) + "*"
+        buffer = buffer + execute_query(SELECT_REFERENCE_TEXT_SEARCH, match=match)
+
+    return set([data.uuid_string(reference[0]) for reference in buffer])
+
+
 def select_reference_completer_list():
-    """ Get all the dataset key from the database """
+    """ Get the key and the label of all the references """
 
     # Execute the query
     buffer = execute_query(SELECT_REFERENCE_COMPLETER_LIST)
 
-    # Return the tag list
+    # Return the reference list
     reference_list = []
 
     for reference in buffer:
-        # Prepare the name
-        author = None
-        label = ""
-        if reference[2]:
-            author_list = reference[2].split(',')
-            if len(author_list) == 1:
-                label = "{}".format(author_list[0].split()[len(author_list[0].split())-1])
-            elif len(author_list) == 2:
-                label = "{} & {}".format(author_list[0].split()[len(author_list[0].split())-1],
-                                         author_list[1].split()[len(author_list[1].split())-1])
-            else:
-                label = "{} et al.".format(author_list[0].split()[len(author_list[0].split())-1])
-        if reference[3]:
-            if label != "":
-                label = "{} ({})".format(label, reference[3])
-            else:
-                label = "({})".format(reference[3])
-        if reference[4]:
-            if label != "":
-                label = "{}, {}".format(label, reference[4])
-            else:
-                label = "{}".format(reference[4])
-
-        # Create the list
-        reference_list.append({'uuid': data.uuid_string(reference[0]), 'key': reference[1], 'name': label})
+        reference_list.append({'uuid': data.uuid_string(reference[0]), 'key': reference[1], 'name': reference[2]})
     return reference_list
 
 
@@ -1438,11 +1964,15 @@ Dataset query
 def insert_dataset(dt_uuid, name, dt_key, nb_uuid):
     """ Insert a dataset in the database """
     execute_query(INSERT_DATASET, dt_uuid=dt_uuid, name=name, dt_key=dt_key, nb_uuid=nb_uuid)
+    cache.completer_cache.publish(cache.DATASET, updated=[{'uuid': data.uuid_string(dt_uuid), 'key': dt_key,
+                                                           'name': name}])
 
 
 def update_dataset(dt_uuid, name, dt_key):
     """ Update a dataset in the database """
     execute_query(UPDATE_DATASET, dt_uuid=dt_uuid, name=name, dt_key=dt_key)
+    cache.completer_cache.publish(cache.DATASET, updated=[{'uuid': data.uuid_string(dt_uuid), 'key': dt_key,
+                                                           'name': name}])
 
 
 def select_dataset():
@@ -1536,7 +2066,7 @@ def select_protocol_category():
     # Return the references list
     Category = namedtuple('Category', ['id', 'name', 'subcategory', 'entry'])
     SubCategory = namedtuple('Subcategory', ['id', 'name', 'entry'])
-    Protocol = namedtuple('Protocol', ['uuid', 'title', 'author', 'year'])
+    Protocol = namedtuple('Protocol', ['uuid', 'label'])
 
     category_list = []
 
@@ -1559,7 +2089,7 @@ def select_protocol_category():
                                     protocol_uuid = data.uuid_string(protocol[0])
                                     protocol_name = protocol[1]
 
-                                    protocol_list.append(Protocol(protocol_uuid, protocol_name, None, None))
+                                    protocol_list.append(Protocol(protocol_uuid, protocol_name))
                         subcategory_list.append(SubCategory(subcategory_id, subcategory_name, protocol_list))
 
             protocol_list = []
@@ -1569,7 +2099,7 @@ def select_protocol_category():
                         protocol_uuid = data.uuid_string(protocol[0])
                         protocol_name = protocol[1]
 
-                        protocol_list.append(Protocol(protocol_uuid, protocol_name, None, None))
+                        protocol_list.append(Protocol(protocol_uuid, protocol_name))
             category_list.append(Category(category_id, category_name, subcategory_list, protocol_list))
     return category_list
 
@@ -1598,6 +2128,28 @@ def update_protocol_category(ref_uuid, category_id, subcategory_id=None):
                   ref_uuid=data.uuid_bytes(ref_uuid))
 
 
+def select_protocol_export(category_id=None, subcategory_id=None):
+    """ Get the protocols to export from a category or a subcategory
+
+    :param category_id: Category id
+    :type category_id: int
+    :param subcategory_id: Subcategory id
+    :type subcategory_id: int
+    :return: list of protocol dict
+    """
+    if subcategory_id is not None:
+        buffer = execute_query(SELECT_PROTOCOL_EXPORT_SUBCATEGORY, subcategory_id=subcategory_id)
+    else:
+        buffer = execute_query(SELECT_PROTOCOL_EXPORT_CATEGORY, category_id=category_id)
+
+    protocol_list = []
+
+    for protocol in buffer:
+        protocol_list.append({'prt_uuid': data.uuid_string(protocol[0]), 'key': protocol[1], 'name': protocol[2],
+                              'created': protocol[3], 'updated': protocol[4]})
+
+    return protocol_list
+
 
 """
 Experiment query
@@ -1619,11 +2171,34 @@ def select_experiment_key_notebook(nb_uuid):
     return key_list
 
 
-def get_experiment_list_notebook(nb_uuid):
-    """ Get all the experiment name and key for a specific notebook """
+def get_experiment_list_notebook(nb_uuid, after=None, limit=-1):
+    """ Get the experiment name and key for a specific notebook ordered by key
 
-    # Execute the query
-    buffer = execute_query(SELECT_EXPERIMENT_NOTEBOOK, nb_uuid=nb_uuid)
+    The experiments can be read one page at a time by giving the last experiment of the previous page, each page is
+    then read from the index without skipping the previous ones. The experiments without key come first.
+
+    :param nb_uuid: Notebook UUID
+    :type nb_uuid: bytes
+    :param after: Key and UUID of the last experiment of the previous page, None for the first page
+    :type after: tuple
+    :param limit: Maximum number of experiments, every experiment when it is negative
+    :type limit: int
+    :return: list of experiment dict
+    """
+    with sqlite3.connect(MAIN_DATABASE_FILE_PATH) as conn:
+        cursor = conn.cursor()
+
+        buffer = []
+        if after is None or after[0] is None:
+            cursor.execute(SELECT_EXPERIMENT_NOTEBOOK_NO_KEY, {'nb_uuid': nb_uuid, 'limit': limit,
+                                                               'exp_uuid': after[1] if after else b''})
+            buffer = cursor.fetchall()
+            after = ('', b'')
+
+        if limit < 0 or len(buffer) < limit:
+            cursor.execute(SELECT_EXPERIMENT_NOTEBOOK, {'nb_uuid': nb_uuid, 'exp_key': after[0], 'exp_uuid': after[1],
+                                                        'limit': limit - len(buffer) if limit >= 0 else limit})
+            buffer = buffer + cursor.fetchall()
 
     experiment_list = []
 
@@ -1631,3 +2206,31 @@ def get_experiment_list_notebook(nb_uuid):
         experiment_list.append({'exp_uuid': experiment[0], 'name': experiment[1], 'key': experiment[2]})
 
     return experiment_list
+
+
+def select_experiment_export(nb_uuid=None, proj_id=None, exp_uuid=None):
+    """ Get the experiments to export from a notebook or a project, or a single experiment
+
+    :param nb_uuid: Notebook UUID
+    :type nb_uuid: str
+    :param proj_id: Project id
+    :type proj_id: int
+    :param exp_uuid: Experiment UUID
+    :type exp_uuid: str
+    :return: list of experiment dict
+    """
+    if exp_uuid is not None:
+        buffer = execute_query(SELECT_EXPERIMENT_EXPORT_ENTRY, exp_uuid=data.uuid_bytes(exp_uuid))
+    elif nb_uuid is not None:
+        buffer = execute_query(SELECT_EXPERIMENT_EXPORT_NOTEBOOK, nb_uuid=data.uuid_bytes(nb_uuid))
+    else:
+        buffer = execute_query(SELECT_EXPERIMENT_EXPORT_PROJECT, proj_id=proj_id)
+
+    experiment_list = []
+
+    for experiment in buffer:
+        experiment_list.append({'exp_uuid': data.uuid_string(experiment[0]), 'nb_uuid': data.uuid_string(experiment[1]),
+                                'key': experiment[2], 'name': experiment[3], 'created': experiment[4],
+                                'updated': experiment[5]})
+
+    return experiment_list
@@ -9,6 +9,9 @@ PROTOCOL_DIRECTORY_PATH = os.path.join(DEFAULT_MAIN_DIRECTORY_PATH + "/Protocols
 LIBRARY_DIRECTORY_PATH = os.path.join(DEFAULT_MAIN_DIRECTORY_PATH + "/Library")
 PYTHON_LIBRARY_DIRECTORY_PATH = os.path.join(LIBRARY_DIRECTORY_PATH + "/python")
 R_LIBRARY_DIRECTORY_PATH = os.path.join(LIBRARY_DIRECTORY_PATH + "/R")
+BLOB_DIRECTORY_PATH = os.path.join(DEFAULT_MAIN_DIRECTORY_PATH + "/Blobs")
+CACHE_DIRECTORY_PATH = os.path.join(DEFAULT_MAIN_DIRECTORY_PATH + "/Cache")
+IMAGE_CACHE_DIRECTORY_PATH = os.path.join(CACHE_DIRECTORY_PATH + "/Images")
 
 
 def notebook_path(nb_uuid):
@@ -0,0 +1,274 @@
+""" This module contains the functions used to walk through the QTextDocument content and to save it
+
+The bodies are saved in a compact JSON serialization instead of the HTML of QTextDocument.toHtml, which repeats the
+style of every span and is slow to parse. The formats are kept once in a table and the blocks refer to them by index.
+The documents are rebuilt directly with a QTextCursor. The bodies saved in HTML by the previous versions are still read,
+they are written in the new format the next time they are saved.
+"""
+
+# Python import
+import html
+import json
+
+# PyQt import
+from PyQt5.QtGui import QTextDocument, QTextCursor, QTextFormat, QTextCharFormat, QTextBlockFormat, QTextListFormat, \
+    QBrush, QColor, QTextLength
+from PyQt5.QtCore import Qt
+
+# Version of the serialization, the serialized bodies start with it
+VERSION = 1
+PREFIX = '{"labnote"'
+
+# Properties that refer to objects of a document and are set again when it is read
+IGNORED_PROPERTIES = (QTextFormat.ObjectIndex,)
+
+
+def fragments(document):
+    """ Iterate over all the text fragments of a document
+
+    A fragment is a run of characters that share the same format. Iterating over the fragments is much faster than
+    moving a cursor one character at a time.
+
+    :param document: Document to iterate
+    :type document: QTextDocument
+    :return: QTextFragment generator
+    """
+    block = document.begin()
+
+    while block.isValid():
+        iterator = block.begin()
+
+        while not iterator.atEnd():
+            fragment = iterator.fragment()
+            if fragment.isValid():
+                yield fragment
+            iterator += 1
+
+        block = block.next()
+
+
+def is_serialized(body):
+    """ Return if a body is serialized or saved in HTML by a previous version
+
+    :param body: Body
+    :type body: str
+    :return bool: True when the body is serialized
+    """
+    return body.startswith(PREFIX)
+
+
+def encode_value(value):
+    """ Return a format property value that can be written in JSON
+
+    :param value: Property value
+    :return: JSON value or None when the value type is not supported
+    """
+    if isinstance(value, (bool, int, float, str)):
+        return value
+    elif isinstance(value, QBrush):
+        if value.style() in (Qt.NoBrush, Qt.SolidPattern):
+            return {'brush': [int(value.style()), value.color().rgba()]}
+    elif isinstance(value, QColor):
+        return {'color': value.rgba()}
+    elif isinstance(value, QTextLength):
+        return {'length': [int(value.type()), value.rawValue()]}
+    elif isinstance(value, list) and all(isinstance(item, str) for item in value):
+        return {'list': value}
+    return None
+
+
+def decode_value(value):
+    """ Return a format property value read from JSON
+
+    :param value: JSON value
+    :return: Property value
+    """
+    if not isinstance(value, dict):
+        return value
+    elif 'brush' in value:
+        return QBrush(QColor.fromRgba(value['brush'][1]), value['brush'][0])
+    elif 'color' in value:
+        return QColor.fromRgba(value['color'])
+    elif 'length' in value:
+        return QTextLength(value['length'][0], value['length'][1])
+    return value['list']
+
+
+def serialize(document):
+    """ Serialize a document
+
+    The documents that contain tables or frames, which are not created by the editors, are saved in HTML. The HTML
+    parser creates an empty frame for each image, these frames are ignored.
+
+    :param document: Document to serialize
+    :type document: QTextDocument
+    :return str: Serialized document
+    """
+    if any(frame.firstPosition() <= frame.lastPosition() for frame in document.rootFrame().childFrames()):
+        return document.toHtml()
+
+    format_list = []
+    format_dict = {}
+    document_format_dict = {}
+    list_dict = {}
+
+    def format_index(text_format):
+        properties = {}
+        for key, value in text_format.properties().items():
+            value = encode_value(value)
+            if key not in IGNORED_PROPERTIES and value is not None:
+                properties[str(key)] = value
+
+        # Each distinct format is written once
+        identifier = repr(sorted(properties.items()))
+        index = format_dict.get(identifier)
+        if index is None:
+            index = len(format_list)
+            format_dict[identifier] = index
+            format_list.append(properties)
+        return index
+
+    def document_format_index(document_index, text_format):
+        # The formats are shared by the fragments, they are only converted once
+        index = document_format_dict.get(document_index)
+        if index is None:
+            index = format_index(text_format)
+            document_format_dict[document_index] = index
+        return index
+
+    list_list = []
+    block_list = []
+    block = document.begin()
+    while block.isValid():
+        # The list of a block is identified by the position of its first block
+        list_index = -1
+        text_list = block.textList()
+        if text_list:
+            list_key = text_list.item(0).position()
+            list_index = list_dict.get(list_key)
+            if list_index is None:
+                list_index = len(list_list)
+                list_dict[list_key] = list_index
+                list_list.append(format_index(text_list.format()))
+
+        entry = [document_format_index(block.blockFormatIndex(), block.blockFormat()),
+                 document_format_index(block.charFormatIndex(), block.charFormat()), list_index]
+
+        iterator = block.begin()
+        while not iterator.atEnd():
+            fragment = iterator.fragment()
+            document_index = fragment.charFormatIndex()
+            index = document_format_dict.get(document_index)
+            if index is None:
+                index = document_format_index(document_index, fragment.charFormat())
+            entry.extend((fragment.text(), index))
+            iterator += 1
+
+        block_list.append(entry)
+        block = block.next()
+
+    return json.dumps({'labnote': VERSION, 'formats': format_list, 'lists': list_list, 'blocks': block_list},
+                      ensure_ascii=False, separators=(',', ':'))
+
+
+def deserialize(body, document):
+    """ Rebuild a serialized document
+
+    :param body: Serialized document
+    :type body: str
+    :param document: Empty document
+    :type document: QTextDocument
+    """
+    content = json.loads(body)
+    format_list = content['formats']
+    format_cache = {}
+
+    def text_format(format_class, index):
+        key = (format_class, index)
+        value = format_cache.get(key)
+        if value is None:
+            value = format_class()
+            for property_id, property_value in format_list[index].items():
+                value.setProperty(int(property_id), decode_value(property_value))
+            format_cache[key] = value
+        return value
+
+    cursor = QTextCursor(document)
+    cursor.beginEditBlock()
+
+    text_list_dict = {}
+    for number, entry in enumerate(content['blocks']):
+        block_format = text_format(QTextBlockFormat, entry[0])
+        block_char_format = text_format(QTextCharFormat, entry[1])
+        if number:
+            cursor.insertBlock(block_format, block_char_format)
+        else:
+            cursor.setBlockFormat(block_format)
+            cursor.setBlockCharFormat(block_char_format)
+
+        list_index = entry[2]
+        if list_index >= 0:
+            text_list = text_list_dict.get(list_index)
+            if text_list is None:
+                text_list_dict[list_index] = cursor.createList(text_format(QTextListFormat,
+                                                                           content['lists'][list_index]))
+            else:
+                text_list.add(cursor.block())
+
+        for position in range(3, len(entry), 2):
+            cursor.insertText(entry[position], text_format(QTextCharFormat, entry[position + 1]))
+
+    cursor.endEditBlock()
+
+
+def to_html(body):
+    """ Return the HTML of a body, serialized or not
+
+    This function only use QTextDocument and can be called outside of the GUI thread.
+
+    :param body: Body
+    :type body: str
+    :return: HTML str
+    """
+    if not is_serialized(body):
+        return body
+
+    document = QTextDocument()
+    document.setUndoRedoEnabled(False)
+    deserialize(body, document)
+    return document.toHtml()
+
+
+def image_names(body):
+    """ Return the names of the images of a serialized body, the body is not rebuilt
+
+    :param body: Serialized document
+    :type body: str
+    :return: list of str
+    """
+    key = str(QTextFormat.ImageName)
+    return [properties[key] for properties in json.loads(body)['formats'] if key in properties]
+
+
+def replace_path(body, source, destination):
+    """ Replace a directory path in the image paths of a body, serialized or not
+
+    The paths are replaced as text in one pass, the body is not rebuilt.
+
+    :param body: Body
+    :type body: str
+    :param source: Directory path used in the body
+    :type source: str
+    :param destination: New directory path
+    :type destination: str
+    :return str: Body with the new path
+    """
+    if is_serialized(body):
+        # The paths are escaped in JSON strings
+        source = json.dumps(source, ensure_ascii=False)[1:-1]
+        destination = json.dumps(destination, ensure_ascii=False)[1:-1]
+    else:
+        # The paths are escaped in the HTML attributes
+        source = html.escape(source, quote=True)
+        destination = html.escape(destination, quote=True)
+    return body.replace(source + "/", destination + "/")
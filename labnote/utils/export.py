@@ -0,0 +1,285 @@
+""" This module contains the functions used to export the protocols and the experiments """
+
+# Python import
+import os
+import re
+import base64
+import mimetypes
+from html import unescape
+from collections import namedtuple
+
+# PyQt import
+from PyQt5.QtGui import QTextDocument, QTextCursor, QTextBlockFormat, QTextFormat, QPdfWriter
+
+# Project import
+from labnote.core import data
+from labnote.utils import database, files, pdftools, date, image
+
+# Entry to export
+Entry = namedtuple('Entry', ['uuid', 'title', 'key', 'created', 'updated', 'file'])
+
+# Export formats, they are also the file extensions
+PDF = 'pdf'
+HTML = 'html'
+
+# Image sources and body of the HTML written by QTextDocument
+IMAGE_SOURCE = re.compile(r'<img[^>]*?\ssrc="([^"]*)"')
+HTML_BODY = re.compile(r'<body[^>]*>(.*)</body>', re.DOTALL)
+
+# Number of image bytes encoded at once, a multiple of 3 so that the encoded chunks can be written one after the other
+INLINE_CHUNK_SIZE = 3 * 256 * 1024
+
+
+"""
+Entry selection
+"""
+
+
+def protocol_entries(category_id=None, subcategory_id=None):
+    """ Get the protocols of a category or a subcategory
+
+    :param category_id: Category id
+    :type category_id: int
+    :param subcategory_id: Subcategory id
+    :type subcategory_id: int
+    :return: list of Entry
+    """
+    entry_list = []
+
+    for protocol in database.select_protocol_export(category_id=category_id, subcategory_id=subcategory_id):
+        entry_list.append(Entry(protocol['prt_uuid'], protocol['name'], protocol['key'], protocol['created'],
+                                protocol['updated'], files.protocol_file(protocol['prt_uuid'])))
+
+    return entry_list
+
+
+def experiment_entries(nb_uuid=None, proj_id=None, exp_uuid=None):
+    """ Get the experiments of a notebook or a project, or a single experiment
+
+    :param nb_uuid: Notebook UUID
+    :type nb_uuid: str
+    :param proj_id: Project id
+    :type proj_id: int
+    :param exp_uuid: Experiment UUID
+    :type exp_uuid: str
+    :return: list of Entry
+    """
+    entry_list = []
+
+    for experiment in database.select_experiment_export(nb_uuid=nb_uuid, proj_id=proj_id, exp_uuid=exp_uuid):
+        entry_list.append(Entry(experiment['exp_uuid'], experiment['name'], experiment['key'], experiment['created'],
+                                experiment['updated'],
+                                files.experiment_file(nb_uuid=experiment['nb_uuid'], exp_uuid=experiment['exp_uuid'])))
+
+    return entry_list
+
+
+def entry_filenames(entry_list, directory, file_format=PDF):
+    """ Return a distinct file name for each entry
+
+    :param entry_list: Entries to export
+    :type entry_list: list of Entry
+    :param directory: Destination directory
+    :type directory: str
+    :param file_format: Export format
+    :type file_format: str
+    :return: list of str
+    """
+    filename_list = []
+    used = set([])
+
+    for entry in entry_list:
+        name = entry.key or entry.uuid
+        filename = name
+        number = 2
+
+        while filename.lower() in used:
+            filename = "{}-{}".format(name, number)
+            number = number + 1
+
+        used.add(filename.lower())
+        filename_list.append(os.path.join(directory, "{}.{}".format(filename, file_format)))
+
+    return filename_list
+
+
+"""
+PDF rendering
+"""
+
+
+def entry_html(entry):
+    """ Read an entry body and prepare it for printing
+
+    This function only use QTextDocument and can be called outside of the GUI thread.
+
+    :param entry: Entry to export
+    :type entry: Entry
+    :return: HTML str
+    """
+    with open(entry.file, 'rb') as file:
+        body = data.decode(file.read())
+
+    created = "Original : {}".format(date.utc_to_local(entry.created)) if entry.created else ""
+    updated = "Last update : {}".format(date.utc_to_local(entry.updated)) if entry.updated else None
+
+    return pdftools.prepare_html_pdf(title=entry.title, key=entry.key, date=created, update=updated, body=body)
+
+
+def print_pdf(html_list, filename, page_layout):
+    """ Print one or more HTML documents in a PDF file
+
+    Each document starts on a new page. QPdfWriter is used instead of QPrinter since it can be used outside of the GUI
+    thread.
+
+    :param html_list: HTML documents
+    :type html_list: list of str
+    :param filename: PDF file path
+    :type filename: str
+    :param page_layout: Page layout of the PDF
+    :type page_layout: QPageLayout
+    """
+    document = QTextDocument()
+    document.setUndoRedoEnabled(False)
+    cursor = QTextCursor(document)
+
+    page_break = QTextBlockFormat()
+    page_break.setPageBreakPolicy(QTextFormat.PageBreak_AlwaysBefore)
+
+    for position, html in enumerate(html_list):
+        if position > 0:
+            cursor.movePosition(QTextCursor.End)
+            cursor.insertBlock(page_break)
+        cursor.insertHtml(html)
+
+    writer = QPdfWriter(filename)
+    writer.setPageLayout(page_layout)
+    document.print(writer)
+
+
+def export_pdf(entry, filename, page_layout):
+    """ Export an entry in a PDF file
+
+    :param entry: Entry to export
+    :type entry: Entry
+    :param filename: PDF file path
+    :type filename: str
+    :param page_layout: Page layout of the PDF
+    :type page_layout: QPageLayout
+    """
+    print_pdf([entry_html(entry)], filename, page_layout)
+
+
+def export_body_pdf(title, key, date, update, body, filename, page_layout):
+    """ Export a document body in a PDF file
+
+    :param title: Document title
+    :type title: str
+    :param key: Document key
+    :type key: str
+    :param date: Date created
+    :type date: str
+    :param update: Date updated
+    :type update: str
+    :param body: Text document body
+    :type body: str
+    :param filename: PDF file path
+    :type filename: str
+    :param page_layout: Page layout of the PDF
+    :type page_layout: QPageLayout
+    """
+    html = pdftools.prepare_html_pdf(title=title, key=key, date=date, update=update, body=body)
+    print_pdf([html], filename, page_layout)
+
+
+"""
+HTML rendering
+"""
+
+
+def write_image(file, path):
+    """ Write an image in a data URI
+
+    The image is encoded one chunk at a time so that the encoded image is never held in memory. The image shown in the
+    editors is written instead of the original which can be very large or in a format that browsers cannot show.
+
+    :param file: HTML file
+    :type file: file object
+    :param path: Original image path
+    :type path: str
+    """
+    path = image.display_image_path(path)
+
+    file.write("data:{};base64,".format(mimetypes.guess_type(path)[0] or 'application/octet-stream'))
+    with open(path, 'rb') as image_file:
+        for chunk in iter(lambda: image_file.read(INLINE_CHUNK_SIZE), b''):
+            file.write(base64.b64encode(chunk).decode('ascii'))
+
+
+def write_inline_html(file, html):
+    """ Write HTML with its images inlined
+
+    :param file: HTML file
+    :type file: file object
+    :param html: HTML written by QTextDocument
+    :type html: str
+    """
+    position = 0
+
+    for match in IMAGE_SOURCE.finditer(html):
+        path = unescape(match.group(1))
+        if not os.path.isfile(path):
+            continue
+
+        file.write(html[position:match.start(1)])
+        write_image(file, path)
+        position = match.end(1)
+
+    file.write(html[position:])
+
+
+def write_html(html_list, filename):
+    """ Write one or more HTML documents in a self-contained HTML file
+
+    The documents are written one after the other with their images inlined. The file is written in a temporary file
+    first so that an incomplete export never replace an existing file.
+
+    :param html_list: HTML documents
+    :type html_list: list of str
+    :param filename: HTML file path
+    :type filename: str
+    """
+    temporary = "{}.{}.tmp".format(filename, os.getpid())
+
+    try:
+        with open(temporary, 'w', encoding='utf-8') as file:
+            if len(html_list) == 1:
+                write_inline_html(file, html_list[0])
+            else:
+                # The head of the first document is used for all of them and each one starts on a new page
+                first = HTML_BODY.search(html_list[0])
+                file.write(html_list[0][:first.start(1)] if first else "<html><body>")
+
+                for position, html in enumerate(html_list):
+                    if position > 0:
+                        file.write("<div style=\"page-break-before:always\"></div>")
+                    body = HTML_BODY.search(html)
+                    write_inline_html(file, body.group(1) if body else html)
+
+                file.write("</body></html>")
+        os.replace(temporary, filename)
+    except OSError:
+        if os.path.isfile(temporary):
+            os.remove(temporary)
+        raise
+
+
+def export_html(entry, filename):
+    """ Export an entry in a self-contained HTML file
+
+    :param entry: Entry to export
+    :type entry: Entry
+    :param filename: HTML file path
+    :type filename: str
+    """
+    write_html([entry_html(entry)], filename)
@@ -2,11 +2,34 @@
 
 # Python import
 import os
+import sys
 import shutil
 import uuid
+import ctypes
+import ctypes.util
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# macOS function that clones a file on APFS
+clonefile = None
+if sys.platform == 'darwin':
+    try:
+        clonefile = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True).clonefile
+        clonefile.argtypes = [ctypes.c_char_p, ctypes.c_char_p, ctypes.c_uint32]
+    except (OSError, AttributeError):
+        clonefile = None
 
 # Project import
-from labnote.utils import directory
+from labnote.utils import directory, blobstore
+
+# Linux ioctl request that clones a file on the copy-on-write file systems such as Btrfs and XFS
+FICLONE = 0x40049409
+
+# Number of bytes copied between two progress reports
+COPY_CHUNK_SIZE = 8 * 1024 * 1024
 
 
 def copy_file_to_data(nb_uuid, exp_uuid, path):
@@ -34,6 +57,93 @@ def copy_file_to_data(nb_uuid, exp_uuid, path):
         return exception
 
 
+def clone_file(source_file, destination_file):
+    """ Clone a file, the clone shares the data blocks of the original until one of them is modified
+
+    :param source_file: Original file
+    :type source_file: file object
+    :param destination_file: Clone file
+    :type destination_file: file object
+    :return bool: True if the file was cloned
+    """
+    if fcntl is None:
+        return False
+
+    try:
+        fcntl.ioctl(destination_file.fileno(), FICLONE, source_file.fileno())
+    except OSError:
+        return False
+    return True
+
+
+def clone_path(source, destination):
+    """ Clone a file at a new path, with clonefile on macOS and FICLONE on Linux
+
+    :param source: Original file path
+    :type source: str
+    :param destination: Clone path, it must not exist
+    :type destination: str
+    :return bool: True if the file was cloned, nothing is created otherwise
+    """
+    if clonefile is not None:
+        return clonefile(os.fsencode(source), os.fsencode(destination), 0) == 0
+    elif fcntl is None:
+        return False
+
+    with open(source, 'rb') as source_file, open(destination, 'xb') as destination_file:
+        cloned = clone_file(source_file, destination_file)
+    if not cloned:
+        os.remove(destination)
+    return cloned
+
+
+def copy_file(source, destination, progress=None):
+    """ Copy a file and its metadata
+
+    The file is cloned when the file system supports it, otherwise it is copied by the kernel with copy_file_range when
+    it is available or read and written by chunks.
+
+    :param source: Original file path
+    :type source: str
+    :param destination: Copy path
+    :type destination: str
+    :param progress: Function called with the number of bytes copied and the file size
+    :type progress: function
+    """
+    size = os.path.getsize(source)
+
+    with open(source, 'rb') as source_file, open(destination, 'wb') as destination_file:
+        if not clone_file(source_file, destination_file):
+            copied = 0
+            kernel_copy = hasattr(os, 'copy_file_range')
+
+            while copied < size:
+                if kernel_copy:
+                    try:
+                        length = os.copy_file_range(source_file.fileno(), destination_file.fileno(), COPY_CHUNK_SIZE,
+                                                     copied, copied)
+                    except OSError:
+                        # Not supported between these file systems
+                        kernel_copy = False
+                        continue
+                else:
+                    source_file.seek(copied)
+                    destination_file.seek(copied)
+                    length = destination_file.write(source_file.read(COPY_CHUNK_SIZE))
+
+                if length == 0:
+                    break
+
+                copied = copied + length
+                if progress:
+                    progress(copied, size)
+
+    shutil.copystat(source, destination)
+
+    if progress:
+        progress(size, size)
+
+
 def protocol_image_path(prt_uuid, extension):
     """ Return the protocol image path
 
@@ -52,8 +162,7 @@ def add_image_protocol(prt_uuid, path, extention):
     :return str: Path of the inserted image
     """
     image_path = protocol_image_path(prt_uuid, extention)
-    shutil.copy2(path, image_path)
-    return image_path
+    return blobstore.add_file(path, image_path)
 
 
 def copy_dataset(dt_uuid, nb_uuid, path):
@@ -123,8 +232,7 @@ def add_image_experiment(nb_uuid, exp_uuid, path, extention):
     :return str: Path of the inserted image
     """
     image_path = experiment_image_path(nb_uuid=nb_uuid, exp_uuid=exp_uuid, extension=extention)
-    shutil.copy2(path, image_path)
-    return image_path
+    return blobstore.add_file(path, image_path)
 
 
 def dataset_r_file(nb_uuid, dt_uuid):
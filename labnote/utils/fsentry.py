@@ -8,8 +8,8 @@ import os
 import sqlite3
 
 # Projet import
-from labnote.utils import database, directory, files
-from labnote.core import data, sqlite_error
+from labnote.utils import database, directory, files, blobstore, collector, document
+from labnote.core import data, sqlite_error, cache
 
 
 """
@@ -21,6 +21,8 @@ def check_main_directory():
     """ Create the main directory if it does not exist """
     if not os.path.isdir(directory.DEFAULT_MAIN_DIRECTORY_PATH):
         create_main_directory()
+    else:
+        database.upgrade_main_database()
 
 
 def create_main_directory():
@@ -29,12 +31,15 @@ def create_main_directory():
     os.mkdir(directory.NOTEBOOK_DIRECTORY_PATH)
     os.mkdir(directory.REFERENCES_DIRECTORY_PATH)
     os.mkdir(directory.PROTOCOL_DIRECTORY_PATH)
+    os.mkdir(directory.BLOB_DIRECTORY_PATH)
     database.create_main_database()
+    cache.completer_cache.invalidate()
 
 
 def cleanup_main_directory():
     """ Delete the main directory """
     shutil.rmtree(directory.DEFAULT_MAIN_DIRECTORY_PATH, ignore_errors=True)
+    cache.completer_cache.invalidate()
 
 
 """ 
@@ -97,9 +102,14 @@ def delete_notebook(nb_uuid):
         conn = sqlite3.connect(database.MAIN_DATABASE_FILE_PATH)
         conn.execute("PRAGMA foreign_keys = ON")
         cursor = conn.cursor()
+
+        # The datasets of the notebook are deleted with it
+        cursor.execute(database.SELECT_NOTEBOOK_DATASET_UUID, {'nb_uuid': data.uuid_bytes(nb_uuid)})
+        removed_dataset = [data.uuid_string(row[0]) for row in cursor.fetchall()]
         cursor.execute(database.DELETE_NOTEBOOK, {'nb_uuid': data.uuid_bytes(nb_uuid)})
 
         notebook_path = os.path.join(directory.NOTEBOOK_DIRECTORY_PATH + "/{}".format(nb_uuid))
+        blobstore.remove_directory(notebook_path, cursor)
         shutil.rmtree(notebook_path, ignore_errors=True)
     except sqlite3.Error:
         exception = True
@@ -115,43 +125,58 @@ def delete_notebook(nb_uuid):
         if conn:
             conn.close()
 
+    # Remove the files that are not used anymore
+    blobstore.purge()
+
+    cache.completer_cache.publish(cache.DATASET, removed=removed_dataset)
+
 
 """
 Reference entry
 """
 
 
-def add_reference_pdf(ref_uuid, file):
+def add_reference_pdf(ref_uuid, file, progress=None):
     """ Add a reference PDF in the file structure and the database
 
+    The file is copied in the blob store and linked next to the reference file before the connection is opened. The
+    transaction only updates the flag and the links, and puts the file in place.
+
     :param ref_uuid: Reference UUID
     :type ref_uuid: str
     :param file: Orignal file path
     :type file: str
+    :param progress: Function called with the number of bytes copied and the file size
+    :type progress: function
     """
     conn = None
-    exception = False
+    cursor = None
+
+    blob_hash = blobstore.store_file(file, progress)
+    reference_file = files.reference_file_path(ref_uuid=ref_uuid)
+    temporary = "{}.{}.tmp".format(reference_file, uuid.uuid4())
+    blobstore.link_blob(blob_hash, temporary)
 
     try:
         conn = sqlite3.connect(database.MAIN_DATABASE_FILE_PATH)
         cursor = conn.cursor()
+        cursor.execute("BEGIN")
         cursor.execute(database.UPDATE_REFERENCE_FILE, {'file_attached': True, 'ref_uuid': data.uuid_bytes(ref_uuid)})
 
-        reference_file = files.reference_file_path(ref_uuid=ref_uuid)
-        shutil.copy2(file, reference_file)
+        blobstore.release_path(cursor, reference_file)
+        blobstore.insert_link(cursor, blob_hash, reference_file)
+        os.replace(temporary, reference_file)
+
+        cursor.execute("COMMIT")
         return reference_file
-    except sqlite3.Error:
-        exception = True
-        raise
-    except OSError:
+    except (sqlite3.Error, OSError):
+        if os.path.isfile(temporary):
+            os.remove(temporary)
         if conn:
-            conn.rollback()
-        exception = True
+            if cursor:
+                cursor.execute("ROLLBACK ")
         raise
     finally:
-        if not exception:
-            if conn:
-                conn.commit()
         if conn:
             conn.close()
 
@@ -171,7 +196,7 @@ def delete_reference_pdf(ref_uuid):
         cursor.execute(database.UPDATE_REFERENCE_FILE, {'file_attached': False, 'ref_uuid': data.uuid_bytes(ref_uuid)})
 
         reference_file = files.reference_file_path(ref_uuid=ref_uuid)
-        os.remove(reference_file)
+        blobstore.remove_file(reference_file, cursor)
     except sqlite3.Error:
         exception = True
         raise
@@ -186,6 +211,9 @@ def delete_reference_pdf(ref_uuid):
         if conn:
             conn.close()
 
+    # Remove the files that are not used anymore
+    blobstore.purge()
+
 
 def delete_reference(ref_uuid):
     """ Delete a reference from the database and cleanup any PDF file from the file system
@@ -202,12 +230,12 @@ def delete_reference(ref_uuid):
         cursor.execute("BEGIN ")
         cursor.execute(database.SELECT_REFERENCE_TAG, {'ref_uuid': data.uuid_bytes(ref_uuid)})
         tag_ids = cursor.fetchall()
+        removed_tag = []
         cursor.execute(database.DELETE_REF, {'ref_uuid': data.uuid_bytes(ref_uuid)})
 
-        if tag_ids:
+        for tag_id in [row[0] for row in tag_ids]:
             try:
-                for tag_id in tag_ids[0]:
-                    cursor.execute(database.DELETE_TAG_ID, {'tag_id': tag_id})
+                removed_tag.extend(database.delete_tag_id(cursor, tag_id))
             except sqlite3.Error as excpt:
                 if sqlite_error.sqlite_err_handler(str(excpt)) == sqlite_error.FOREIGN_KEY_CODE:
                     pass
@@ -215,6 +243,7 @@ def delete_reference(ref_uuid):
                     raise
 
         reference_file = files.reference_file_path(ref_uuid=ref_uuid)
+        blobstore.remove_file(reference_file, cursor)
     except sqlite3.Error:
         exception = True
         raise
@@ -233,6 +262,12 @@ def delete_reference(ref_uuid):
         if conn:
             conn.close()
 
+    # Remove the files that are not used anymore
+    blobstore.purge()
+
+    cache.completer_cache.publish(cache.REFERENCE, removed=[ref_uuid])
+    cache.completer_cache.publish(cache.TAG, removed=removed_tag)
+
 
 """
 Dataset entry
@@ -278,6 +313,8 @@ def create_dataset(dt_uuid, name, key, nb_uuid):
         if conn:
             conn.close()
 
+    cache.completer_cache.publish(cache.DATASET, updated=[{'uuid': dt_uuid, 'key': key, 'name': name}])
+
 
 def delete_dataset(dt_uuid, nb_uuid):
     """ Delete a dataset from the database and the file structure
@@ -313,6 +350,8 @@ def delete_dataset(dt_uuid, nb_uuid):
         if conn:
             conn.close()
 
+    cache.completer_cache.publish(cache.DATASET, removed=[dt_uuid])
+
 
 """
 Protocol entry
@@ -389,6 +428,9 @@ def create_protocol(prt_uuid, prt_key, category_id, body, tag_list, reference_li
         if file:
             file.close()
 
+    cache.completer_cache.publish(cache.PROTOCOL, updated=[{'uuid': prt_uuid, 'key': prt_key, 'name': name}])
+    cache.completer_cache.publish(cache.TAG, updated=tag_list)
+
 
 def save_protocol(prt_uuid, prt_key, name, description, body, tag_list, reference_list, deleted_image):
     """ Save changes to a protocol in the database and the file system """
@@ -415,9 +457,9 @@ def save_protocol(prt_uuid, prt_key, name, description, body, tag_list, referenc
         cursor.execute(database.SELECT_PROTOCOL_REFERENCE_UUID, uuid_dict)
         current_reference_list = cursor.fetchall()
 
-        database.process_tag(cursor=cursor, insert_list=tag_list, current_list=current_tag_list,
-                             insert=database.INSERT_TAG_PROTOCOL, delete=database.DELETE_TAG_PROTOCOL,
-                             value=uuid_dict)
+        removed_tag = database.process_tag(cursor=cursor, insert_list=tag_list, current_list=current_tag_list,
+                                           insert=database.INSERT_TAG_PROTOCOL, delete=database.DELETE_TAG_PROTOCOL,
+                                           value=uuid_dict)
         database.process_key(cursor=cursor, insert_list=reference_list, current_list=current_reference_list,
                              insert=database.INSERT_REF_PROTOCOL, delete=database.DELETE_REF_PROTOCOL,
                              value=uuid_dict, key='ref_uuid')
@@ -426,10 +468,11 @@ def save_protocol(prt_uuid, prt_key, name, description, body, tag_list, referenc
         file = open(files.protocol_file(prt_uuid), 'wb')
         file.write(data.encode(body))
 
-        # Remove deleted image
+        # Remove the deleted images that are not in the body anymore
         if deleted_image:
-            for path in deleted_image:
-                os.remove(path)
+            for path in collector.unused_images(deleted_image, body, directory.protocol_resource_path(prt_uuid)):
+                if os.path.isfile(path):
+                    blobstore.remove_file(path, cursor)
     except sqlite3.Error:
         exception = True
         raise
@@ -446,6 +489,13 @@ def save_protocol(prt_uuid, prt_key, name, description, body, tag_list, referenc
         if file:
             file.close()
 
+    # Remove the deleted images that are not used anymore
+    if deleted_image:
+        blobstore.purge()
+
+    cache.completer_cache.publish(cache.PROTOCOL, updated=[{'uuid': prt_uuid, 'key': prt_key, 'name': name}])
+    cache.completer_cache.publish(cache.TAG, updated=tag_list, removed=removed_tag)
+
 
 def delete_protocol(prt_uuid):
     """ Delete a protocol from the database and the file structure
@@ -466,13 +516,13 @@ def delete_protocol(prt_uuid):
 
         cursor.execute(database.SELECT_PROTOCOL_TAG, {'prot_uuid': data.uuid_bytes(prt_uuid)})
         tag_ids = cursor.fetchall()
+        removed_tag = []
 
         cursor.execute(database.DELETE_PROTOCOL, {'prt_uuid': data.uuid_bytes(prt_uuid)})
 
-        if tag_ids:
+        for tag_id in [row[0] for row in tag_ids]:
             try:
-                for tag_id in tag_ids[0]:
-                    cursor.execute(database.DELETE_TAG_ID, {'tag_id': tag_id})
+                removed_tag.extend(database.delete_tag_id(cursor, tag_id))
             except sqlite3.Error as excpt:
                 if sqlite_error.sqlite_err_handler(str(excpt)) == sqlite_error.FOREIGN_KEY_CODE:
                     pass
@@ -480,6 +530,7 @@ def delete_protocol(prt_uuid):
                     raise
 
         protocol_path = directory.protocol_path(prt_uuid=prt_uuid)
+        blobstore.remove_directory(protocol_path, cursor)
         shutil.rmtree(protocol_path, ignore_errors=True)
     except sqlite3.Error:
         exception = True
@@ -497,6 +548,12 @@ def delete_protocol(prt_uuid):
         if conn:
             conn.close()
 
+    # Remove the files that are not used anymore
+    blobstore.purge()
+
+    cache.completer_cache.publish(cache.PROTOCOL, removed=[prt_uuid])
+    cache.completer_cache.publish(cache.TAG, removed=removed_tag)
+
 
 def read_protocol(prt_uuid):
     """ Read a protocol content from the database and the file system
@@ -611,6 +668,8 @@ def create_experiment(exp_uuid, nb_uuid, name, exp_key=None, description=None, b
         if file:
             file.close()
 
+    cache.completer_cache.publish(cache.TAG, updated=tag_list)
+
 
 def save_experiment(exp_uuid, nb_uuid, name, exp_key, description, body, tag_list, reference_list, dataset_list,
                     protocol_list, deleted_image):
@@ -643,9 +702,9 @@ def save_experiment(exp_uuid, nb_uuid, name, exp_key, description, body, tag_lis
         cursor.execute(database.SELECT_EXPERIMENT_PROTOCOL_UUID,  uuid_dict)
         current_protocol_list = cursor.fetchall()
 
-        database.process_tag(cursor=cursor, insert_list=tag_list, current_list=current_tag_list,
-                             insert=database.INSERT_TAG_EXPERIMENT, delete=database.DELETE_TAG_EXPERIMENT,
-                             value=uuid_dict)
+        removed_tag = database.process_tag(cursor=cursor, insert_list=tag_list, current_list=current_tag_list,
+                                           insert=database.INSERT_TAG_EXPERIMENT,
+                                           delete=database.DELETE_TAG_EXPERIMENT, value=uuid_dict)
         database.process_key(cursor=cursor, insert_list=reference_list, current_list=current_reference_list,
                              insert=database.INSERT_REF_EXPERIMENT, delete=database.DELETE_REF_EXPERIMENT,
                              value=uuid_dict, key='ref_uuid')
@@ -660,10 +719,12 @@ def save_experiment(exp_uuid, nb_uuid, name, exp_key, description, body, tag_lis
         file = open(files.experiment_file(nb_uuid, exp_uuid), 'wb')
         file.write(data.encode(body))
 
-        # Remove deleted image
+        # Remove the deleted images that are not in the body anymore
         if deleted_image:
-            for path in deleted_image:
-                os.remove(path)
+            for path in collector.unused_images(deleted_image, body,
+                                                directory.experiment_resource_path(nb_uuid, exp_uuid)):
+                if os.path.isfile(path):
+                    blobstore.remove_file(path, cursor)
     except sqlite3.Error:
         if conn:
             if cursor:
@@ -685,6 +746,12 @@ def save_experiment(exp_uuid, nb_uuid, name, exp_key, description, body, tag_lis
         if file:
             file.close()
 
+    # Remove the deleted images that are not used anymore
+    if deleted_image:
+        blobstore.purge()
+
+    cache.completer_cache.publish(cache.TAG, updated=tag_list, removed=removed_tag)
+
 
 def delete_experiment(nb_uuid, exp_uuid):
     """ Delete an experiment from the database and the file structure
@@ -705,13 +772,13 @@ def delete_experiment(nb_uuid, exp_uuid):
 
         cursor.execute(database.SELECT_EXPERIMENT_TAG, {'exp_uuid': data.uuid_bytes(exp_uuid)})
         tag_ids = cursor.fetchall()
+        removed_tag = []
 
         cursor.execute(database.DELETE_EXPERIMENT, {'exp_uuid': data.uuid_bytes(exp_uuid)})
 
-        if tag_ids:
+        for tag_id in [row[0] for row in tag_ids]:
             try:
-                for tag_id in tag_ids[0]:
-                    cursor.execute(database.DELETE_TAG_ID, {'tag_id': tag_id})
+                removed_tag.extend(database.delete_tag_id(cursor, tag_id))
             except sqlite3.Error as excpt:
                 if sqlite_error.sqlite_err_handler(str(excpt)) == sqlite_error.FOREIGN_KEY_CODE:
                     pass
@@ -719,6 +786,7 @@ def delete_experiment(nb_uuid, exp_uuid):
                     raise
 
         experiment_path = directory.experiment_path(nb_uuid=nb_uuid, exp_uuid=exp_uuid)
+        blobstore.remove_directory(experiment_path, cursor)
         shutil.rmtree(experiment_path, ignore_errors=True)
     except sqlite3.Error:
         if conn:
@@ -739,6 +807,176 @@ def delete_experiment(nb_uuid, exp_uuid):
         if conn:
             conn.close()
 
+    # Remove the files that are not used anymore
+    blobstore.purge()
+
+    cache.completer_cache.publish(cache.TAG, removed=removed_tag)
+
+
+def duplicate_experiment(nb_uuid, exp_uuid, new_uuid, name, exp_key=None):
+    """ Duplicate an experiment in the database and the file system
+
+    The files are created before the transaction so that the database is not locked while they are written. The files
+    of the blob store are linked to their blob, the images are then not copied, and the other files are cloned from the
+    original when the file system supports it. The image paths of the body are changed to the paths of the copy. The
+    rows are then copied by the database.
+
+    :param nb_uuid: Notebook uuid
+    :type nb_uuid: str
+    :param exp_uuid: Uuid of the experiment to duplicate
+    :type exp_uuid: str
+    :param new_uuid: Uuid of the copy
+    :type new_uuid: str
+    :param name: Name of the copy
+    :type name: str
+    :param exp_key: Key of the copy
+    :type exp_key: str
+    """
+
+    conn = None
+    cursor = None
+
+    source_path = directory.experiment_path(nb_uuid, exp_uuid)
+    destination_path = directory.experiment_path(nb_uuid, new_uuid)
+    source_file = files.experiment_file(nb_uuid, exp_uuid)
+
+    try:
+        link_dict = dict(database.execute_query(database.SELECT_BLOB_LINK_DIRECTORY,
+                                                directory=blobstore.relative_path(source_path)))
+
+        # Copy the files, the body file is written again with the new image paths
+        os.mkdir(destination_path)
+        for path, directory_list, file_list in os.walk(source_path):
+            copy_path = os.path.join(destination_path, os.path.relpath(path, source_path))
+            for directory_name in directory_list:
+                os.mkdir(os.path.join(copy_path, directory_name))
+
+            for file_name in file_list:
+                source = os.path.join(path, file_name)
+                if source == source_file:
+                    continue
+
+                blob_hash = link_dict.get(blobstore.relative_path(source))
+                if blob_hash and blobstore.is_linked(source, blob_hash):
+                    blobstore.link_blob(blob_hash, os.path.join(copy_path, file_name))
+                else:
+                    files.copy_file(source, os.path.join(copy_path, file_name))
+
+        with open(source_file, 'rb') as file:
+            body = data.decode(file.read())
+        with open(files.experiment_file(nb_uuid, new_uuid), 'wb') as file:
+            file.write(data.encode(document.replace_path(body, source_path, destination_path)))
+
+        conn = sqlite3.connect(database.MAIN_DATABASE_FILE_PATH)
+        conn.execute("PRAGMA foreign_keys = ON")
+        cursor = conn.cursor()
+        cursor.execute("BEGIN")
+
+        uuid_dict = {'exp_uuid': data.uuid_bytes(exp_uuid), 'new_uuid': data.uuid_bytes(new_uuid)}
+        cursor.execute(database.DUPLICATE_EXPERIMENT, dict(uuid_dict, name=name, exp_key=exp_key))
+        cursor.execute(database.DUPLICATE_TAG_EXPERIMENT, uuid_dict)
+        cursor.execute(database.DUPLICATE_REF_EXPERIMENT, uuid_dict)
+        cursor.execute(database.DUPLICATE_DATASET_EXPERIMENT, uuid_dict)
+        cursor.execute(database.DUPLICATE_PROTOCOL_EXPERIMENT, uuid_dict)
+        blobstore.copy_directory(source_path, destination_path, cursor)
+
+        cursor.execute("COMMIT")
+    except (sqlite3.Error, OSError):
+        # The copied files are removed whatever failed, the commit included
+        shutil.rmtree(destination_path, ignore_errors=True)
+        if conn:
+            if cursor:
+                cursor.execute("ROLLBACK ")
+        raise
+    finally:
+        if conn:
+            conn.close()
+
+
+def relocate_experiment_body(nb_uuid, exp_uuid, source, destination):
+    """ Change the directory of the image paths of an experiment body
+
+    The body file is only written when it contains a path of the directory.
+
+    :param nb_uuid: Notebook uuid
+    :type nb_uuid: str
+    :param exp_uuid: Experiment uuid
+    :type exp_uuid: str
+    :param source: Directory path used in the body
+    :type source: str
+    :param destination: New directory path
+    :type destination: str
+    """
+    experiment_file = files.experiment_file(nb_uuid, exp_uuid)
+
+    with open(experiment_file, 'rb') as file:
+        body = data.decode(file.read())
+
+    relocated_body = document.replace_path(body, source, destination)
+    if relocated_body != body:
+        with open(experiment_file, 'wb') as file:
+            file.write(data.encode(relocated_body))
+
+
+def move_experiments(nb_uuid, exp_uuid_list, destination_uuid):
+    """ Move experiments to another notebook
+
+    The experiments and the links of their files are updated in one transaction. The experiment directories are renamed,
+    the files are never copied, and the image paths of the bodies are changed to the new directories. The directories
+    already moved are put back when an error occurs.
+
+    :param nb_uuid: Uuid of the notebook that contains the experiments
+    :type nb_uuid: str
+    :param exp_uuid_list: Uuid of the experiments to move
+    :type exp_uuid_list: list of str
+    :param destination_uuid: Uuid of the destination notebook
+    :type destination_uuid: str
+    """
+    if nb_uuid == destination_uuid or not exp_uuid_list:
+        return
+
+    conn = None
+    cursor = None
+    moved_list = []
+
+    path_list = [(exp_uuid, directory.experiment_path(nb_uuid, exp_uuid),
+                  directory.experiment_path(destination_uuid, exp_uuid)) for exp_uuid in exp_uuid_list]
+
+    try:
+        conn = sqlite3.connect(database.MAIN_DATABASE_FILE_PATH)
+        conn.execute("PRAGMA foreign_keys = ON")
+        cursor = conn.cursor()
+        cursor.execute("BEGIN")
+        cursor.executemany(database.MOVE_EXPERIMENT, [{'exp_uuid': data.uuid_bytes(exp_uuid),
+                                                       'nb_uuid': data.uuid_bytes(destination_uuid)}
+                                                      for exp_uuid in exp_uuid_list])
+        cursor.executemany(database.MOVE_BLOB_LINK_DIRECTORY, [{'directory': blobstore.relative_path(source),
+                                                                'destination': blobstore.relative_path(destination)}
+                                                               for exp_uuid, source, destination in path_list])
+
+        for exp_uuid, source, destination in path_list:
+            os.rename(source, destination)
+            moved_list.append((exp_uuid, source, destination))
+            relocate_experiment_body(destination_uuid, exp_uuid, source, destination)
+
+        cursor.execute("COMMIT")
+    except (sqlite3.Error, OSError):
+        # The directories are put back whatever failed, the commit included
+        for exp_uuid, source, destination in reversed(moved_list):
+            try:
+                os.rename(destination, source)
+                relocate_experiment_body(nb_uuid, exp_uuid, destination, source)
+            except OSError:
+                pass
+
+        if conn:
+            if cursor:
+                cursor.execute("ROLLBACK ")
+        raise
+    finally:
+        if conn:
+            conn.close()
+
 
 def read_experiment(nb_uuid, exp_uuid):
     """ Read a protocol content from the database and the file system
@@ -762,3 +1000,20 @@ def read_experiment(nb_uuid, exp_uuid):
     protocol = {'key': buffer[0], 'name': buffer[1], 'description': buffer[2], 'created': buffer[3],
                 'updated': buffer[4], 'body': body_buffer}
     return protocol
+
+
+def experiment_stamp(nb_uuid, exp_uuid):
+    """ Return a value that changes each time an experiment is saved
+
+    :param nb_uuid: Notebook uuid
+    :type nb_uuid: str
+    :param exp_uuid: Experiment uuid
+    :type exp_uuid: str
+    :return tuple: Update date and body file modification time and size, None when the experiment does not exist
+    """
+    buffer = database.execute_query(database.SELECT_EXPERIMENT_UPDATED, exp_uuid=data.uuid_bytes(exp_uuid))
+    if not buffer:
+        return None
+
+    stat = os.stat(files.experiment_file(nb_uuid=nb_uuid, exp_uuid=exp_uuid))
+    return buffer[0][0], stat.st_mtime_ns, stat.st_size
@@ -0,0 +1,109 @@
+""" This module contains the functions used to create the images derivatives shown in the editors
+
+The original images are kept untouched in the resources directories. The editors show smaller derivatives that are
+cached in the image cache directory by content hash, so the same image inserted twice is only scaled once.
+"""
+
+# Python import
+import os
+import threading
+
+# PyQt import
+from PyQt5.QtGui import QImageReader, QImageIOHandler
+from PyQt5.QtCore import QSize, Qt
+
+# Project import
+from labnote.utils import directory, blobstore
+
+# Largest side of the derivatives in pixels
+DISPLAY_SIZE = 1600
+
+
+def cache_path(digest, size, extension):
+    """ Return the path of an image derivative in the cache
+
+    :param digest: Original image content hash
+    :type digest: str
+    :param size: Largest side of the derivative
+    :type size: int
+    :param extension: Derivative file extension
+    :type extension: str
+    :return str: Derivative path
+    """
+    return os.path.join(directory.IMAGE_CACHE_DIRECTORY_PATH + "/{}/{}-{}.{}".format(digest[:2], digest, size,
+                                                                                         extension))
+
+
+def scaled_image_path(path, size):
+    """ Return the path of an image scaled to fit in a square of the given size
+
+    The derivative is created the first time it is requested. The original path is returned when the image is already
+    small enough or cannot be read.
+
+    :param path: Original image path
+    :type path: str
+    :param size: Largest side of the derivative
+    :type size: int
+    :return str: Derivative path
+    """
+    digest = blobstore.file_hash(path)
+
+    for extension in ('jpg', 'png'):
+        derivative = cache_path(digest, size, extension)
+        if os.path.isfile(derivative):
+            return derivative
+
+    reader = QImageReader(path)
+    reader.setAutoTransform(True)
+    original_size = reader.size()
+
+    if not original_size.isValid() or max(original_size.width(), original_size.height()) <= size:
+        return path
+
+    # The decoder only produce the scaled image, the full resolution image is never loaded in memory
+    reader.setScaledSize(original_size.scaled(QSize(size, size), Qt.KeepAspectRatio))
+    image = reader.read()
+    if image.isNull():
+        return path
+
+    extension = 'png' if image.hasAlphaChannel() else 'jpg'
+    derivative = cache_path(digest, size, extension)
+    os.makedirs(os.path.dirname(derivative), exist_ok=True)
+
+    # Write in a temporary file first so that an incomplete derivative is never used, the images are scaled by several
+    # threads
+    temporary = "{}.{}-{}.tmp".format(derivative, os.getpid(), threading.get_ident())
+    if not image.save(temporary, extension.upper() if extension == 'png' else 'JPEG', 90):
+        return path
+    os.replace(temporary, derivative)
+
+    return derivative
+
+
+def display_image_path(path):
+    """ Return the path of the image derivative shown in the editors
+
+    :param path: Original image path
+    :type path: str
+    :return str: Derivative path
+    """
+    return scaled_image_path(path, DISPLAY_SIZE)
+
+
+def display_image_size(path):
+    """ Return the size of the image derivative shown in the editors, the image is not decoded
+
+    :param path: Original image path
+    :type path: str
+    :return QSize: Derivative size, invalid when the image cannot be read
+    """
+    reader = QImageReader(path)
+    reader.setAutoTransform(True)
+    size = reader.size()
+
+    if size.isValid() and max(size.width(), size.height()) > DISPLAY_SIZE:
+        size = size.scaled(QSize(DISPLAY_SIZE, DISPLAY_SIZE), Qt.KeepAspectRatio)
+    if size.isValid() and reader.transformation() & QImageIOHandler.TransformationRotate90:
+        size.transpose()
+
+    return size
@@ -0,0 +1,660 @@
+""" This module extracts the text of the PDF files
+
+The extractor only uses the standard library. It reads the content streams of the pages and decodes the strings with
+the ToUnicode map or the encoding of their font. Only the FlateDecode filter is supported and the text of scanned
+pages, which is an image, is not extracted.
+"""
+
+# Python import
+import re
+import zlib
+from collections import namedtuple
+
+# Indirect object reference
+Reference = namedtuple('Reference', ['number', 'generation'])
+
+
+class Name(str):
+    """ PDF name object """
+
+
+class Keyword(str):
+    """ PDF keyword, operator or delimiter """
+
+
+TOKEN = re.compile(rb"""
+    (?P<space>(?:[\x00\t\n\f\r ]+|%[^\r\n]*)+)
+    |(?P<name>/[^\x00\t\n\f\r ()<>\[\]{}/%]*)
+    |(?P<number>[+-]?(?:\d+\.?\d*|\.\d+)(?![^\x00\t\n\f\r ()<>\[\]{}/%]))
+    |(?P<delimiter><<|>>|\[|\]|\{|\})
+    |(?P<hex><[0-9A-Fa-f\x00\t\n\f\r ]*>)
+    |(?P<string>\()
+    |(?P<keyword>[^\x00\t\n\f\r ()<>\[\]{}/%]+)
+""", re.VERBOSE)
+
+STRING_TEXT = re.compile(rb"[^()\\]+")
+NAME_ESCAPE = re.compile(rb"#([0-9A-Fa-f]{2})")
+OBJECT = re.compile(rb"(\d+)\s+(\d+)\s+obj\b")
+
+ESCAPE = {ord('n'): b'\n', ord('r'): b'\r', ord('t'): b'\t', ord('b'): b'\b', ord('f'): b'\f'}
+
+# Encoding of the fonts without ToUnicode map
+ENCODING = {'WinAnsiEncoding': 'cp1252', 'MacRomanEncoding': 'mac_roman'}
+
+# Offset of a TJ array item, in thousandths of a text space unit, that is considered as a space
+TJ_SPACE = -200
+
+
+class Lexer:
+    """ Read the tokens of a PDF file or content stream """
+
+    def __init__(self, data, position=0):
+        self.data = data
+        self.position = position
+
+    def token(self):
+        """ Return the next token
+
+        :return: Token or None at the end of the data
+        """
+        length = len(self.data)
+
+        while self.position < length:
+            match = TOKEN.match(self.data, self.position)
+            if not match:
+                self.position = self.position + 1
+                continue
+
+            self.position = match.end()
+            kind = match.lastgroup
+            value = match.group()
+
+            if kind == 'space':
+                continue
+            elif kind == 'name':
+                return Name(NAME_ESCAPE.sub(lambda escape: bytes.fromhex(escape.group(1).decode()),
+                                            value[1:]).decode('latin-1'))
+            elif kind == 'number':
+                return float(value) if b'.' in value else int(value)
+            elif kind == 'hex':
+                digits = re.sub(rb"[^0-9A-Fa-f]", b'', value)
+                if len(digits) % 2:
+                    digits = digits + b'0'
+                return bytes.fromhex(digits.decode())
+            elif kind == 'string':
+                return self.literal_string()
+            else:
+                return Keyword(value.decode('latin-1'))
+
+        return None
+
+    def literal_string(self):
+        """ Read a literal string, the opening parenthesis is already read
+
+        :return bytes: String content
+        """
+        data = self.data
+        length = len(data)
+        depth = 1
+        string = bytearray()
+
+        while self.position < length:
+            match = STRING_TEXT.match(data, self.position)
+            if match:
+                string.extend(match.group())
+                self.position = match.end()
+                continue
+
+            character = data[self.position]
+            self.position = self.position + 1
+
+            if character == 0x5c:
+                if self.position >= length:
+                    break
+                character = data[self.position]
+                self.position = self.position + 1
+
+                if character in ESCAPE:
+                    string.extend(ESCAPE[character])
+                elif 0x30 <= character <= 0x37:
+                    octal = data[self.position - 1:self.position + 2]
+                    digits = re.match(rb"[0-7]{1,3}", octal).group()
+                    string.append(int(digits, 8) & 0xff)
+                    self.position = self.position - 1 + len(digits)
+                elif character == 0x0d:
+                    # Line continuation
+                    if data[self.position:self.position + 1] == b'\n':
+                        self.position = self.position + 1
+                elif character != 0x0a:
+                    string.append(character)
+            elif character == 0x28:
+                depth = depth + 1
+                string.append(character)
+            elif character == 0x29:
+                depth = depth - 1
+                if depth == 0:
+                    break
+                string.append(character)
+
+        return bytes(string)
+
+    def value(self, token=None):
+        """ Read an object
+
+        :param token: First token of the object, the next token is read when it is None
+        :return: Object or None at the end of the data
+        """
+        if token is None:
+            token = self.token()
+
+        if token == '[' and isinstance(token, Keyword):
+            return reference_list(self.items(']'))
+        elif token == '<<' and isinstance(token, Keyword):
+            items = reference_list(self.items('>>'))
+            return dict(zip(items[0::2], items[1::2]))
+        elif isinstance(token, Keyword):
+            if token == 'true':
+                return True
+            elif token == 'false':
+                return False
+            elif token == 'null':
+                return None
+        return token
+
+    def items(self, end):
+        """ Read the items of an array or a dictionary
+
+        :param end: Closing delimiter
+        :type end: str
+        :return: list of objects
+        """
+        items = []
+
+        while True:
+            token = self.token()
+            if token is None or (isinstance(token, Keyword) and token == end):
+                return items
+            items.append(self.value(token))
+
+
+def reference_list(items):
+    """ Replace the number, generation and R sequences of a list by references
+
+    :param items: Objects
+    :type items: list
+    :return: list
+    """
+    if 'R' not in items:
+        return items
+
+    result = []
+    for item in items:
+        if isinstance(item, Keyword) and item == 'R' and len(result) >= 2 and \
+                isinstance(result[-1], int) and isinstance(result[-2], int):
+            generation = result.pop()
+            result.append(Reference(result.pop(), generation))
+        else:
+            result.append(item)
+
+    return result
+
+
+class Document:
+    """ Objects of a PDF file """
+
+    def __init__(self, data):
+        self.data = data
+        self.objects = {}
+        self.streams = {}
+        self.read_objects()
+
+    def read_objects(self):
+        """ Read the objects of the file, the last definition of an object is kept """
+        compressed = []
+
+        for match in OBJECT.finditer(self.data):
+            lexer = Lexer(self.data, match.end())
+            value = lexer.value()
+            number = int(match.group(1))
+
+            position = lexer.position
+            token = lexer.token()
+            if isinstance(token, Keyword) and token == 'stream':
+                self.streams[number] = self.raw_stream(value, lexer.position)
+            else:
+                lexer.position = position
+                self.streams.pop(number, None)
+
+            self.objects[number] = value
+            if isinstance(value, dict) and value.get('Type') == 'ObjStm':
+                compressed.append(number)
+
+        # Objects stored in object streams
+        for number in compressed:
+            self.read_object_stream(number)
+
+    def raw_stream(self, dictionary, position):
+        """ Return the raw data of a stream
+
+        :param dictionary: Stream dictionary
+        :type dictionary: dict
+        :param position: Position after the stream keyword
+        :type position: int
+        :return bytes: Stream data
+        """
+        if self.data[position:position + 2] == b'\r\n':
+            position = position + 2
+        elif self.data[position:position + 1] in (b'\r', b'\n'):
+            position = position + 1
+
+        length = dictionary.get('Length') if isinstance(dictionary, dict) else None
+        if isinstance(length, int) and self.data[position + length:position + length + 20].lstrip().startswith(
+                b'endstream'):
+            return self.data[position:position + length]
+
+        end = self.data.find(b'endstream', position)
+        if end < 0:
+            end = len(self.data)
+        return self.data[position:end].rstrip(b'\r\n')
+
+    def read_object_stream(self, number):
+        """ Read the objects of an object stream
+
+        :param number: Object stream number
+        :type number: int
+        """
+        dictionary = self.objects[number]
+        data = self.stream(number)
+        first = self.resolve(dictionary.get('First'))
+        count = self.resolve(dictionary.get('N'))
+        if not data or not isinstance(first, int) or not isinstance(count, int):
+            return
+
+        lexer = Lexer(data)
+        header = [lexer.token() for position in range(count * 2)]
+
+        for position in range(0, len(header) - 1, 2):
+            object_number, offset = header[position], header[position + 1]
+            if isinstance(object_number, int) and isinstance(offset, int) and object_number not in self.objects:
+                self.objects[object_number] = Lexer(data, first + offset).value()
+
+    def resolve(self, value):
+        """ Return the object of a reference
+
+        :param value: Object or reference
+        :return: Object
+        """
+        depth = 0
+        while isinstance(value, Reference) and depth < 32:
+            value = self.objects.get(value.number)
+            depth = depth + 1
+        return value
+
+    def stream(self, number):
+        """ Return the decoded data of a stream
+
+        :param number: Stream object number
+        :type number: int
+        :return bytes: Decoded data or None when the filter is not supported
+        """
+        data = self.streams.get(number)
+        dictionary = self.objects.get(number)
+        if data is None or not isinstance(dictionary, dict):
+            return None
+
+        filters = self.resolve(dictionary.get('Filter'))
+        if filters is None:
+            filters = []
+        elif not isinstance(filters, list):
+            filters = [filters]
+
+        for name in filters:
+            if name in ('FlateDecode', 'Fl'):
+                decompressor = zlib.decompressobj()
+                try:
+                    data = decompressor.decompress(data)
+                except zlib.error:
+                    return None
+            else:
+                return None
+
+        return data
+
+    def stream_data(self, value):
+        """ Return the decoded data of a stream or of an array of streams
+
+        :param value: Stream reference or array of references
+        :return bytes: Decoded data
+        """
+        if isinstance(value, Reference) and isinstance(self.resolve(value), list):
+            value = self.resolve(value)
+        references = value if isinstance(value, list) else [value]
+
+        content = []
+        for reference in references:
+            if isinstance(reference, Reference):
+                data = self.stream(reference.number)
+                if data:
+                    content.append(data)
+
+        return b'\n'.join(content)
+
+    def pages(self):
+        """ Return the pages dictionaries in the object order
+
+        :return: list of dict
+        """
+        return [self.objects[number] for number in sorted(self.objects)
+                if isinstance(self.objects[number], dict) and self.objects[number].get('Type') == 'Page']
+
+    def inherited(self, page, key):
+        """ Return a page attribute, which can be inherited from the page tree
+
+        :param page: Page dictionary
+        :type page: dict
+        :param key: Attribute name
+        :type key: str
+        :return: Attribute value
+        """
+        depth = 0
+        while isinstance(page, dict) and depth < 64:
+            if key in page:
+                return self.resolve(page[key])
+            page = self.resolve(page.get('Parent'))
+            depth = depth + 1
+        return None
+
+    def fonts(self, page):
+        """ Return the fonts of a page
+
+        :param page: Page dictionary
+        :type page: dict
+        :return: dict of Font by resource name
+        """
+        resources = self.inherited(page, 'Resources')
+        fonts = self.resolve(resources.get('Font')) if isinstance(resources, dict) else None
+        if not isinstance(fonts, dict):
+            return {}
+
+        return {name: self.font(self.resolve(value)) for name, value in fonts.items()}
+
+    def font(self, dictionary):
+        """ Return the decoder of a font
+
+        :param dictionary: Font dictionary
+        :type dictionary: dict
+        :return Font: Font decoder
+        """
+        if not isinstance(dictionary, dict):
+            return Font()
+
+        font = Font(widths=self.glyph_widths(dictionary))
+
+        to_unicode = dictionary.get('ToUnicode')
+        data = self.stream(to_unicode.number) if isinstance(to_unicode, Reference) else None
+        if data:
+            font.cmap, font.code_size = read_cmap(data)
+        elif dictionary.get('Subtype') == 'Type0':
+            font.code_size = 2
+        else:
+            encoding = self.resolve(dictionary.get('Encoding'))
+            if isinstance(encoding, dict):
+                encoding = self.resolve(encoding.get('BaseEncoding'))
+            font.encoding = ENCODING.get(encoding, 'latin-1')
+
+        return font
+
+    def glyph_widths(self, dictionary):
+        """ Return the glyph widths of a font
+
+        :param dictionary: Font dictionary
+        :type dictionary: dict
+        :return: dict of width in thousandths of a text space unit by character code, the None key is the default width
+        """
+        widths = {}
+
+        if dictionary.get('Subtype') == 'Type0':
+            descendant = self.resolve(dictionary.get('DescendantFonts'))
+            descendant = self.resolve(descendant[0]) if isinstance(descendant, list) and descendant else None
+            if not isinstance(descendant, dict):
+                return {None: 1000}
+
+            widths[None] = self.resolve(descendant.get('DW', 1000))
+            items = self.resolve(descendant.get('W')) or []
+            position = 0
+            while position + 1 < len(items):
+                first = self.resolve(items[position])
+                value = self.resolve(items[position + 1])
+                if isinstance(value, list):
+                    for offset, width in enumerate(value):
+                        widths[first + offset] = self.resolve(width)
+                    position = position + 2
+                elif position + 2 < len(items):
+                    width = self.resolve(items[position + 2])
+                    for code in range(first, min(value, first + 65535) + 1):
+                        widths[code] = width
+                    position = position + 3
+                else:
+                    break
+        else:
+            first = self.resolve(dictionary.get('FirstChar', 0))
+            for offset, width in enumerate(self.resolve(dictionary.get('Widths')) or []):
+                widths[first + offset] = self.resolve(width)
+            widths[None] = 500 if len(widths) == 0 else 0
+
+        return widths
+
+
+class Font:
+    """ Decode the strings shown with a font """
+
+    def __init__(self, cmap=None, code_size=1, encoding='latin-1', widths=None):
+        self.cmap = cmap
+        self.code_size = code_size
+        self.encoding = encoding
+        self.widths = widths or {None: 500}
+
+    def codes(self, string):
+        """ Split a string in character codes
+
+        :param string: String bytes
+        :type string: bytes
+        :return: list of bytes
+        """
+        size = self.code_size
+        return [string[position:position + size] for position in range(0, len(string), size)]
+
+    def decode(self, string):
+        """ Decode a string
+
+        :param string: String bytes
+        :type string: bytes
+        :return str: Text
+        """
+        if self.cmap is None:
+            if self.code_size == 1:
+                return string.decode(self.encoding, errors='ignore')
+            return ''
+
+        cmap = self.cmap
+        return "".join([cmap.get(code, '') for code in self.codes(string)])
+
+    def advance(self, string):
+        """ Return the width of a string
+
+        :param string: String bytes
+        :type string: bytes
+        :return float: Width in thousandths of a text space unit for a font size of 1
+        """
+        widths = self.widths
+        default = widths.get(None, 0)
+        return sum([widths.get(int.from_bytes(code, 'big'), default) for code in self.codes(string)])
+
+
+def unicode_text(string):
+    """ Decode the UTF-16BE destination of a CMap
+
+    :param string: Destination bytes
+    :type string: bytes
+    :return str: Text
+    """
+    return string.decode('utf-16-be', errors='ignore')
+
+
+def read_cmap(data):
+    """ Read a ToUnicode CMap
+
+    :param data: CMap stream data
+    :type data: bytes
+    :return: dict of text by character code and code width in bytes
+    """
+    lexer = Lexer(data)
+    cmap = {}
+    width = 1
+
+    while True:
+        token = lexer.token()
+        if token is None:
+            break
+
+        if not isinstance(token, Keyword):
+            continue
+
+        if token == 'begincodespacerange':
+            for code in iter(lexer.token, Keyword('endcodespacerange')):
+                if isinstance(code, bytes):
+                    width = max(width, len(code))
+                elif code is None:
+                    break
+        elif token == 'beginbfchar':
+            items = lexer.items('endbfchar')
+            for source, destination in zip(items[0::2], items[1::2]):
+                if isinstance(source, bytes) and isinstance(destination, bytes):
+                    cmap[source] = unicode_text(destination)
+                    width = max(width, len(source))
+        elif token == 'beginbfrange':
+            items = lexer.items('endbfrange')
+            for low, high, destination in zip(items[0::3], items[1::3], items[2::3]):
+                if not isinstance(low, bytes) or not isinstance(high, bytes):
+                    continue
+
+                size = len(low)
+                start = int.from_bytes(low, 'big')
+                count = min(int.from_bytes(high, 'big') - start + 1, 65536)
+                width = max(width, size)
+
+                for offset in range(max(count, 0)):
+                    code = (start + offset).to_bytes(size, 'big')
+                    if isinstance(destination, list):
+                        if offset < len(destination) and isinstance(destination[offset], bytes):
+                            cmap[code] = unicode_text(destination[offset])
+                    elif isinstance(destination, bytes) and destination:
+                        value = int.from_bytes(destination, 'big') + offset
+                        cmap[code] = unicode_text(value.to_bytes(len(destination), 'big'))
+
+    return cmap, width
+
+
+def content_text(data, fonts):
+    """ Return the text shown by a content stream
+
+    The position of the text is followed to separate the words and the lines since many generators position each
+    glyph instead of showing the spaces.
+
+    :param data: Content stream data
+    :type data: bytes
+    :param fonts: Fonts of the page by resource name
+    :type fonts: dict
+    :return str: Text
+    """
+    lexer = Lexer(data)
+    text = []
+    operands = []
+    font = Font()
+    size = 1
+    line_x = 0
+    line_y = 0
+    advance = 0
+
+    def move(x, y):
+        """ Separate the text shown before and after a move of the line start """
+        nonlocal line_x, line_y, advance
+        if abs(y - line_y) > size * 0.5:
+            text.append('\n')
+        elif abs(x - (line_x + advance)) > size * 0.15:
+            text.append(' ')
+        line_x = x
+        line_y = y
+        advance = 0
+
+    while True:
+        token = lexer.token()
+        if token is None:
+            break
+
+        if not isinstance(token, Keyword) or token in ('[', '<<'):
+            operands.append(lexer.value(token))
+            continue
+
+        if token == 'Tf' and len(operands) >= 2:
+            font = fonts.get(operands[-2], Font())
+            size = abs(operands[-1]) if isinstance(operands[-1], (int, float)) and operands[-1] else 1
+        elif token in ('Tj', "'", '"') and operands and isinstance(operands[-1], bytes):
+            if token != 'Tj':
+                move(line_x, line_y + size)
+            text.append(font.decode(operands[-1]))
+            advance = advance + font.advance(operands[-1]) * size / 1000
+        elif token == 'TJ' and operands and isinstance(operands[-1], list):
+            for item in operands[-1]:
+                if isinstance(item, bytes):
+                    text.append(font.decode(item))
+                    advance = advance + font.advance(item) * size / 1000
+                elif isinstance(item, (int, float)):
+                    if item < TJ_SPACE:
+                        text.append(' ')
+                    advance = advance - item * size / 1000
+        elif token == 'T*':
+            move(line_x, line_y + size * 2)
+        elif token in ('Td', 'TD') and len(operands) >= 2 and \
+                isinstance(operands[-1], (int, float)) and isinstance(operands[-2], (int, float)):
+            move(line_x + operands[-2], line_y + operands[-1])
+        elif token == 'Tm' and len(operands) >= 6 and \
+                all([isinstance(operand, (int, float)) for operand in operands[-6:]]):
+            scale_x = operands[-6] or 1
+            scale_y = operands[-3] or 1
+            move(operands[-2] / scale_x, operands[-1] / scale_y)
+        elif token == 'BT':
+            line_x = 0
+            line_y = 0
+            advance = 0
+            text.append(' ')
+        elif token == 'ID':
+            # Skip the inline image data
+            end = re.compile(rb"\sEI(?=[\x00\t\n\f\r ]|$)").search(data, lexer.position)
+            lexer.position = end.end() if end else len(data)
+
+        operands = []
+
+    return "".join(text)
+
+
+def extract_text(path):
+    """ Return the text of a PDF file
+
+    This function does not use Qt and can be run in another process.
+
+    :param path: PDF file path
+    :type path: str
+    :return str: Text of the pages
+    """
+    with open(path, 'rb') as file:
+        document = Document(file.read())
+
+    page_list = []
+    for page in document.pages():
+        content = document.stream_data(page.get('Contents'))
+        if content:
+            page_list.append(content_text(content, document.fonts(page)))
+
+    # Collapse the spaces added between the text objects
+    return re.sub(r"[ \t]*\n[ \t\n]*", "\n", re.sub(r"[ \t]+", " ", "\n\n".join(page_list))).strip()
@@ -5,6 +5,9 @@ from datetime import datetime
 from PyQt5.QtGui import QTextDocument, QTextCursor, QTextTableFormat, QTextLength, QTextCharFormat, QBrush
 from PyQt5.QtCore import Qt
 
+# Project import
+from labnote.utils.document import fragments as document_fragments, to_html as document_html
+
 
 def prepare_html_pdf(title, key, date, update, body):
     """ Generate the HTML document
@@ -17,12 +20,13 @@ def prepare_html_pdf(title, key, date, update, body):
     :type date: str
     :param update: Date updated
     :type update: str
-    :param body: Text document body
+    :param body: Text document body, serialized or in HTML
     :type body: str
     """
 
-    # Open the document
+    # Open the document, the undo history is not needed for an exported document
     document = QTextDocument()
+    document.setUndoRedoEnabled(False)
     cursor = QTextCursor(document)
     cursor.setPosition(0)
 
@@ -51,7 +55,7 @@ def prepare_html_pdf(title, key, date, update, body):
 
     cursor.insertHtml("<br>")
 
-    cursor.insertHtml(body)
+    cursor.insertHtml(document_html(body))
 
     # Change the font family
     fmt = QTextCharFormat()
@@ -61,25 +65,30 @@ def prepare_html_pdf(title, key, date, update, body):
     cursor.movePosition(cursor.End, QTextCursor.KeepAnchor)
     cursor.mergeCharFormat(fmt)
 
-    # Make the font smaller everywhere and remove the anchors
-    position = html_start
-    cursor.setPosition(position)
-    while not cursor.atEnd():
-        cursor.setPosition(position)
-        cursor.movePosition(QTextCursor.NextCharacter, QTextCursor.KeepAnchor)
+    # Make the font smaller everywhere and remove the anchors. The format is the same for all the characters of a
+    # fragment so the fragments are collected first and changed afterward since changing the format merge and split them.
+    runs = []
+    for fragment in document_fragments(document):
+        start = max(fragment.position(), html_start)
+        end = fragment.position() + fragment.length()
+        if end > start:
+            runs.append((start, end, fragment.charFormat()))
+
+    for start, end, char_fmt in runs:
+        font_size = char_fmt.fontPointSize()
 
-        char_fmt = cursor.charFormat()
-        if cursor.charFormat().isAnchor():
+        if char_fmt.isAnchor():
             char_fmt.setAnchor(False)
             char_fmt.setFontUnderline(False)
             char_fmt.setForeground(Qt.black)
 
-        if cursor.charFormat().fontPointSize() > 0:
-            char_fmt.setFontPointSize(cursor.charFormat().fontPointSize() - 3)
-        if cursor.charFormat().fontPointSize() == 10:
+        if font_size > 0:
+            char_fmt.setFontPointSize(font_size - 3)
+        if font_size == 10:
             char_fmt.setFontPointSize(8)
-        cursor.mergeCharFormat(char_fmt)
 
-        position = position + 1
+        cursor.setPosition(start)
+        cursor.setPosition(end, QTextCursor.KeepAnchor)
+        cursor.mergeCharFormat(char_fmt)
 
     return cursor.document().toHtml()
@@ -0,0 +1,83 @@
+""" This module indexes the text of the reference PDF files for the library search """
+
+# Python import
+import os
+import sqlite3
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+# Project import
+from labnote.utils import database, files, blobstore, pdftext
+
+
+def pending_references():
+    """ Return the references whose PDF is not indexed or changed since it was indexed
+
+    :return: list of (ref_uuid, path, blob_hash)
+    """
+    pending = []
+
+    for ref_uuid, indexed_hash in database.select_reference_text_state():
+        path = files.reference_file_path(ref_uuid)
+        if not os.path.isfile(path):
+            continue
+
+        blob_hash = blobstore.link_hash(path) or blobstore.file_hash(path)
+        if blob_hash != indexed_hash:
+            pending.append((ref_uuid, path, blob_hash))
+
+    return pending
+
+
+def index_references(progress=None, canceled=None, max_workers=None):
+    """ Extract and index the text of the pending references
+
+    The text is extracted in a process pool since the extractor is pure Python and each result is written in its own
+    short transaction. The processes are spawned instead of forked since this function is called from a thread.
+
+    :param progress: Function called with the number of references indexed and the number of pending references
+    :type progress: function
+    :param canceled: Function that returns True when the indexing must stop
+    :type canceled: function
+    :param max_workers: Number of processes, the number of processors when it is None
+    :type max_workers: int
+    :return int: Number of references indexed
+    """
+    pending = pending_references()
+    if not pending:
+        return 0
+
+    done = 0
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+        future_list = {executor.submit(pdftext.extract_text, path): (ref_uuid, blob_hash)
+                       for ref_uuid, path, blob_hash in pending}
+
+        for future in as_completed(future_list):
+            ref_uuid, blob_hash = future_list[future]
+
+            # A file that cannot be read is indexed without text so that it is not read again until it changes
+            try:
+                text = future.result()
+            except BrokenProcessPool:
+                # A process was killed, the remaining references stay pending and are indexed the next time
+                break
+            except Exception:
+                text = ""
+
+            try:
+                database.update_reference_text(ref_uuid, blob_hash, text)
+            except sqlite3.IntegrityError:
+                # The reference was deleted during the extraction
+                pass
+
+            done = done + 1
+            if progress:
+                progress(done, len(pending))
+
+            if canceled and canceled():
+                for remaining in future_list:
+                    remaining.cancel()
+                break
+
+    return done
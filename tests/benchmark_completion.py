@@ -0,0 +1,106 @@
+""" This module benchmark the completion index used by the CompleterTextEdit
+
+Run with : python tests/benchmark_completion.py
+"""
+
+# Python import
+import sys
+import random
+import string
+import timeit
+
+# PyQt import
+from PyQt5.QtWidgets import QApplication, QCompleter
+from PyQt5.QtCore import Qt, QStringListModel
+
+# Project import
+from labnote.core import completion
+from labnote.interface.widget.model import CompletionModel
+
+
+def reference_keys(number):
+    """ Create reference keys made of a last name and a year
+
+    :param number: Number of keys
+    :type number: int
+    :return: list of str
+    """
+    random.seed(0)
+    key_list = set([])
+    while len(key_list) < number:
+        name = "".join(random.choice(string.ascii_lowercase) for i in range(random.randint(3, 10)))
+        key_list.add("{}{}{}".format(name.capitalize(), random.randint(1950, 2020), random.choice(['', 'a', 'b'])))
+    return list(key_list)
+
+
+def typed_prefixes(key_list, number):
+    """ Return the successive texts typed to complete some keys, with a typo in half of them
+
+    :param key_list: Completer keys
+    :type key_list: list
+    :param number: Number of keys completed
+    :type number: int
+    :return: list of str
+    """
+    prefix_list = []
+    for key in random.sample(key_list, number):
+        if len(prefix_list) % 2:
+            key = key[:1] + key[2] + key[1] + key[3:]
+        prefix_list.extend([key[:i] for i in range(1, len(key) + 1)])
+    return prefix_list
+
+
+def main():
+    app = QApplication(sys.argv)
+
+    key_list = reference_keys(50000)
+    prefix_list = typed_prefixes(key_list, 100)
+    print("Keys : {}, typed texts : {}".format(len(key_list), len(prefix_list)))
+
+    print("Index build : {:.3f} s".format(timeit.timeit(lambda: completion.CompletionIndex(key_list), number=1)))
+    index = completion.CompletionIndex(key_list)
+    print("Trigram build : {:.3f} s".format(timeit.timeit(index.build_trigrams, number=1)))
+
+    elapsed = sorted([timeit.timeit(lambda: index.search(prefix), number=1) for prefix in prefix_list])
+    print("Index search : {:.3f} ms per key, {:.3f} ms at the 99th percentile".format(
+        sum(elapsed) * 1000 / len(elapsed), elapsed[int(len(elapsed) * 0.99)] * 1000))
+
+    model = CompletionModel(index)
+    completer = QCompleter()
+    completer.setModel(model)
+    completer.setCompletionMode(QCompleter.UnfilteredPopupCompletion)
+
+    def model_search():
+        for prefix in prefix_list:
+            model.set_prefix(prefix)
+            completer.setCompletionPrefix(prefix)
+            completer.completionCount()
+    elapsed = min(timeit.repeat(model_search, number=1, repeat=3))
+    print("Completion model : {:.3f} ms per key".format(elapsed * 1000 / len(prefix_list)))
+
+    # Filtering of the whole list by the completer, used before the completion index
+    string_completer = QCompleter()
+    string_completer.setModel(QStringListModel(sorted(key_list)))
+    string_completer.setModelSorting(QCompleter.CaseSensitivelySortedModel)
+    string_completer.setCaseSensitivity(Qt.CaseInsensitive)
+
+    def string_search():
+        for prefix in prefix_list:
+            string_completer.setCompletionPrefix(prefix)
+            string_completer.completionCount()
+    elapsed = timeit.timeit(string_search, number=1)
+    print("String list model : {:.3f} ms per key".format(elapsed * 1000 / len(prefix_list)))
+
+    # The popup is sized on all the rows of the completion model when it is shown
+    for name, popup_completer in (("Completion model", completer), ("String list model", string_completer)):
+        model.set_prefix(prefix_list[0])
+        popup_completer.setCompletionPrefix(prefix_list[0])
+        popup = popup_completer.popup()
+        elapsed = min(timeit.repeat(lambda: popup.sizeHintForColumn(0), number=1, repeat=3))
+        print("{} popup : {} rows, {:.3f} ms".format(name, popup_completer.completionCount(), elapsed * 1000))
+
+    del app
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+""" This module benchmark the PDF export of a long protocol
+
+Run with : python tests/benchmark_pdftools.py
+"""
+
+# Python import
+import os
+import sys
+import tempfile
+import time
+
+# PyQt import
+from PyQt5.QtWidgets import QApplication
+from PyQt5.QtGui import QTextDocument
+from PyQt5.QtPrintSupport import QPrinter
+
+# Project import
+from labnote.utils import pdftools
+
+
+def protocol_html(pages):
+    """ Create a protocol body of about the given number of pages
+
+    :param pages: Number of pages
+    :type pages: int
+    :return: HTML str
+    """
+    step = ("<p style=\"font-size:13pt\"><b>Step {0}</b></p>"
+            "<p>Add 10 ml of the <a href=\"dataset/dataset{0}\">buffer</a> to the sample and mix by inversion as "
+            "described in <a href=\"reference/ref{0}\">ref{0}</a>. Incubate <span style=\"font-size:10pt\">30 min"
+            "</span> at 37 C. <a href=\"tag/incubation\">incubation</a></p>"
+            "<ul><li>Centrifuge at 5000 g</li><li>Discard the supernatant</li></ul>")
+
+    # About 6 steps fit on a page
+    return "<html><body>{}</body></html>".format("".join([step.format(number) for number in range(pages * 6)]))
+
+
+def main():
+    app = QApplication(sys.argv)
+    body = protocol_html(200)
+
+    start = time.perf_counter()
+    html = pdftools.prepare_html_pdf(title="Protocol", key="protocol", date="2018-01-01", update=None, body=body)
+    prepare_time = time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as directory:
+        printer = QPrinter(QPrinter.HighResolution)
+        printer.setOutputFormat(QPrinter.PdfFormat)
+        printer.setOutputFileName(os.path.join(directory, "protocol.pdf"))
+
+        start = time.perf_counter()
+        document = QTextDocument()
+        document.setHtml(html)
+        document.print(printer)
+        print_time = time.perf_counter() - start
+
+        document.setPageSize(printer.pageRect(QPrinter.Point).size())
+        print("Pages : {}".format(document.pageCount()))
+
+    print("Prepare HTML : {:.3f} s".format(prepare_time))
+    print("Print PDF : {:.3f} s".format(print_time))
+
+    del app
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,169 @@
+""" This module benchmark the anchor extraction and the typing latency of the CompleterTextEdit and the update of the
+text editor buttons when the cursor moves
+
+Run with : python tests/benchmark_textedit.py
+"""
+
+# Python import
+import sys
+import timeit
+
+# PyQt import
+from PyQt5.QtWidgets import QApplication, QTextEdit
+from PyQt5.QtGui import QTextCursor
+from PyQt5.QtCore import Qt
+from PyQt5.QtTest import QTest
+
+# Project import
+from labnote.interface.widget.textedit import CompleterTextEdit
+from labnote.interface.widget.widget import ExperimentTextEditor
+
+
+def experiment_html(size):
+    """ Create an experiment body of about size bytes with anchors in every paragraph
+
+    :param size: Size of the body in bytes
+    :type size: int
+    :return: HTML str
+    """
+    paragraph = ("<p>Lorem ipsum dolor sit amet, consectetur adipiscing elit <a href=\"tag/tag{0}\">tag{0}</a> sed do "
+                 "eiusmod tempor <a href=\"reference/ref{1}\">ref{1}</a> incididunt ut labore et dolore magna aliqua "
+                 "<a href=\"dataset/dataset{1}\">dataset{1}</a> ut enim ad minim veniam <a href=\"protocol/protocol{1}\">"
+                 "protocol{1}</a></p>")
+
+    body = []
+    length = 0
+    number = 0
+    while length < size:
+        text = paragraph.format(number % 50, number % 200)
+        body.append(text)
+        length = length + len(text)
+        number = number + 1
+
+    return "<html><body>{}</body></html>".format("".join(body))
+
+
+def character_anchors(textedit):
+    """ Read the anchors one character at a time, used as the reference implementation
+
+    :param textedit: Text edit
+    :type textedit: CompleterTextEdit
+    :return: set of href
+    """
+    cursor = textedit.textCursor()
+    cursor.setPosition(0)
+
+    href_list = set([])
+    while cursor.movePosition(QTextCursor.NextCharacter):
+        if cursor.charFormat().isAnchor():
+            href_list.add(cursor.charFormat().anchorHref())
+
+    return href_list
+
+
+def typing_latency(textedit, text, shortcut=None):
+    """ Type a text in the middle of the document and return the time spent per key
+
+    :param textedit: Text edit
+    :type textedit: QTextEdit
+    :param text: Typed text, each word is completed when a shortcut is given
+    :type text: str
+    :param shortcut: Key pressed with control before each word
+    :type shortcut: int
+    :return float: Time per key in milliseconds
+    """
+    cursor = textedit.textCursor()
+    cursor.setPosition(textedit.document().characterCount() // 2)
+    textedit.setTextCursor(cursor)
+
+    def type_text():
+        for word in text.split():
+            if shortcut:
+                QTest.keyClick(textedit, shortcut, Qt.ControlModifier)
+            QTest.keyClicks(textedit, word + " ")
+
+    return timeit.timeit(type_text, number=1) * 1000 / len(text)
+
+
+def cursor_sweep(editor, number, modifier=Qt.NoModifier):
+    """ Move the cursor one character at a time through the body of an editor and return the time spent per move
+
+    The moves are sent in a burst, as when an arrow key is held or the mouse selects text.
+
+    :param editor: Text editor
+    :type editor: TextEditor
+    :param number: Number of moves
+    :type number: int
+    :param modifier: Keyboard modifier of the moves, shift to select
+    :type modifier: int
+    :return float: Time per move in milliseconds
+    """
+    cursor = editor.txt_body.textCursor()
+    cursor.setPosition(0)
+    editor.txt_body.setTextCursor(cursor)
+    QTest.qWait(50)
+
+    def sweep():
+        for i in range(number):
+            QTest.keyClick(editor.txt_body, Qt.Key_Right, modifier)
+            QApplication.processEvents()
+
+    return timeit.timeit(sweep, number=1) * 1000 / number
+
+
+def main():
+    app = QApplication(sys.argv)
+
+    textedit = CompleterTextEdit(tag_list=[], reference_list=[], dataset_list=[], protocol_list=[])
+    textedit.setHtml(experiment_html(1024 * 1024))
+    print("Document : {} characters".format(textedit.document().characterCount()))
+
+    anchors = textedit.anchors()
+    href_list = set(["{}/{}".format(prefix, value) for prefix in anchors for value in anchors[prefix]])
+    assert href_list == character_anchors(textedit)
+
+    print("Character walk : {:.3f} s".format(timeit.timeit(lambda: character_anchors(textedit), number=1)))
+
+    def fragment_anchors():
+        textedit.anchor_cache = None
+        textedit.anchors()
+    print("Fragment walk : {:.3f} s".format(min(timeit.repeat(fragment_anchors, number=1, repeat=3))))
+    print("Unchanged document : {:.6f} s".format(min(timeit.repeat(textedit.anchors, number=1, repeat=3))))
+
+    # Typing latency compared to a text edit without completer
+    text = "the quick brown fox jumps over the lazy dog " * 20
+    textedit.show()
+    print("Typing : {:.3f} ms per key".format(typing_latency(textedit, text)))
+
+    plain_textedit = QTextEdit()
+    plain_textedit.setHtml(experiment_html(1024 * 1024))
+    plain_textedit.show()
+    print("Typing without completer : {:.3f} ms per key".format(typing_latency(plain_textedit, text)))
+
+    key_list = ["{}{}".format(word, number) for word in set(text.split()) for number in range(5000)]
+    reference_list = [{'uuid': key, 'key': key, 'name': key} for key in key_list]
+    completer_textedit = CompleterTextEdit(tag_list=[], reference_list=reference_list, dataset_list=[],
+                                           protocol_list=[])
+    completer_textedit.setHtml(experiment_html(1024 * 1024))
+    completer_textedit.show()
+    print("Typing with the reference completer : {:.3f} ms per key".format(
+        typing_latency(completer_textedit, text, Qt.Key_R)))
+
+    # Button updates while the cursor moves, compared to an update on every move
+    editor = ExperimentTextEditor(tag_list=[], reference_list=[], dataset_list=[], protocol_list=[], key_list=[])
+    editor.txt_body.setHtml(experiment_html(64 * 1024))
+    editor.show()
+    print("Cursor sweep : {:.3f} ms per move".format(cursor_sweep(editor, 2000)))
+    print("Selection sweep : {:.3f} ms per move".format(cursor_sweep(editor, 2000, Qt.ShiftModifier)))
+
+    editor.txt_body.cursorPositionChanged.disconnect(editor.schedule_button_update)
+    editor.txt_body.cursorPositionChanged.connect(editor.update_button)
+    print("Cursor sweep updating every move : {:.3f} ms per move".format(cursor_sweep(editor, 2000)))
+    print("Selection sweep updating every move : {:.3f} ms per move".format(
+        cursor_sweep(editor, 2000, Qt.ShiftModifier)))
+
+    del app
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,16 @@
+""" This module test bibliography module """
+
+# Python import
+import unittest
+
+# Project import
+from labnote.utils import bibliography
+
+
+class TestBibliography(unittest.TestCase):
+    def test_bibtex_entries(self):
+        lines = ["junk @comment{ignored}\n", "@article\n", "{key,\n", "  title = {A {nested\n", "} title}}@book(",
+                 "other, title = {x)})"]
+        self.assertEqual(list(bibliography.bibtex_entries(lines)),
+                         [('comment', 'ignored'), ('article', 'key,\n  title = {A {nested\n} title}'),
+                          ('book', 'other, title = {x)}')])
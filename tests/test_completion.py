@@ -0,0 +1,30 @@
+""" This module test completion module """
+
+# Python import
+import unittest
+
+# Project import
+from labnote.core import completion
+
+
+class TestCompletionIndex(unittest.TestCase):
+    def test_completion_index(self):
+        index = completion.CompletionIndex(['Smith2010', 'smith2012', 'doe2001', 'Smithson1999'])
+        self.assertEqual(index.prefix('smith'), ['Smith2010', 'smith2012', 'Smithson1999'])
+        self.assertEqual(index.prefix('smith', limit=2), ['Smith2010', 'smith2012'])
+        self.assertEqual(index.prefix('x'), [])
+
+        # The keys close to the text follow the prefix matches
+        self.assertEqual(index.search('smtih2010'), ['Smith2010'])
+        self.assertEqual(index.search('e2001'), ['doe2001'])
+
+        index.update(['Smith2010', 'doe2001', 'doe2002'])
+        self.assertEqual(index.prefix(''), ['doe2001', 'doe2002', 'Smith2010'])
+        self.assertEqual(index.search('2002'), ['doe2002', 'doe2001'])
+
+        # The keys are only added once and the missing keys are ignored
+        index.add('doe2001')
+        index.remove('SMITH2010')
+        index.remove('zzz')
+        self.assertEqual(index.prefix(''), ['doe2001', 'doe2002', 'Smith2010'])
+        self.assertEqual(len(index), 3)
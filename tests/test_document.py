@@ -0,0 +1,93 @@
+""" This module test document module """
+
+# Python import
+import unittest
+import json
+
+# PyQt import
+from PyQt5.QtGui import QTextFormat, QTextDocument, QTextCursor, QTextBlockFormat, QTextCharFormat, QTextListFormat, \
+    QTextImageFormat, QTextFrameFormat, QBrush, QColor
+from PyQt5.QtWidgets import QApplication
+from PyQt5.QtCore import Qt
+
+# Project import
+from labnote.utils import document
+
+
+class TestDocument(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = QApplication.instance() or QApplication([])
+
+    def test_serialize_document(self):
+        source = QTextDocument()
+        cursor = QTextCursor(source)
+
+        block_format = QTextBlockFormat()
+        block_format.setAlignment(Qt.AlignHCenter)
+        block_format.setIndent(2)
+        cursor.setBlockFormat(block_format)
+        cursor.insertText("Centered and indented")
+
+        cursor.insertBlock(QTextBlockFormat())
+        cursor.createList(QTextListFormat.ListDisc)
+        cursor.insertText("First bullet")
+        cursor.insertBlock()
+        cursor.insertText("Second bullet")
+
+        cursor.insertBlock(QTextBlockFormat())
+        cursor.createList(QTextListFormat.ListDecimal)
+        cursor.insertText("First item")
+        cursor.insertBlock()
+        cursor.insertText("Second item")
+
+        cursor.insertBlock(QTextBlockFormat())
+        tag_format = QTextCharFormat()
+        tag_format.setAnchor(True)
+        tag_format.setAnchorHref("tag/{}".format('tag'))
+        tag_format.setBackground(QColor(182, 211, 230, 150))
+        cursor.insertText("#tag", tag_format)
+
+        highlight_format = QTextCharFormat()
+        highlight_format.setBackground(QBrush(Qt.yellow))
+        cursor.insertText(" highlighted", highlight_format)
+
+        image_format = QTextImageFormat()
+        image_format.setName("/Users/R&D/image.png")
+        image_format.setWidth(120)
+        cursor.insertImage(image_format)
+
+        body = document.serialize(source)
+        self.assertTrue(document.is_serialized(body))
+        self.assertEqual(document.image_names(body), ["/Users/R&D/image.png"])
+
+        copy = QTextDocument()
+        document.deserialize(body, copy)
+        self.assertEqual(copy.toHtml(), source.toHtml())
+        self.assertEqual(copy.blockCount(), 6)
+        self.assertEqual(copy.findBlockByNumber(1).textList().format().style(), QTextListFormat.ListDisc)
+        self.assertEqual(copy.findBlockByNumber(3).textList().format().style(), QTextListFormat.ListDecimal)
+        self.assertEqual(document.to_html(body), source.toHtml())
+
+        # The documents that contain a table or a frame are saved in HTML
+        cursor.insertBlock()
+        cursor.insertTable(2, 2)
+        self.assertEqual(document.serialize(source), source.toHtml())
+
+        source = QTextDocument()
+        QTextCursor(source).insertFrame(QTextFrameFormat()).firstCursorPosition().insertText("Frame")
+        self.assertFalse(document.is_serialized(document.serialize(source)))
+
+    def test_replace_path_escaped(self):
+        source = "/Users/R&D/\"Lab\"/experiment"
+        destination = "/Users/R&D/\"Lab\"/copy"
+
+        body = "<html><body><p><img src=\"/Users/R&amp;D/&quot;Lab&quot;/experiment/image.png\" /></p></body></html>"
+        self.assertEqual(document.replace_path(body, source, destination),
+                         body.replace("experiment/image.png", "copy/image.png"))
+
+        body = json.dumps({'labnote': document.VERSION, 'formats': [{}, {str(QTextFormat.ImageName):
+                                                                          source + "/image.png"}],
+                           'lists': [], 'blocks': [[0, 0, -1, "image \ufffc", 1]]})
+        self.assertEqual(json.loads(document.replace_path(body, source, destination))['formats'][1],
+                         {str(QTextFormat.ImageName): destination + "/image.png"})
@@ -6,10 +6,19 @@ import unittest.mock
 import os
 import sqlite3
 import uuid
+import json
+import base64
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# PyQt import
+from PyQt5.QtGui import QTextFormat
+from PyQt5.QtWidgets import QApplication
 
 # Project import
-from labnote.utils import fsentry, database, files, directory
-from labnote.core import data
+from labnote.utils import fsentry, database, files, directory, blobstore, collector, textindex, bibliography, document, \
+    export
+from labnote.core import data, cache
 from labnote.interface import library
 
 
@@ -25,6 +34,7 @@ class TestFSEntry(unittest.TestCase):
         cls.category = 'Category'
         cls.subcategory = 'Subcategory'
         cls.project_name = 'Project'
+        cls.app = QApplication.instance() or QApplication([])
 
     def setUp(self):
         fsentry.create_main_directory()
@@ -62,8 +72,8 @@ class TestFSEntry(unittest.TestCase):
     def test_add_reference_oserror(self):
         file_path = os.path.join(os.path.dirname(os.path.realpath(__file__)) + "/resources/blank.pdf")
 
-        with unittest.mock.patch('shutil.copy2') as mock_shutil:
-            mock_shutil.side_effect = OSError
+        with unittest.mock.patch('labnote.utils.files.copy_file') as mock_copy:
+            mock_copy.side_effect = OSError
 
             with self.assertRaises(OSError):
                 fsentry.add_reference_pdf(self.reference_uuid, file_path)
@@ -71,8 +81,8 @@ class TestFSEntry(unittest.TestCase):
     def test_add_reference_oserror_cleanup(self):
         file_path = os.path.join(os.path.dirname(os.path.realpath(__file__)) + "/resources/blank.pdf")
 
-        with unittest.mock.patch('shutil.copy2') as mock_shutil:
-            mock_shutil.side_effect = OSError
+        with unittest.mock.patch('labnote.utils.files.copy_file') as mock_copy:
+            mock_copy.side_effect = OSError
 
             try:
                 fsentry.add_reference_pdf(self.reference_uuid, file_path)
@@ -141,6 +151,82 @@ class TestFSEntry(unittest.TestCase):
 
                 self.assertEqual(cursor.fetchall(), [(data.uuid_bytes(self.reference_uuid), True)])
 
+    def test_add_reference_pdf_deduplicate(self):
+        file_path = os.path.join(os.path.dirname(os.path.realpath(__file__)) + "/resources/blank.pdf")
+        second_uuid = str(uuid.uuid4())
+        database.insert_ref(data.uuid_bytes(second_uuid), 'second', library.TYPE_ARTICLE, 1)
+
+        fsentry.add_reference_pdf(self.reference_uuid, file_path)
+        fsentry.add_reference_pdf(second_uuid, file_path)
+
+        with sqlite3.connect(database.MAIN_DATABASE_FILE_PATH) as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT blob_hash, refcount FROM blob")
+
+            self.assertEqual(cursor.fetchall(), [(blobstore.file_hash(file_path), 2)])
+
+    def test_add_reference_pdf_unlocked(self):
+        file_path = os.path.join(os.path.dirname(os.path.realpath(__file__)) + "/resources/blank.pdf")
+        second_uuid = str(uuid.uuid4())
+        link_blob = blobstore.link_blob
+
+        # The file is created while another connection writes in the database
+        def link_and_write(blob_hash, destination):
+            link_blob(blob_hash, destination)
+            database.insert_ref(data.uuid_bytes(second_uuid), 'second', library.TYPE_ARTICLE, 1)
+
+        with unittest.mock.patch('labnote.utils.blobstore.link_blob', side_effect=link_and_write):
+            reference_file = fsentry.add_reference_pdf(self.reference_uuid, file_path)
+
+        self.assertEqual(blobstore.link_hash(reference_file), blobstore.file_hash(file_path))
+        self.assertEqual(os.listdir(directory.REFERENCES_DIRECTORY_PATH), [os.path.basename(reference_file)])
+        self.assertEqual(len(database.execute_query("SELECT * FROM refs")), 2)
+
+    def test_store_file_threads(self):
+        file_path = os.path.join(os.path.dirname(os.path.realpath(__file__)) + "/resources/blank.pdf")
+        blob_hash = blobstore.file_hash(file_path)
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            result_list = list(executor.map(lambda number: blobstore.store_file(file_path), range(8)))
+
+        self.assertEqual(result_list, [blob_hash] * 8)
+        self.assertEqual(blobstore.file_hash(blobstore.blob_path(blob_hash)), blob_hash)
+        self.assertEqual(os.listdir(os.path.dirname(blobstore.blob_path(blob_hash))), [blob_hash])
+
+    def test_add_reference_pdf_progress(self):
+        file_path = os.path.join(os.path.dirname(os.path.realpath(__file__)) + "/resources/blank.pdf")
+        progress = unittest.mock.MagicMock()
+
+        fsentry.add_reference_pdf(self.reference_uuid, file_path, progress)
+        progress.assert_called_with(os.path.getsize(file_path), os.path.getsize(file_path))
+
+    def test_copy_file_chunks(self):
+        file_path = os.path.join(os.path.dirname(os.path.realpath(__file__)) + "/resources/blank.pdf")
+        copy_path = os.path.join(directory.DEFAULT_MAIN_DIRECTORY_PATH + "/blank.pdf")
+
+        with unittest.mock.patch('labnote.utils.files.fcntl', None), \
+                unittest.mock.patch('os.copy_file_range', unittest.mock.MagicMock(side_effect=OSError), create=True):
+            files.copy_file(file_path, copy_path)
+
+        with open(file_path, 'rb') as original, open(copy_path, 'rb') as copy:
+            self.assertEqual(original.read(), copy.read())
+
+    def test_delete_reference_pdf_blob(self):
+        file_path = os.path.join(os.path.dirname(os.path.realpath(__file__)) + "/resources/blank.pdf")
+        second_uuid = str(uuid.uuid4())
+        database.insert_ref(data.uuid_bytes(second_uuid), 'second', library.TYPE_ARTICLE, 1)
+        blob_file = blobstore.blob_path(blobstore.file_hash(file_path))
+
+        fsentry.add_reference_pdf(self.reference_uuid, file_path)
+        fsentry.add_reference_pdf(second_uuid, file_path)
+
+        fsentry.delete_reference_pdf(self.reference_uuid)
+        self.assertTrue(os.path.isfile(blob_file))
+        self.assertTrue(os.path.isfile(files.reference_file_path(second_uuid)))
+
+        fsentry.delete_reference_pdf(second_uuid)
+        self.assertFalse(os.path.isfile(blob_file))
+
     def test_create_notebook_database(self):
         fsentry.create_notebook(self.nb_name, 1)
 
@@ -210,6 +296,19 @@ class TestFSEntry(unittest.TestCase):
 
             self.assertEqual(cursor.fetchall(), [])
 
+    def test_delete_notebook_dataset_cache(self):
+        fsentry.create_notebook(self.nb_name, 1)
+        nb_uuid = data.uuid_string(database.execute_query("SELECT nb_uuid FROM notebook")[0][0])
+        dt_uuid = str(uuid.uuid4())
+        fsentry.create_dataset(dt_uuid, 'Dataset', 'dataset', nb_uuid)
+        self.assertEqual(cache.completer_cache.entries(cache.DATASET),
+                         [{'uuid': dt_uuid, 'key': 'dataset', 'name': 'Dataset'}])
+
+        # The datasets deleted with the notebook are removed from the completers
+        fsentry.delete_notebook(nb_uuid)
+        self.assertEqual(database.execute_query("SELECT * FROM dataset"), [])
+        self.assertEqual(cache.completer_cache.entries(cache.DATASET), [])
+
     def test_delete_notebook_directory(self):
         fsentry.create_notebook(self.nb_name, 1)
 
@@ -271,3 +370,434 @@ class TestFSEntry(unittest.TestCase):
                 cursor.execute("SELECT name FROM notebook")
 
                 self.assertEqual(cursor.fetchall(), [(self.nb_name,)])
+
+    def create_experiment_image(self):
+        """ Create an experiment with two images in its resources
+
+        :return: Notebook UUID, path of the image used in the body and path of the unused image
+        """
+        file_path = os.path.join(os.path.dirname(os.path.realpath(__file__)) + "/resources/blank.pdf")
+        fsentry.create_notebook(self.nb_name, 1)
+        nb_uuid = data.uuid_string(database.execute_query("SELECT nb_uuid FROM notebook")[0][0])
+        fsentry.create_experiment(self.exp_uuid, nb_uuid, self.exp_name, body="")
+
+        used_path = files.add_image_experiment(nb_uuid, self.exp_uuid, file_path, 'png')
+        unused_path = files.add_image_experiment(nb_uuid, self.exp_uuid, file_path, 'png')
+        body = "<html><body><p><img src=\"{}\" /></p></body></html>".format(used_path)
+        fsentry.save_experiment(self.exp_uuid, nb_uuid, self.exp_name, None, None, body, [], [], [], [], set())
+
+        return nb_uuid, used_path, unused_path
+
+    def test_save_experiment_keep_used_image(self):
+        nb_uuid, used_path, unused_path = self.create_experiment_image()
+        body = "<html><body><p><img src=\"{}\" /></p></body></html>".format(used_path)
+
+        fsentry.save_experiment(self.exp_uuid, nb_uuid, self.exp_name, None, None, body, [], [], [], [],
+                                set([used_path, unused_path]))
+        self.assertTrue(os.path.isfile(used_path))
+        self.assertFalse(os.path.isfile(unused_path))
+
+    def test_collect_unused_image(self):
+        nb_uuid, used_path, unused_path = self.create_experiment_image()
+        blob_file = blobstore.blob_path(blobstore.file_hash(used_path))
+
+        report = list(collector.collect(grace_period=0))[-1]
+        self.assertEqual((report.entries, report.removed), (1, 1))
+        self.assertTrue(os.path.isfile(used_path))
+        self.assertFalse(os.path.isfile(unused_path))
+        self.assertTrue(os.path.isfile(blob_file))
+
+    def test_collect_grace_period(self):
+        nb_uuid, used_path, unused_path = self.create_experiment_image()
+
+        report = list(collector.collect())[-1]
+        self.assertEqual(report.removed, 0)
+        self.assertTrue(os.path.isfile(unused_path))
+
+    def test_collect_serialized_body(self):
+        nb_uuid, used_path, unused_path = self.create_experiment_image()
+        body = json.dumps({'labnote': document.VERSION, 'formats': [{}, {str(QTextFormat.ImageName): used_path}],
+                           'lists': [], 'blocks': [[0, 0, -1, "image \ufffc", 1]]})
+        fsentry.save_experiment(self.exp_uuid, nb_uuid, self.exp_name, None, None, body, [], [], [], [], set())
+
+        self.assertEqual(collector.image_references(body), set([os.path.basename(used_path)]))
+        report = list(collector.collect(grace_period=0))[-1]
+        self.assertEqual(report.removed, 1)
+        self.assertTrue(os.path.isfile(used_path))
+        self.assertFalse(os.path.isfile(unused_path))
+
+    def test_modify_entry_file(self):
+        nb_uuid, used_path, unused_path = self.create_experiment_image()
+        blob_hash = blobstore.link_hash(used_path)
+        blob_file = blobstore.blob_path(blob_hash)
+
+        # The entries share the read only blob
+        self.assertTrue(blobstore.is_linked(used_path, blob_hash))
+        self.assertTrue(blobstore.is_linked(unused_path, blob_hash))
+        self.assertFalse(os.stat(blob_file).st_mode & blobstore.WRITE_PERMISSIONS)
+
+        # An entry file opened in another application does not change the blob or the other entries
+        blobstore.detach_file(used_path)
+        with open(used_path, 'ab') as file:
+            file.write(b'annotation')
+
+        self.assertFalse(blobstore.is_linked(used_path, blob_hash))
+        self.assertEqual(blobstore.file_hash(blob_file), blob_hash)
+        self.assertEqual(blobstore.file_hash(unused_path), blob_hash)
+
+    def test_duplicate_experiment(self):
+        nb_uuid, used_path, unused_path = self.create_experiment_image()
+        body = "<html><body><p><img src=\"{}\" /></p></body></html>".format(used_path)
+        fsentry.save_experiment(self.exp_uuid, nb_uuid, self.exp_name, None, None, body, ['tag'],
+                                [self.reference_uuid], [], [], set())
+
+        new_uuid = str(uuid.uuid4())
+        fsentry.duplicate_experiment(nb_uuid, self.exp_uuid, new_uuid, 'Copy')
+        copy_path = os.path.join(directory.experiment_resource_path(nb_uuid, new_uuid), os.path.basename(used_path))
+
+        self.assertEqual(fsentry.read_experiment(nb_uuid, new_uuid)['name'], 'Copy')
+        self.assertEqual(fsentry.read_experiment(nb_uuid, new_uuid)['body'], body.replace(used_path, copy_path))
+        self.assertEqual(database.execute_query(database.SELECT_EXPERIMENT_TAG_NAME,
+                                                exp_uuid=data.uuid_bytes(new_uuid)), [('tag',)])
+        self.assertEqual(database.execute_query(database.SELECT_EXPERIMENT_REFERENCE_UUID,
+                                                exp_uuid=data.uuid_bytes(new_uuid)),
+                         [(data.uuid_bytes(self.reference_uuid),)])
+        self.assertTrue(blobstore.is_linked(copy_path, blobstore.link_hash(used_path)))
+        self.assertEqual(blobstore.file_hash(copy_path), blobstore.link_hash(copy_path))
+        self.assertEqual(database.execute_query("SELECT refcount FROM blob"), [(4,)])
+
+        # The copy keeps its images when the original is deleted
+        fsentry.delete_experiment(nb_uuid, self.exp_uuid)
+        self.assertTrue(os.path.isfile(copy_path))
+        self.assertEqual(database.execute_query("SELECT refcount FROM blob"), [(2,)])
+
+    def test_duplicate_experiment_unlocked(self):
+        nb_uuid, used_path, unused_path = self.create_experiment_image()
+        new_uuid = str(uuid.uuid4())
+        link_blob = blobstore.link_blob
+
+        # The images are linked while another connection writes in the database
+        def link_and_write(blob_hash, destination):
+            link_blob(blob_hash, destination)
+            database.insert_category(os.path.basename(destination))
+
+        with unittest.mock.patch('labnote.utils.blobstore.link_blob', side_effect=link_and_write):
+            fsentry.duplicate_experiment(nb_uuid, self.exp_uuid, new_uuid, 'Copy')
+
+        self.assertEqual(database.execute_query("SELECT COUNT(*) FROM category"), [(3,)])
+        self.assertEqual(database.execute_query("SELECT refcount FROM blob"), [(4,)])
+
+    def test_duplicate_experiment_error(self):
+        nb_uuid, used_path, unused_path = self.create_experiment_image()
+        new_uuid = str(uuid.uuid4())
+
+        # The copied files are removed when the database fails after the copy
+        with unittest.mock.patch('labnote.utils.document.replace_path') as mock_replace:
+            mock_replace.side_effect = sqlite3.OperationalError
+            with self.assertRaises(sqlite3.Error):
+                fsentry.duplicate_experiment(nb_uuid, self.exp_uuid, new_uuid, 'Copy')
+
+        self.assertFalse(os.path.isdir(directory.experiment_path(nb_uuid, new_uuid)))
+        self.assertEqual(database.execute_query("SELECT COUNT(*) FROM experiment"), [(1,)])
+
+    def test_move_experiments(self):
+        nb_uuid, used_path, unused_path = self.create_experiment_image()
+        fsentry.create_notebook('Other', 1)
+        other_uuid = data.uuid_string(database.execute_query("SELECT nb_uuid FROM notebook WHERE name='Other'")[0][0])
+
+        fsentry.move_experiments(nb_uuid, [self.exp_uuid], other_uuid)
+        moved_path = os.path.join(directory.experiment_resource_path(other_uuid, self.exp_uuid),
+                                  os.path.basename(used_path))
+
+        self.assertEqual(database.execute_query("SELECT nb_uuid FROM experiment"), [(data.uuid_bytes(other_uuid),)])
+        self.assertFalse(os.path.isdir(directory.experiment_path(nb_uuid, self.exp_uuid)))
+        self.assertTrue(os.path.isfile(moved_path))
+        self.assertEqual(fsentry.read_experiment(other_uuid, self.exp_uuid)['body'],
+                         "<html><body><p><img src=\"{}\" /></p></body></html>".format(moved_path))
+        self.assertEqual(blobstore.link_hash(moved_path), blobstore.file_hash(moved_path))
+
+        # The links are released from their new path
+        fsentry.delete_experiment(other_uuid, self.exp_uuid)
+        self.assertEqual(database.execute_query("SELECT * FROM blob"), [])
+
+    def test_move_experiments_error(self):
+        nb_uuid, used_path, unused_path = self.create_experiment_image()
+        fsentry.create_notebook('Other', 1)
+        other_uuid = data.uuid_string(database.execute_query("SELECT nb_uuid FROM notebook WHERE name='Other'")[0][0])
+        os.rmdir(directory.dataset_notebook_path(other_uuid))
+        os.rmdir(directory.notebook_path(other_uuid))
+
+        with self.assertRaises(OSError):
+            fsentry.move_experiments(nb_uuid, [self.exp_uuid], other_uuid)
+
+        self.assertEqual(database.execute_query("SELECT nb_uuid FROM experiment"), [(data.uuid_bytes(nb_uuid),)])
+        self.assertEqual(blobstore.link_hash(used_path), blobstore.file_hash(used_path))
+        self.assertTrue(os.path.isfile(used_path))
+
+    def test_move_experiments_database_error(self):
+        nb_uuid, used_path, unused_path = self.create_experiment_image()
+        fsentry.create_notebook('Other', 1)
+        other_uuid = data.uuid_string(database.execute_query("SELECT nb_uuid FROM notebook WHERE name='Other'")[0][0])
+
+        # The directories are put back when the database fails after they are renamed
+        with unittest.mock.patch('labnote.utils.fsentry.relocate_experiment_body') as mock_relocate:
+            mock_relocate.side_effect = [sqlite3.OperationalError, None]
+            with self.assertRaises(sqlite3.Error):
+                fsentry.move_experiments(nb_uuid, [self.exp_uuid], other_uuid)
+
+        self.assertEqual(database.execute_query("SELECT nb_uuid FROM experiment"), [(data.uuid_bytes(nb_uuid),)])
+        self.assertFalse(os.path.isdir(directory.experiment_path(other_uuid, self.exp_uuid)))
+        self.assertTrue(os.path.isfile(used_path))
+
+    def test_export_html_inline_image(self):
+        nb_uuid, used_path, unused_path = self.create_experiment_image()
+        html_list = ["<html><head></head><body><p>{}<img src=\"{}\" /></p></body></html>".format(number, used_path)
+                     for number in range(2)]
+        filename = os.path.join(directory.DEFAULT_MAIN_DIRECTORY_PATH, "export.html")
+        export.write_html(html_list, filename)
+
+        with open(filename, encoding='utf-8') as file:
+            html = file.read()
+        with open(used_path, 'rb') as file:
+            encoded = base64.b64encode(file.read()).decode('ascii')
+
+        self.assertEqual(html.count("src=\"data:image/png;base64,{}\"".format(encoded)), 2)
+        self.assertNotIn(used_path, html)
+        self.assertEqual(html.count("<body>"), 1)
+
+    def test_index_reference_text(self):
+        file_path = os.path.join(os.path.dirname(os.path.realpath(__file__)) + "/resources/text.pdf")
+        fsentry.add_reference_pdf(self.reference_uuid, file_path)
+
+        self.assertEqual(textindex.index_references(max_workers=1), 1)
+        self.assertEqual(database.select_reference_search("nitrocellulose memb"), set([self.reference_uuid]))
+        self.assertEqual(textindex.pending_references(), [])
+
+    def test_index_reference_text_broken_pool(self):
+        file_path = os.path.join(os.path.dirname(os.path.realpath(__file__)) + "/resources/text.pdf")
+        fsentry.add_reference_pdf(self.reference_uuid, file_path)
+
+        future = Future()
+        future.set_exception(BrokenProcessPool())
+        with unittest.mock.patch('labnote.utils.textindex.ProcessPoolExecutor') as mock_executor:
+            mock_executor.return_value.__enter__.return_value.submit.return_value = future
+            self.assertEqual(textindex.index_references(max_workers=1), 0)
+
+        self.assertEqual(len(textindex.pending_references()), 1)
+
+    def test_index_reference_text_deleted(self):
+        file_path = os.path.join(os.path.dirname(os.path.realpath(__file__)) + "/resources/text.pdf")
+        fsentry.add_reference_pdf(self.reference_uuid, file_path)
+        textindex.index_references(max_workers=1)
+
+        fsentry.delete_reference_pdf(self.reference_uuid)
+        self.assertEqual(database.select_reference_search("nitrocellulose"), set())
+
+    def test_import_bibtex(self):
+        file_path = os.path.join(os.path.dirname(os.path.realpath(__file__)) + "/resources/library.bib")
+        report = bibliography.import_references(file_path, 1, batch_size=2)
+        self.assertEqual(report, bibliography.ImportReport(imported=3, duplicates=1))
+
+        buffer = database.execute_query("SELECT ref_key, ref_type, title, author, editor, journal, chapter, pages, "
+                                        "issue, year FROM refs WHERE ref_key != :key ORDER BY ref_key",
+                                        key=self.reference_key)
+        self.assertEqual(buffer, [('doe2010', library.TYPE_THESIS, 'A thesis', 'John Doe', None, None, None, None,
+                                   None, 2010),
+                                  ('sambrook', library.TYPE_CHAPTER, 'Molecular cloning', 'Jérôme Müller',
+                                   'Joseph Sambrook', None, 'Plasmid purification', None, None, 2001),
+                                  ('towbin1979', library.TYPE_ARTICLE, 'Electrophoretic transfer of proteins from '
+                                   'polyacrylamide gels to nitrocellulose sheets',
+                                   'Harry Towbin, Theophil Staehelin, Julian Gordon', None,
+                                   'Journal of Biological Chemistry', None, '4350-4354', 9, 1979)])
+        self.assertEqual(database.execute_query(database.SELECT_REFERENCE_DOI), [('10.1073/pnas.76.9.4350',)])
+
+    def test_import_bibtex_keys(self):
+        file_path = os.path.join(directory.DEFAULT_MAIN_DIRECTORY_PATH, "keys.bib")
+        with open(file_path, 'w', encoding='utf-8') as file:
+            file.write("@article{Smith2010, author = {Smith, Ann}, title = {First}, year = 2010}\n"
+                       "@article{Smith:2010, author = {Smith, Ann}, title = {Second}, year = 2010}\n"
+                       "@article{3d, title = {3D structure}}\n")
+
+        bibliography.import_references(file_path, 1, subcategory_id=1)
+        buffer = database.execute_query("SELECT ref_key FROM refs WHERE subcategory_id = 1 ORDER BY ref_key")
+        self.assertEqual(buffer, [('ref3d',), ('smith2010',), ('smith2010a',)])
+
+    def test_import_bibtex_twice(self):
+        file_path = os.path.join(os.path.dirname(os.path.realpath(__file__)) + "/resources/library.bib")
+        bibliography.import_references(file_path, 1)
+        report = bibliography.import_references(file_path, 1)
+        self.assertEqual(report, bibliography.ImportReport(imported=0, duplicates=4))
+
+    def test_import_ris(self):
+        database.insert_ref(data.uuid_bytes(str(uuid.uuid4())), 'laemmli1970', library.TYPE_ARTICLE, 1)
+        file_path = os.path.join(os.path.dirname(os.path.realpath(__file__)) + "/resources/library.ris")
+        progress = unittest.mock.MagicMock()
+        report = bibliography.import_references(file_path, 1, subcategory_id=1, progress=progress)
+        self.assertEqual(report, bibliography.ImportReport(imported=2, duplicates=0))
+
+        buffer = database.execute_query("SELECT ref_key, title, author, journal, chapter, pages, volume FROM refs "
+                                        "WHERE subcategory_id = 1 ORDER BY ref_key")
+        self.assertEqual(buffer, [('laemmli1970a', 'Cleavage of structural proteins during the assembly of the head '
+                                   'of bacteriophage T4', 'U. K. Laemmli', 'Nature', None, '680-685', 227),
+                                  ('smith2005', 'Methods handbook', 'Ann Smith', None, 'Cell culture', None, None)])
+
+        size = os.path.getsize(file_path)
+        progress.assert_called_with(size, size)
+
+    def test_export_bibtex(self):
+        file_path = os.path.join(os.path.dirname(os.path.realpath(__file__)) + "/resources/library.bib")
+        bibliography.import_references(file_path, 1)
+        export_path = os.path.join(directory.DEFAULT_MAIN_DIRECTORY_PATH, "export.bib")
+
+        progress = unittest.mock.MagicMock()
+        self.assertEqual(bibliography.export_references(export_path, tag='transfer', progress=progress), 1)
+        progress.assert_called_once_with(1, 1)
+
+        with open(export_path, encoding='utf-8') as file:
+            entry = next(bibliography.read_bibtex(file))
+        self.assertEqual(entry['key'], 'towbin1979')
+        self.assertEqual(entry['author'], 'Towbin, Harry and Staehelin, Theophil and Gordon, Julian')
+        self.assertEqual(entry['pages'], '4350--4354')
+        self.assertEqual(entry['doi'], '10.1073/pnas.76.9.4350')
+
+    def test_export_bibtex_import(self):
+        file_path = os.path.join(os.path.dirname(os.path.realpath(__file__)) + "/resources/library.bib")
+        bibliography.import_references(file_path, 1, subcategory_id=1)
+        export_path = os.path.join(directory.DEFAULT_MAIN_DIRECTORY_PATH, "export.bib")
+        bibliography.export_references(export_path, subcategory_id=1)
+
+        query = "SELECT ref_key, ref_type, title, author, editor, journal, chapter, pages, year FROM refs " \
+                "WHERE subcategory_id = 1 ORDER BY ref_key"
+        buffer = database.execute_query(query)
+        database.execute_query("DELETE FROM refs WHERE subcategory_id = 1")
+
+        self.assertEqual(bibliography.import_references(export_path, 1, subcategory_id=1).imported, 3)
+        self.assertEqual(database.execute_query(query), buffer)
+
+    def test_export_csl_json(self):
+        file_path = os.path.join(os.path.dirname(os.path.realpath(__file__)) + "/resources/library.bib")
+        bibliography.import_references(file_path, 1, subcategory_id=1)
+        export_path = os.path.join(directory.DEFAULT_MAIN_DIRECTORY_PATH, "export.json")
+        self.assertEqual(bibliography.export_references(export_path, category_id=1), 4)
+
+        with open(export_path, encoding='utf-8') as file:
+            item_list = json.load(file)
+        self.assertEqual([item['id'] for item in item_list], ['doe2010', self.reference_key, 'sambrook', 'towbin1979'])
+        self.assertEqual(item_list[2], {'id': 'sambrook', 'type': 'chapter', 'title': 'Plasmid purification',
+                                        'container-title': 'Molecular cloning',
+                                        'author': [{'family': 'Müller', 'given': 'Jérôme'}],
+                                        'editor': [{'family': 'Sambrook', 'given': 'Joseph'}],
+                                        'issued': {'date-parts': [[2001]]}, 'publisher': 'Cold Spring Harbor',
+                                        'edition': 3})
+
+    def test_reference_label(self):
+        self.assertEqual(data.reference_label('key', author='Harry Towbin, Julian Gordon', year=1979, title='Title'),
+                         ('Towbin & Gordon (1979), Title', 'towbin & gordon (1979), title'))
+        self.assertEqual(data.reference_label('key', author='A B, C D, E F', year=1979)[0], 'B et al. (1979)')
+        self.assertEqual(data.reference_label('key', year=1979)[0], '(1979)')
+        self.assertEqual(data.reference_label('key')[0], 'key')
+
+    def test_reference_label_update(self):
+        database.update_ref(data.uuid_bytes(self.reference_uuid), self.reference_key, library.TYPE_ARTICLE,
+                            author='John Doe', year=2001, title='Title')
+        self.assertEqual(database.select_reference_completer_list(),
+                         [{'uuid': self.reference_uuid, 'key': self.reference_key, 'name': 'Doe (2001), Title'}])
+        self.assertEqual(database.select_reference_category()[0].entry[0].label, 'Doe (2001), Title')
+
+    def test_reference_label_upgrade(self):
+        database.execute_query("DROP TABLE refs_label")
+        database.upgrade_main_database()
+        self.assertEqual(database.select_reference_completer_list()[0]['name'], self.reference_key)
+
+    def test_completer_cache_reference(self):
+        self.assertEqual(cache.completer_cache.entries(cache.REFERENCE),
+                         [{'uuid': self.reference_uuid, 'key': self.reference_key, 'name': self.reference_key}])
+
+        ref_uuid = str(uuid.uuid4())
+        database.insert_ref(data.uuid_bytes(ref_uuid), 'doe2001', library.TYPE_ARTICLE, 1, author='John Doe')
+        fsentry.delete_reference(self.reference_uuid)
+
+        self.assertEqual(cache.completer_cache.entries(cache.REFERENCE),
+                         [{'uuid': ref_uuid, 'key': 'doe2001', 'name': 'Doe'}])
+
+    def test_completer_cache_tag(self):
+        fsentry.create_notebook(self.nb_name, 1)
+        nb_uuid = data.uuid_string(database.execute_query("SELECT nb_uuid FROM notebook")[0][0])
+        fsentry.create_experiment(self.exp_uuid, nb_uuid, self.exp_name, body="", tag_list=['western', 'blot'])
+        self.assertEqual(sorted(cache.completer_cache.entries(cache.TAG)), ['blot', 'western'])
+
+        change_list = []
+        subscriber = lambda *change: change_list.append(change)
+        cache.completer_cache.changed.connect(subscriber)
+        fsentry.save_experiment(self.exp_uuid, nb_uuid, self.exp_name, None, None, "", ['western'], [], [], [], None)
+        cache.completer_cache.changed.disconnect(subscriber)
+
+        generation = cache.completer_cache.generation[cache.TAG]
+        self.assertEqual(change_list, [(cache.TAG, generation, ['western'], ['blot'])])
+        self.assertEqual(cache.completer_cache.entries(cache.TAG), ['western'])
+        self.assertEqual(database.select_tag_list(), ['western'])
+
+    def test_completer_cache_update_list(self):
+        entry_list = [{'uuid': 'a', 'key': 'a', 'name': 'A'}]
+        entry = {'uuid': 'b', 'key': 'b', 'name': 'B'}
+        self.assertEqual(cache.completer_cache.update_list(cache.REFERENCE, 2, 1, entry_list, [entry], ['a']),
+                         [entry])
+        self.assertEqual(cache.completer_cache.update_list(cache.REFERENCE, 1, 1, entry_list, [entry], ['a']),
+                         entry_list)
+
+        # A subscriber that missed a change reads the whole list
+        self.assertEqual(cache.completer_cache.update_list(cache.REFERENCE, 3, 1, entry_list, [entry], ['a']),
+                         [{'uuid': self.reference_uuid, 'key': self.reference_key, 'name': self.reference_key}])
+
+    def test_experiment_stamp(self):
+        fsentry.create_notebook(self.nb_name, 1)
+        nb_uuid = data.uuid_string(database.execute_query("SELECT nb_uuid FROM notebook")[0][0])
+        self.assertIsNone(fsentry.experiment_stamp(nb_uuid, self.exp_uuid))
+
+        fsentry.create_experiment(self.exp_uuid, nb_uuid, self.exp_name, body="")
+        stamp = fsentry.experiment_stamp(nb_uuid, self.exp_uuid)
+        self.assertEqual(fsentry.experiment_stamp(nb_uuid, self.exp_uuid), stamp)
+
+        fsentry.save_experiment(self.exp_uuid, nb_uuid, self.exp_name, None, None, "<p>body</p>", [], [], [], [],
+                                set())
+        self.assertNotEqual(fsentry.experiment_stamp(nb_uuid, self.exp_uuid), stamp)
+
+    def test_protocol_date_updated(self):
+        prt_uuid, other_uuid = str(uuid.uuid4()), str(uuid.uuid4())
+        fsentry.create_protocol(prt_uuid, 'protocol', 1, "", [], [], name='Protocol')
+        fsentry.create_protocol(other_uuid, 'other', 1, "", [], [], name='Other')
+        fsentry.save_protocol(prt_uuid, 'protocol', 'Protocol', None, "", [], [], set())
+
+        self.assertIsNotNone(fsentry.read_protocol(prt_uuid)['updated'])
+        self.assertIsNone(fsentry.read_protocol(other_uuid)['updated'])
+
+    def test_experiment_date_updated(self):
+        nb_uuid, used_path, unused_path = self.create_experiment_image()
+        other_uuid = str(uuid.uuid4())
+        fsentry.create_experiment(other_uuid, nb_uuid, 'Other', body="")
+        fsentry.save_experiment(self.exp_uuid, nb_uuid, self.exp_name, None, None, "", [], [], [], [], set())
+
+        self.assertIsNotNone(database.execute_query(database.SELECT_EXPERIMENT_UPDATED,
+                                                    exp_uuid=data.uuid_bytes(self.exp_uuid))[0][0])
+        self.assertIsNone(database.execute_query(database.SELECT_EXPERIMENT_UPDATED,
+                                                 exp_uuid=data.uuid_bytes(other_uuid))[0][0])
+
+    def test_experiment_list_page(self):
+        fsentry.create_notebook(self.nb_name, 1)
+        nb_uuid = database.execute_query("SELECT nb_uuid FROM notebook")[0][0]
+        for exp_key in [None, None, 'b', 'a', 'c']:
+            fsentry.create_experiment(str(uuid.uuid4()), data.uuid_string(nb_uuid), self.exp_name, exp_key=exp_key,
+                                      body="")
+
+        experiment_list = database.get_experiment_list_notebook(nb_uuid)
+        self.assertEqual([experiment['key'] for experiment in experiment_list], [None, None, 'a', 'b', 'c'])
+
+        page_list = []
+        after = None
+        while True:
+            page = database.get_experiment_list_notebook(nb_uuid, after=after, limit=2)
+            page_list.extend(page)
+            if len(page) < 2:
+                break
+            after = (page[-1]['key'], page[-1]['exp_uuid'])
+        self.assertEqual(page_list, experiment_list)
@@ -0,0 +1,72 @@
+""" This module test textedit module """
+
+# Python import
+import unittest
+import unittest.mock
+import os
+import time
+import tempfile
+import shutil
+
+# PyQt import
+from PyQt5.QtGui import QImage, QColor, QTextDocument
+from PyQt5.QtWidgets import QApplication
+from PyQt5.QtCore import QUrl
+from PyQt5 import sip
+
+# Project import
+from labnote.core import common, cache
+from labnote.interface.widget.textedit import ImageTextEdit
+from labnote.interface.widget.object import image_loader
+
+
+class TestImageTextEdit(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = QApplication.instance() or QApplication([])
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.image_path = os.path.join(self.directory, "image.png")
+        image = QImage(100, 80, QImage.Format_RGB32)
+        image.fill(QColor(10, 200, 30))
+        image.save(self.image_path)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_image_loaded(self):
+        text_edit = ImageTextEdit(common.TYPE_EXPERIMENT)
+        image_document = text_edit.new_document("<p><img src=\"{}\" /></p>".format(self.image_path))
+        other_document = text_edit.new_document("<p>No image</p>")
+        other_document.addResource = unittest.mock.MagicMock()
+        text_edit.set_document(image_document)
+
+        # The placeholder is shown until the image is loaded
+        url = QUrl(self.image_path)
+        self.assertIsNone(image_loader.pixmap(self.image_path))
+        image_document.resource(QTextDocument.ImageResource, url)
+
+        start = time.time()
+        while self.image_path in text_edit.pending_image and time.time() - start < 5:
+            self.app.processEvents()
+
+        # The image is only added to the document that shows it
+        pixmap = image_loader.pixmap(self.image_path)
+        self.assertEqual(image_document.resource(QTextDocument.ImageResource, url).cacheKey(), pixmap.cacheKey())
+        other_document.addResource.assert_not_called()
+
+    def test_text_edit_destroyed(self):
+        completer_count = cache.completer_cache.receivers(cache.completer_cache.changed)
+        loader_count = image_loader.receivers(image_loader.loaded)
+
+        text_edit = ImageTextEdit(common.TYPE_EXPERIMENT, reference_list=[])
+        self.assertEqual(cache.completer_cache.receivers(cache.completer_cache.changed), completer_count + 1)
+        self.assertEqual(image_loader.receivers(image_loader.loaded), loader_count + 1)
+
+        # The global objects do not call the slots of a deleted text edit
+        sip.delete(text_edit)
+        self.assertEqual(cache.completer_cache.receivers(cache.completer_cache.changed), completer_count)
+        self.assertEqual(image_loader.receivers(image_loader.loaded), loader_count)
+        cache.completer_cache.publish(cache.REFERENCE, updated=[{'uuid': 'a', 'key': 'doe2001', 'name': 'doe2001'}])
+        cache.completer_cache.publish(cache.REFERENCE, removed=['a'])